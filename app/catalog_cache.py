@@ -0,0 +1,104 @@
+# app/catalog_cache.py
+import hashlib
+import threading
+import time
+from email.utils import formatdate
+from typing import Callable, Optional, Tuple, Union
+from fastapi import Request, Response
+from pydantic import BaseModel
+from app.cache import LRUCache
+from app.config import CATALOG_CACHE_SIZE
+
+# GET condicional y caché de respuestas del catálogo público.
+# Toda escritura que cambia lo que muestran GET /books/ o GET /books/{id}
+# (alta, edición, baja, reserva, devolución, cambio de estado, importación,
+# barrido de vencidas) llama a bump() después del commit. Las respuestas se
+# guardan ya serializadas con la clave (ruta, query, versión): al cambiar la
+# versión las anteriores dejan de ser alcanzables y se descartan.
+# Con varios workers, on_bump avisa a los demás (ver app/invalidation.py).
+
+
+class CatalogEntry:
+    __slots__ = ("body", "etag", "last_modified")
+
+    def __init__(self, body: bytes, etag: str, last_modified: str):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class CatalogCache:
+    """
+    Versión del catálogo + caché LRU de respuestas con ETag fuerte
+    """
+
+    def __init__(self, maxsize: int):
+        self.version = 0
+        self.modified_at = time.time()
+        self.responses = LRUCache(maxsize=maxsize)
+        self.on_bump: Optional[Callable[[], None]] = None
+        self._lock = threading.Lock()
+
+    def bump(self, publish: bool = True):
+        """
+        Marcar el catálogo como modificado (llamar tras el commit).
+        publish=False cuando el cambio viene de otro worker.
+        """
+        with self._lock:
+            self.version += 1
+            self.modified_at = time.time()
+        self.responses.clear()
+        if publish and self.on_bump is not None:
+            self.on_bump()
+
+    def lookup(self, request: Request) -> Tuple[tuple, Optional[Response]]:
+        """
+        Clave de la petición (con la versión actual) y la respuesta si ya
+        estaba en caché: 304 si el cliente tiene esa misma versión
+        """
+        with self._lock:
+            version, modified_at = self.version, self.modified_at
+        key = (request.url.path, tuple(sorted(request.query_params.multi_items())), version, modified_at)
+        entry = self.responses.get(key)
+        if entry is None:
+            return key, None
+        return key, self._respond(request, entry)
+
+    def store(self, request: Request, key: tuple, content: Union[BaseModel, bytes]) -> Response:
+        """
+        Serializar la respuesta (un modelo, o JSON ya codificado), guardarla
+        bajo `key` y devolverla
+        """
+        body = content if isinstance(content, bytes) else content.model_dump_json().encode()
+        etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        entry = CatalogEntry(body, etag, formatdate(key[-1], usegmt=True))
+        self.responses.set(key, entry)
+        return self._respond(request, entry)
+
+    def _respond(self, request: Request, entry: CatalogEntry) -> Response:
+        headers = {
+            "ETag": entry.etag,
+            "Last-Modified": entry.last_modified,
+            # Siempre revalidar: la respuesta cambia con cualquier reserva
+            "Cache-Control": "no-cache",
+        }
+        if self._not_modified(request, entry):
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    @staticmethod
+    def _not_modified(request: Request, entry: CatalogEntry) -> bool:
+        # Solo If-None-Match: Last-Modified tiene resolución de segundos y
+        # varias reservas en el mismo segundo darían 304 con datos viejos
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is None:
+            return False
+        # Comparación débil (RFC 9110): se ignora el prefijo W/
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or entry.etag in tags
+
+    def stats(self) -> dict:
+        return {"version": self.version, **self.responses.stats()}
+
+
+catalog_cache = CatalogCache(CATALOG_CACHE_SIZE)
@@ -0,0 +1,150 @@
+# app/config.py
+import os
+from dotenv import load_dotenv
+
+# Configuración leída del entorno (o de un fichero .env)
+load_dotenv()
+
+
+def env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "si", "on")
+
+
+# Base de datos
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./biblioteca.db")
+
+# Capa asíncrona: AsyncSession con driver asíncrono en lugar del threadpool
+DATABASE_ASYNC = env_bool("DATABASE_ASYNC", False)
+
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def default_async_url(url: str) -> str:
+    """
+    Derivar la URL asíncrona de la síncrona (sqlite:// -> sqlite+aiosqlite://)
+    """
+    scheme, _, rest = url.partition("://")
+    backend = scheme.split("+")[0]
+    return f"{_ASYNC_DRIVERS.get(backend, scheme)}://{rest}"
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or default_async_url(DATABASE_URL)
+
+# Crear tablas, índices y agregados al arrancar la aplicación (lifespan).
+# Con varios workers conviene desactivarlo y ejecutar una vez
+# `python -m app.schema` antes de arrancarlos.
+SCHEMA_ON_STARTUP = env_bool("SCHEMA_ON_STARTUP", True)
+
+# Pool de conexiones (no aplica a SQLite en memoria)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# PRAGMAs de SQLite aplicados a cada conexión nueva.
+# "production": WAL (los lectores no bloquean al escritor), fsync solo en
+# checkpoints, mmap y caché de páginas amplios, espera ante bloqueos.
+# "default": los valores por defecto de SQLite.
+SQLITE_PROFILES = {
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": "268435456",   # 256 MB
+        "cache_size": "-65536",     # 64 MB (negativo = KiB)
+        "busy_timeout": "5000",     # ms
+        "temp_store": "MEMORY",
+    },
+    "default": {},
+}
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "production")
+
+
+def sqlite_pragmas() -> dict:
+    """
+    PRAGMAs del perfil elegido; cada uno se puede sobrescribir con
+    SQLITE_<PRAGMA> (p. ej. SQLITE_CACHE_SIZE=-131072)
+    """
+    pragmas = dict(SQLITE_PROFILES.get(SQLITE_PROFILE, {}))
+    for name in SQLITE_PROFILES["production"]:
+        value = os.getenv(f"SQLITE_{name.upper()}")
+        if value:
+            pragmas[name] = value
+    return pragmas
+
+
+SQLITE_PRAGMAS = sqlite_pragmas()
+
+# Importación masiva del catálogo: filas por lote (una transacción por lote)
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))
+
+# Barrido periódico de reservas vencidas (0 = desactivado)
+OVERDUE_SWEEP_INTERVAL_SECONDS = int(os.getenv("OVERDUE_SWEEP_INTERVAL_SECONDS", "300"))
+
+# Caché de respuestas del catálogo público (GET /books/, GET /books/{id})
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "1024"))
+
+# Búsqueda tolerante a errores (GET /books/?fuzzy=true; ver app/search.py):
+# similitud mínima de trigramas, alternativas por palabra de la consulta y
+# candidatos leídos de cada índice antes de ordenar por similitud
+FUZZY_SIMILARITY_THRESHOLD = float(os.getenv("FUZZY_SIMILARITY_THRESHOLD", "0.3"))
+FUZZY_MAX_ALTERNATIVES = int(os.getenv("FUZZY_MAX_ALTERNATIVES", "5"))
+FUZZY_CANDIDATES = int(os.getenv("FUZZY_CANDIDATES", "500"))
+
+# Autocompletado en memoria (GET /books/suggest; ver app/suggest.py):
+# entradas (títulos y autores más populares) como máximo, sugerencias por
+# respuesta, cada cuánto se reconstruye (0 = solo al arrancar) y cambios
+# del catálogo acumulados antes de reconstruirlo
+SUGGEST_MAX_ENTRIES = int(os.getenv("SUGGEST_MAX_ENTRIES", "200000"))
+SUGGEST_MAX_RESULTS = int(os.getenv("SUGGEST_MAX_RESULTS", "10"))
+SUGGEST_REBUILD_SECONDS = int(os.getenv("SUGGEST_REBUILD_SECONDS", "600"))
+SUGGEST_OVERLAY_MAX = int(os.getenv("SUGGEST_OVERLAY_MAX", "5000"))
+
+# Caché de tokens ya validados -> usuario autenticado
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+
+# Varios workers (python -m app.main): cada uno tiene sus propias cachés,
+# que se invalidan entre procesos con la tabla cache_changes, consultada
+# cada CACHE_SYNC_INTERVAL_SECONDS (0 = desactivado; ver app/invalidation.py)
+WORKERS = int(os.getenv("WORKERS", "1"))
+CACHE_SYNC_INTERVAL_SECONDS = float(os.getenv("CACHE_SYNC_INTERVAL_SECONDS", "0.5"))
+
+# Límites por cliente (peticiones/segundos, "0" = sin límite; ver
+# app/ratelimit.py) y límite global de peticiones en curso (0 = sin límite)
+RATE_LIMIT_ENABLED = env_bool("RATE_LIMIT_ENABLED", True)
+RATE_LIMIT_LOGIN = os.getenv("RATE_LIMIT_LOGIN", "20/60")            # por IP
+RATE_LIMIT_LOGIN_USER = os.getenv("RATE_LIMIT_LOGIN_USER", "10/60")  # por usuario
+RATE_LIMIT_REGISTER = os.getenv("RATE_LIMIT_REGISTER", "5/60")       # por IP
+RATE_LIMIT_SEARCH = os.getenv("RATE_LIMIT_SEARCH", "120/60")         # por IP
+RATE_LIMIT_SEARCH_USER = os.getenv("RATE_LIMIT_SEARCH_USER", "120/60")  # por usuario
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "256"))
+OVERLOAD_RETRY_AFTER_SECONDS = int(os.getenv("OVERLOAD_RETRY_AFTER_SECONDS", "1"))
+
+# SSO con Keycloak (OIDC). Con OIDC_ENABLED, los access tokens emitidos por
+# Keycloak se aceptan como Bearer: se verifican localmente con las claves
+# públicas del realm (JWKS), que se guardan en memoria (ver app/oidc.py)
+KEYCLOAK_URL = os.getenv("KEYCLOAK_URL", "http://localhost:8080")
+KEYCLOAK_REALM = os.getenv("KEYCLOAK_REALM", "biblioteca")
+KEYCLOAK_CLIENT_ID = os.getenv("KEYCLOAK_CLIENT_ID", "biblioteca-app")
+OIDC_ENABLED = env_bool("OIDC_ENABLED", False)
+OIDC_ISSUER = os.getenv("OIDC_ISSUER", f"{KEYCLOAK_URL}/realms/{KEYCLOAK_REALM}")
+OIDC_JWKS_URL = os.getenv("OIDC_JWKS_URL", f"{OIDC_ISSUER}/protocol/openid-connect/certs")
+OIDC_AUDIENCE = os.getenv("OIDC_AUDIENCE", KEYCLOAK_CLIENT_ID)
+OIDC_ALGORITHMS = os.getenv("OIDC_ALGORITHMS", "RS256").split(",")
+OIDC_JWKS_TTL_SECONDS = int(os.getenv("OIDC_JWKS_TTL_SECONDS", "3600"))
+# Mínimo entre dos descargas por un `kid` desconocido (rotación de claves)
+OIDC_JWKS_MIN_REFRESH_SECONDS = int(os.getenv("OIDC_JWKS_MIN_REFRESH_SECONDS", "30"))
+OIDC_LEEWAY_SECONDS = int(os.getenv("OIDC_LEEWAY_SECONDS", "30"))
+OIDC_TOKEN_CACHE_SIZE = int(os.getenv("OIDC_TOKEN_CACHE_SIZE", "10000"))
+
+# Pool de procesos para bcrypt (login / registro)
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", str(HASH_WORKERS * 8)))
+HASH_RETRY_AFTER_SECONDS = int(os.getenv("HASH_RETRY_AFTER_SECONDS", "2"))
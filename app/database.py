@@ -1,24 +1,123 @@
 # app/database.py
-from sqlalchemy import create_engine
+from typing import Union
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+from app.config import (
+    DATABASE_URL, DATABASE_ASYNC, ASYNC_DATABASE_URL,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, SQLITE_PRAGMAS
+)
 
 # SQLite para simplicidad (en producción usarías PostgreSQL)
-SQLALCHEMY_DATABASE_URL = "sqlite:///./biblioteca.db"
+SQLALCHEMY_DATABASE_URL = DATABASE_URL
+IS_SQLITE = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
+
+connect_args = {}
+if IS_SQLITE:
+    connect_args = {"check_same_thread": False}  # Solo para SQLite
+
+# SQLite en memoria usa un pool de una conexión: no admite estos parámetros
+pool_args = {}
+if ":memory:" not in SQLALCHEMY_DATABASE_URL and SQLALCHEMY_DATABASE_URL not in ("sqlite://", "sqlite:///"):
+    pool_args = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}  # Solo para SQLite
+    SQLALCHEMY_DATABASE_URL,
+    connect_args=connect_args,
+    **pool_args
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Aplicar los PRAGMAs configurados (SQLITE_PROFILE) a cada conexión nueva
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+if IS_SQLITE:
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+
+# Motor asíncrono opcional (DATABASE_ASYNC=1): las consultas no ocupan
+# un hilo del threadpool mientras esperan a la base de datos
+async_engine = None
+AsyncSessionLocal = None
+if DATABASE_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        poolclass=AsyncAdaptedQueuePool,
+        **pool_args
+    )
+    if IS_SQLITE:
+        event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+
 Base = declarative_base()
 
-# Función helper para obtener sesión de BD
-def get_database():
-    db = SessionLocal()
+
+class ThreadedSession:
+    """
+    Session síncrona con la misma interfaz run_sync que AsyncSession:
+    la función se ejecuta en el threadpool de Starlette.
+    Al terminar cada llamada la conexión vuelve al pool, para no retenerla
+    mientras la petición espera un hilo libre (los objetos ya cargados
+    siguen siendo legibles).
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def _call(self, fn, *args, **kwargs):
+        try:
+            return fn(self.sync_session, *args, **kwargs)
+        finally:
+            self.sync_session.close()
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(self._call, fn, *args, **kwargs)
+
+    async def close(self):
+        self.sync_session.close()
+
+
+# Tipo de la sesión que reciben los endpoints
+DatabaseSession = Union[AsyncSession, ThreadedSession]
+
+
+# Función helper para obtener sesión de BD.
+# Los routers usan siempre `await db.run_sync(funcion, ...)`, que recibe una
+# Session síncrona, así la lógica es la misma en ambos modos.
+async def get_database():
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+    db = ThreadedSession(SessionLocal())
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        await db.close()
+
+# create_all no añade índices nuevos a tablas que ya existen
+def create_missing_indexes(bind):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
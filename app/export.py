@@ -0,0 +1,94 @@
+# app/export.py
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, Optional
+from sqlalchemy import select
+from app.database import SessionLocal
+from app.models.models import Book, Reservation, User
+
+# Exportación de reservas para informes.
+# Se recorren con un cursor en el servidor (stream_results + yield_per) y
+# solo las columnas necesarias (sin objetos ORM), y cada bloque de filas se
+# envía en cuanto se codifica: la memoria no depende del tamaño de la tabla.
+
+EXPORT_COLUMNS = [
+    Reservation.id, Reservation.user_id, User.username, Reservation.book_id,
+    Book.isbn, Book.title, Reservation.status, Reservation.reservation_date,
+    Reservation.due_date, Reservation.return_date,
+]
+EXPORT_FIELDS = [
+    "id", "user_id", "username", "book_id", "isbn", "title", "status",
+    "reservation_date", "due_date", "return_date",
+]
+EXPORT_CHUNK_ROWS = 1000
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def export_statement(status: Optional[str] = None, date_from: Optional[datetime] = None,
+                     date_to: Optional[datetime] = None, book_id: Optional[int] = None,
+                     user_id: Optional[int] = None):
+    """
+    SELECT de las reservas filtradas, en orden de id
+    """
+    stmt = (
+        select(*EXPORT_COLUMNS)
+        .join(User, User.id == Reservation.user_id)
+        .join(Book, Book.id == Reservation.book_id)
+        .order_by(Reservation.id)
+    )
+    if status is not None:
+        stmt = stmt.where(Reservation.status == status)
+    if date_from is not None:
+        stmt = stmt.where(Reservation.reservation_date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(Reservation.reservation_date < date_to)
+    if book_id is not None:
+        stmt = stmt.where(Reservation.book_id == book_id)
+    if user_id is not None:
+        stmt = stmt.where(Reservation.user_id == user_id)
+    return stmt
+
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _encode_ndjson(rows) -> str:
+    return "".join(
+        json.dumps(dict(zip(EXPORT_FIELDS, map(_iso, row))), ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+def _encode_csv(rows, header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    writer.writerows([_iso(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+def iter_export(stmt, file_format: str, session_factory=SessionLocal) -> Iterator[bytes]:
+    """
+    Generador síncrono con el fichero exportado por bloques.
+    Abre su propia sesión: se consume después de que el endpoint haya
+    devuelto la respuesta (StreamingResponse lo itera en el threadpool).
+    """
+    db = session_factory()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=EXPORT_CHUNK_ROWS))
+        if file_format == "csv":
+            yield _encode_csv([], header=True).encode()
+        for rows in result.partitions():
+            if file_format == "csv":
+                yield _encode_csv(rows, header=False).encode()
+            else:
+                yield _encode_ndjson(rows).encode()
+    finally:
+        db.close()
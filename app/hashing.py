@@ -0,0 +1,117 @@
+# app/hashing.py
+import asyncio
+import multiprocessing
+import threading
+import time
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException, status
+from app.config import HASH_WORKERS, HASH_QUEUE_SIZE, HASH_RETRY_AFTER_SECONDS
+
+# bcrypt consume 100-300 ms de CPU por llamada. Se ejecuta en un pool de
+# procesos propio y acotado: una avalancha de logins no ocupa el threadpool
+# (ni el GIL) que atiende al resto de endpoints, y cuando la cola se llena
+# se responde 503 en lugar de encolar trabajo sin límite.
+#
+# passlib se importa al primer uso (login, registro), no al arrancar: la
+# mayoría de procesos y scripts no llegan a calcular ningún hash.
+
+
+@lru_cache(maxsize=None)
+def pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def hash_password_sync(password: str) -> str:
+    return pwd_context().hash(password)
+
+
+def verify_password_sync(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context().verify(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Pool de procesos para bcrypt con cola acotada y estadísticas
+    """
+
+    def __init__(self, workers: int, max_pending: int, retry_after: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # "spawn": los procesos hijos no heredan hilos ni conexiones abiertas
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Servicio de autenticación saturado, reintente en unos segundos",
+                    headers={"Retry-After": str(self.retry_after)},
+                )
+            self.pending += 1
+
+        start = time.perf_counter()
+        try:
+            future = self._get_executor().submit(fn, *args)
+            result = await asyncio.wrap_future(future)
+        except BaseException:
+            # Error o petición cancelada: no cuenta en la latencia
+            with self._lock:
+                self.pending -= 1
+                self.failed += 1
+            raise
+        latency = time.perf_counter() - start
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password_sync, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password_sync, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "queue_depth": self.pending,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "avg_latency_ms": round(self.total_latency / self.completed * 1000, 2) if self.completed else 0.0,
+                "max_latency_ms": round(self.max_latency * 1000, 2),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+hasher = PasswordHasher(HASH_WORKERS, HASH_QUEUE_SIZE, HASH_RETRY_AFTER_SECONDS)
@@ -0,0 +1,213 @@
+# app/importer.py
+import csv
+import json
+import time
+from datetime import datetime
+from typing import BinaryIO, Iterator, List, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.config import IMPORT_BATCH_SIZE
+from app.database import DatabaseSession
+from app.models.models import Book, BookCreate
+from app.search import update_term_index
+
+# Importación masiva del catálogo.
+# El fichero se lee línea a línea (nunca entero en memoria); cada lote se
+# valida con BookCreate, se comprueban sus ISBN contra la base de datos con
+# una sola consulta y se inserta con un executemany en su propia transacción
+# (con sus términos de búsqueda, ver app.search.update_term_index).
+# Una fila inválida (también una línea que no es UTF-8) se informa y se
+# salta, sin abortar el resto de la carga.
+# La lectura y validación van al threadpool; solo el trabajo de cada lote
+# con la base de datos pasa por db.run_sync (con DATABASE_ASYNC=1 corre en
+# el hilo del event loop y no debe incluir el análisis del fichero).
+
+MAX_REPORTED_ERRORS = 1000
+INVALID_ENCODING = "UTF-8 inválido"
+
+
+def detect_format(filename: str) -> str:
+    """
+    Formato a partir de la extensión del fichero (csv por defecto)
+    """
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return "csv"
+
+
+def _decoded_lines(stream: BinaryIO, invalid: List[int]) -> Iterator[str]:
+    """
+    Líneas del fichero decodificadas una a una. Las que no son UTF-8 válido
+    se anotan en `invalid` y se sustituyen por una línea vacía (así no se
+    pierde la numeración y el lector CSV las salta).
+    """
+    for line_number, raw in enumerate(stream, start=1):
+        try:
+            yield raw.decode("utf-8-sig" if line_number == 1 else "utf-8")
+        except UnicodeDecodeError:
+            invalid.append(line_number)
+            yield "\n"
+
+
+def iter_rows(stream: BinaryIO, file_format: str) -> Iterator[Tuple[int, object]]:
+    """
+    Filas del fichero como (número de línea, dict). Si la línea no se puede
+    leer se devuelve (número de línea, mensaje de error).
+    """
+    invalid = []
+    lines = _decoded_lines(stream, invalid)
+
+    def invalid_lines():
+        while invalid:
+            yield invalid.pop(0), INVALID_ENCODING
+
+    if file_format == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield from invalid_lines()
+            # Celdas vacías = campo ausente; columnas sobrantes se ignoran
+            yield reader.line_num, {k: v for k, v in row.items() if k and v not in ("", None)}
+        yield from invalid_lines()
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if invalid:
+            yield from invalid_lines()
+            continue
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, "JSON inválido"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, "Se esperaba un objeto JSON"
+            continue
+        yield line_number, row
+
+
+class ImportReport:
+    """
+    Resultado de una importación: contadores y errores por fila
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.error_count = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    def error(self, row: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+    def as_dict(self) -> dict:
+        seconds = time.perf_counter() - self.started
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "error_count": self.error_count,
+            "errors": self.errors,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(self.rows / seconds, 1) if seconds else 0.0,
+        }
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+        for error in exc.errors()
+    )
+
+
+def _insert_batch(db: Session, batch: list, report: ImportReport):
+    """
+    Insertar un lote de (fila, BookCreate) descartando los ISBN que ya existen
+    """
+    existing = set(db.execute(
+        select(Book.isbn).where(Book.isbn.in_([book.isbn for _, book in batch]))
+    ).scalars())
+    now = datetime.utcnow()
+    rows = []
+    for row_number, book in batch:
+        if book.isbn in existing:
+            report.duplicates += 1
+            report.error(row_number, f"ISBN ya existe: {book.isbn}")
+            continue
+        rows.append((row_number, {**book.model_dump(), "available_copies": book.total_copies, "created_at": now}))
+    if not rows:
+        return
+    try:
+        db.execute(insert(Book), [values for _, values in rows])
+        update_term_index(db.connection(), added=[(values["title"], values["author"]) for _, values in rows])
+        db.commit()
+        report.inserted += len(rows)
+        return
+    except IntegrityError:
+        # Otro proceso insertó alguno de estos ISBN entretanto:
+        # se repite el lote fila a fila para aislar las que fallan
+        db.rollback()
+    for row_number, values in rows:
+        try:
+            db.execute(insert(Book), values)
+            update_term_index(db.connection(), added=[(values["title"], values["author"])])
+            db.commit()
+            report.inserted += 1
+        except IntegrityError:
+            db.rollback()
+            report.duplicates += 1
+            report.error(row_number, f"ISBN ya existe: {values['isbn']}")
+
+
+def _read_batch(rows: Iterator, report: ImportReport, seen: set, batch_size: int) -> list:
+    """
+    Leer y validar filas hasta completar un lote (vacío al acabar el fichero)
+    """
+    batch = []
+    for row_number, row in rows:
+        report.rows += 1
+        if isinstance(row, str):
+            report.error(row_number, row)
+            continue
+        try:
+            book = BookCreate.model_validate(row)
+        except ValidationError as exc:
+            report.error(row_number, _validation_message(exc))
+            continue
+        # ISBN repetido dentro del mismo fichero
+        if book.isbn in seen:
+            report.duplicates += 1
+            report.error(row_number, f"ISBN repetido en el fichero: {book.isbn}")
+            continue
+        seen.add(book.isbn)
+        batch.append((row_number, book))
+        if len(batch) >= batch_size:
+            break
+    return batch
+
+
+async def import_books(db: DatabaseSession, stream: BinaryIO, file_format: str,
+                       batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """
+    Importar libros desde un fichero CSV o NDJSON en lotes de `batch_size`
+    """
+    report = ImportReport()
+    rows = iter_rows(stream, file_format)
+    seen = set()
+    while True:
+        batch = await run_in_threadpool(_read_batch, rows, report, seen, batch_size)
+        if not batch:
+            break
+        await db.run_sync(_insert_batch, batch, report)
+        # Los ISBN ya insertados los detecta la consulta contra la BD
+        seen.clear()
+    return report.as_dict()
@@ -0,0 +1,199 @@
+# app/invalidation.py
+import asyncio
+import logging
+import os
+import secrets
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+from sqlalchemy import select, insert, delete, func
+from starlette.concurrency import run_in_threadpool
+from app.config import CACHE_SYNC_INTERVAL_SECONDS
+from app.database import engine
+from app.models.models import CacheChange
+
+# Invalidación de cachés entre workers sin un broker externo.
+# Cada worker guarda en memoria respuestas del catálogo y usuarios
+# autenticados; con varios procesos sobre la misma base de datos, un cambio
+# hecho en uno debe descartar las copias de los demás.
+#
+# - Quien cambia algo añade una fila a cache_changes (kind, key): los
+#   cambios de usuario en la misma transacción que el cambio (record_change,
+#   desde los eventos del ORM); las subidas de versión del catálogo se
+#   agrupan y se escriben justo después, desde la tarea de fondo.
+# - Cada worker lee las filas nuevas (id > último visto) de los demás cada
+#   CACHE_SYNC_INTERVAL_SECONDS y aplica la invalidación correspondiente.
+#   En SQLite, PRAGMA data_version (cambia cuando otra conexión hace
+#   commit) evita incluso esa consulta mientras no hay escrituras.
+#
+# Un cambio es visible en todos los workers en, como mucho, un intervalo
+# más lo que tarde la consulta. Los ids se asignan en orden de commit
+# porque SQLite serializa las escrituras.
+
+logger = logging.getLogger(__name__)
+
+# Identidad de este proceso: sus propias filas no se vuelven a aplicar
+ORIGIN = f"{os.getpid()}-{secrets.token_hex(4)}"
+
+CATALOG = "catalog"
+USER = "user"
+BOOK = "book"  # clave: id del libro; sin clave, libros nuevos (importación)
+
+RETENTION = timedelta(hours=1)  # filas más antiguas se borran
+PRUNE_EVERY = 600               # sondeos entre dos borrados
+
+
+def record_change(connection, kind: str, key: Optional[str] = None):
+    """
+    Publicar un cambio dentro de la transacción en curso (eventos del ORM)
+    """
+    connection.execute(insert(CacheChange).values(origin=ORIGIN, kind=kind, key=key))
+
+
+class CacheSync:
+    """
+    Tarea de fondo de cada worker: publica los cambios locales pendientes y
+    aplica los de los demás workers
+    """
+
+    def __init__(self, interval: float, bind=engine, origin: str = ORIGIN):
+        self.interval = interval
+        self.bind = bind
+        # Otro valor solo para simular varios workers en un proceso (pruebas);
+        # record_change publica siempre con ORIGIN
+        self.origin = origin
+        self.handlers: Dict[str, Callable[[Optional[str]], object]] = {}
+        self.last_seen = None
+        self.polls = 0
+        self.skipped = 0
+        self.applied = 0
+        self.published = 0
+        self.last_poll = None
+        self._pending = set()
+        self._data_version = None
+        self._watch = None
+        self._task = None
+        self._loop = None
+        self._wake = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, kind: str, handler: Callable[[Optional[str]], object]):
+        """
+        handler(key) se llama con cada cambio `kind` de otro worker
+        """
+        self.handlers[kind] = handler
+
+    def publish(self, kind: str, key: Optional[str] = None):
+        """
+        Anotar un cambio ya confirmado; se escribe en la siguiente vuelta,
+        que se adelanta en lugar de esperar al intervalo
+        """
+        if self._task is None:
+            return
+        with self._lock:
+            self._pending.add((kind, key))
+        self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _changed_since_last_poll(self) -> bool:
+        # SQLite: data_version solo cambia si otra conexión hizo commit
+        if self._watch is None:
+            return True
+        cursor = self._watch.cursor()
+        try:
+            version = cursor.execute("PRAGMA data_version").fetchone()[0]
+        finally:
+            cursor.close()
+        changed = version != self._data_version
+        self._data_version = version
+        return changed
+
+    def sync(self) -> int:
+        """
+        Una vuelta: escribir los cambios pendientes y aplicar los ajenos.
+        Devuelve el número de cambios aplicados.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        with self.bind.begin() as conn:
+            if pending:
+                conn.execute(insert(CacheChange), [
+                    {"origin": self.origin, "kind": kind, "key": key} for kind, key in pending
+                ])
+                self.published += len(pending)
+            self.polls += 1
+            self.last_poll = datetime.utcnow()
+            if self.polls % PRUNE_EVERY == 0:
+                conn.execute(delete(CacheChange).where(CacheChange.created_at < datetime.utcnow() - RETENTION))
+            if not pending and not self._changed_since_last_poll():
+                self.skipped += 1
+                return 0
+            rows = conn.execute(
+                select(CacheChange.id, CacheChange.origin, CacheChange.kind, CacheChange.key)
+                .where(CacheChange.id > self.last_seen)
+                .order_by(CacheChange.id)
+            ).all()
+
+        applied = 0
+        for row in rows:
+            self.last_seen = row.id
+            handler = self.handlers.get(row.kind)
+            if row.origin != self.origin and handler is not None:
+                handler(row.key)
+                applied += 1
+        self.applied += applied
+        return applied
+
+    async def _run(self):
+        while True:
+            try:
+                await run_in_threadpool(self.sync)
+            except Exception:
+                logger.exception("Error al sincronizar las cachés entre workers")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self):
+        if self.interval <= 0 or self._task is not None:
+            return
+        # Solo los cambios posteriores al arranque (las cachés empiezan vacías)
+        with self.bind.connect() as conn:
+            self.last_seen = conn.execute(select(func.coalesce(func.max(CacheChange.id), 0))).scalar()
+        if self.bind.dialect.name == "sqlite":
+            self._watch = self.bind.raw_connection()
+            self._changed_since_last_poll()
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watch is not None:
+            self._watch.close()
+            self._watch = None
+        # Lo pendiente se escribe antes de salir
+        if self._pending:
+            await run_in_threadpool(self.sync)
+
+    def stats(self) -> dict:
+        return {
+            "origin": self.origin,
+            "interval_seconds": self.interval,
+            "polls": self.polls,
+            "polls_without_changes": self.skipped,
+            "published": self.published,
+            "applied": self.applied,
+            "last_seen": self.last_seen,
+            "last_poll": self.last_poll,
+        }
+
+
+cache_sync = CacheSync(CACHE_SYNC_INTERVAL_SECONDS)
@@ -0,0 +1,282 @@
+# app/inventory.py
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, delete, bindparam
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models.models import Book, Reservation, Hold, BookStats, ReservationStatusCount
+
+# Estados de una reserva
+ACTIVE = "activa"
+RETURNED = "devuelto"
+OVERDUE = "vencido"
+VALID_STATUSES = [ACTIVE, RETURNED, OVERDUE]
+
+LOAN_DAYS = 14  # 2 semanas
+
+# Operaciones atómicas sobre el inventario.
+# Cada cambio es un UPDATE condicional: la condición se evalúa en la base de
+# datos en el mismo instante de la escritura, así dos peticiones simultáneas
+# nunca pueden tomar la misma copia (no hay lectura-modificación-escritura).
+
+
+# Estadísticas incrementales (book_stats, reservation_status_counts).
+# Se actualizan con la misma sesión, dentro de la transacción de la
+# operación: si esta hace rollback, los contadores también.
+
+
+def _dialect(db: Session):
+    return postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+
+
+def _upsert(db: Session, table, key: str, deltas: list):
+    """
+    Sumar `deltas` (una fila por clave, columnas = incrementos) a `table`,
+    creando la fila si no existe. Un solo executemany.
+    """
+    stmt = _dialect(db).insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[key],
+        set_={
+            name: table.c[name] + stmt.excluded[name]
+            for name in deltas[0] if name != key
+        }
+    )
+    db.connection().execute(stmt, deltas)
+
+
+def _count_statuses(db: Session, deltas: Counter):
+    deltas = [{"status": status, "count": n} for status, n in deltas.items() if n]
+    if deltas:
+        _upsert(db, ReservationStatusCount.__table__, "status", deltas)
+
+
+def record_new_reservations(db: Session, book_ids: list):
+    """
+    Contabilizar reservas nuevas (activas) de los libros dados
+    """
+    if not book_ids:
+        return
+    _upsert(db, BookStats.__table__, "book_id", [
+        {"book_id": book_id, "total_reservations": n, "active_reservations": n}
+        for book_id, n in Counter(book_ids).items()
+    ])
+    _count_statuses(db, Counter({ACTIVE: len(book_ids)}))
+
+
+def record_status_changes(db: Session, old_status: str, new_status: str, book_ids: list):
+    """
+    Contabilizar el paso de `old_status` a `new_status` de una reserva por
+    cada elemento de `book_ids` (un libro puede repetirse)
+    """
+    if not book_ids or old_status == new_status:
+        return
+    _count_statuses(db, Counter({old_status: -len(book_ids), new_status: len(book_ids)}))
+    if ACTIVE in (old_status, new_status):
+        sign = -1 if old_status == ACTIVE else 1
+        _upsert(db, BookStats.__table__, "book_id", [
+            {"book_id": book_id, "total_reservations": 0, "active_reservations": sign * n}
+            for book_id, n in Counter(book_ids).items()
+        ])
+
+
+def take_copy(db: Session, book_id: int) -> bool:
+    """
+    Descontar una copia solo si queda alguna. False si no había copias
+    (o el libro no existe).
+    """
+    result = db.execute(
+        update(Book)
+        .where(Book.id == book_id, Book.available_copies > 0)
+        .values(available_copies=Book.available_copies - 1)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def release_copy(db: Session, book_id: int) -> int:
+    """
+    Devolver una copia al inventario, o entregarla al primero de la cola de
+    espera del libro. Devuelve 1 si se entregó a la cola.
+    """
+    return release_copies(db, [book_id])
+
+
+def close_active_reservation(db: Session, user_id: int, book_id: int, new_status: str = RETURNED) -> bool:
+    """
+    Cerrar la reserva activa de un usuario sobre un libro.
+    False si no existía (o ya la cerró otra petición).
+    """
+    result = db.execute(
+        update(Reservation)
+        .where(
+            Reservation.user_id == user_id,
+            Reservation.book_id == book_id,
+            Reservation.status == ACTIVE
+        )
+        .values(status=new_status, return_date=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def set_reservation_status(db: Session, reservation_id: int, old_status: str, new_status: str) -> bool:
+    """
+    Cambiar el estado de una reserva solo si sigue en `old_status`.
+    False si otra operación la modificó entre la lectura y la escritura.
+    """
+    result = db.execute(
+        update(Reservation)
+        .where(Reservation.id == reservation_id, Reservation.status == old_status)
+        .values(status=new_status)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def take_copies(db: Session, book_ids: list) -> set:
+    """
+    take_copy para varios libros en un solo UPDATE.
+    Devuelve los ids de los libros de los que se descontó una copia.
+    """
+    if not book_ids:
+        return set()
+    return set(db.execute(
+        update(Book)
+        .where(Book.id.in_(book_ids), Book.available_copies > 0)
+        .values(available_copies=Book.available_copies - 1)
+        .returning(Book.id)
+        .execution_options(synchronize_session=False)
+    ).scalars())
+
+
+def release_copies(db: Session, book_ids: list) -> int:
+    """
+    Devolver una copia por cada elemento de `book_ids` (un libro puede
+    repetirse). Las copias de libros con cola de espera se entregan a los
+    primeros de la cola; el resto vuelve al inventario con un UPDATE por
+    libro (executemany). Devuelve cuántas se entregaron a la cola.
+    """
+    if not book_ids:
+        return 0
+    released = Counter(book_ids)
+    leftover = hand_off(db, released)
+    rows = [{"book_id": book_id, "released": n} for book_id, n in leftover.items() if n]
+    if rows:
+        db.connection().execute(
+            update(Book.__table__)
+            .where(Book.__table__.c.id == bindparam("book_id"))
+            .values(available_copies=Book.__table__.c.available_copies + bindparam("released")),
+            rows
+        )
+    return sum(released.values()) - sum(leftover.values())
+
+
+def hand_off(db: Session, released: Counter) -> Counter:
+    """
+    Entregar las copias liberadas ({book_id: copias}) a los primeros de la
+    cola de espera de cada libro: se borra su entrada de la cola y se crea
+    su reserva activa, en la transacción de quien liberó la copia.
+    Devuelve las copias sin destinatario, que vuelven al inventario.
+
+    Cada cabeza de la cola se reclama con un DELETE ... RETURNING (con
+    FOR UPDATE SKIP LOCKED fuera de SQLite): dos devoluciones simultáneas
+    del mismo libro nunca entregan la misma entrada.
+    """
+    leftover = Counter(released)
+    waiting = db.execute(
+        select(Hold.book_id).where(Hold.book_id.in_(list(released))).distinct()
+    ).scalars().all()
+    if not waiting:
+        return leftover
+
+    due_date = datetime.utcnow() + timedelta(days=LOAN_DAYS)
+    assigned = []
+    for book_id in waiting:
+        while leftover[book_id] > 0:
+            claim = (
+                select(Hold.id)
+                .where(Hold.book_id == book_id)
+                .order_by(Hold.id)
+                .limit(leftover[book_id])
+                .with_for_update(skip_locked=True)
+            )
+            heads = sorted(db.execute(
+                delete(Hold)
+                .where(Hold.id.in_(claim))
+                .returning(Hold.id, Hold.user_id)
+                .execution_options(synchronize_session=False)
+            ).all())
+            if not heads:
+                break
+            # Quien ya tiene el libro (lo reservó al quedar copias) sale de
+            # la cola sin recibir otra copia
+            holding = set(db.execute(
+                select(Reservation.user_id).where(
+                    Reservation.book_id == book_id,
+                    Reservation.status == ACTIVE,
+                    Reservation.user_id.in_([head.user_id for head in heads])
+                )
+            ).scalars())
+            for head in heads:
+                if head.user_id not in holding:
+                    assigned.append({"user_id": head.user_id, "book_id": book_id, "due_date": due_date})
+                    leftover[book_id] -= 1
+
+    if assigned:
+        # Si el usuario reservó el libro entretanto (uq_reservations_active)
+        # no se crea otra reserva y la copia vuelve al inventario
+        created = db.execute(
+            _dialect(db).insert(Reservation).on_conflict_do_nothing().returning(Reservation.book_id),
+            assigned
+        ).scalars().all()
+        leftover.update(Counter(row["book_id"] for row in assigned) - Counter(created))
+        record_new_reservations(db, created)
+    return leftover
+
+
+def close_active_reservations(db: Session, user_id: int, book_ids: list, new_status: str = RETURNED) -> set:
+    """
+    close_active_reservation para varios libros en un solo UPDATE.
+    Devuelve los ids de los libros cuya reserva activa se cerró.
+    """
+    if not book_ids:
+        return set()
+    return set(db.execute(
+        update(Reservation)
+        .where(
+            Reservation.user_id == user_id,
+            Reservation.book_id.in_(book_ids),
+            Reservation.status == ACTIVE
+        )
+        .values(status=new_status, return_date=datetime.utcnow())
+        .returning(Reservation.book_id)
+        .execution_options(synchronize_session=False)
+    ).scalars())
+
+
+def mark_overdue(db: Session, now: datetime = None) -> int:
+    """
+    Marcar como vencidas todas las reservas activas con due_date pasada y
+    devolver sus copias al inventario (igual que el cambio de estado manual
+    activa -> vencido). Un solo UPDATE sobre el índice (status, due_date);
+    RETURNING indica exactamente qué reservas cambiaron, así una devolución
+    concurrente nunca libera la misma copia dos veces.
+    Devuelve el número de reservas marcadas.
+    """
+    now = now or datetime.utcnow()
+    book_ids = db.execute(
+        update(Reservation)
+        .where(Reservation.status == ACTIVE, Reservation.due_date < now)
+        .values(status=OVERDUE)
+        .returning(Reservation.book_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    if not book_ids:
+        return 0
+
+    record_status_changes(db, ACTIVE, OVERDUE, book_ids)
+    # Una fila por libro afectado (executemany), no una por reserva;
+    # las copias de libros con cola de espera pasan a la cola
+    release_copies(db, book_ids)
+    return len(book_ids)
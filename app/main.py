@@ -1,22 +1,81 @@
 # app/main.py
-from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.security import HTTPBearer
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from app.database import SessionLocal, engine
-from app.models import models
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from app.config import SCHEMA_ON_STARTUP, WORKERS
+from app.database import engine, async_engine
 from app.routers import auth, books
-import uvicorn
+from app.schema import create_schema
+from app.hashing import hasher
+from app.sweeper import sweeper
+from app.catalog_cache import catalog_cache
+from app.invalidation import cache_sync, CATALOG, USER, BOOK
+from app.suggest import suggest_index
+from app.metrics import metrics, MetricsMiddleware, instrument_engine
+from app.ratelimit import rate_limits, concurrency_limit, ConcurrencyLimitMiddleware
 
-# Crear tablas
-models.Base.metadata.create_all(bind=engine)
+# Métricas de BD por petición (ver app/metrics.py)
+instrument_engine(engine)
+if async_engine is not None:
+    instrument_engine(async_engine.sync_engine)
+metrics.register_gauge("hash_queue_depth", "Hashes bcrypt en curso o en cola",
+                       lambda: hasher.stats()["queue_depth"])
+metrics.register_gauge("user_cache_hit_ratio", "Aciertos de la caché de tokens",
+                       lambda: auth.user_cache.stats()["hit_ratio"])
+metrics.register_gauge("catalog_cache_hit_ratio", "Aciertos de la caché del catálogo",
+                       lambda: catalog_cache.stats()["hit_ratio"])
+metrics.register_counter("requests_shed_total", "Peticiones rechazadas con 503 por exceso de concurrencia",
+                         lambda: concurrency_limit.shed)
+metrics.register_gauge("concurrency_limit", "Máximo de peticiones en curso (0 = sin límite)",
+                       lambda: concurrency_limit.limit)
+for _name in rate_limits.limiters:
+    metrics.register_counter(f"rate_limited_{_name}_total", f"Peticiones rechazadas con 429 por el límite {_name}",
+                             lambda name=_name: rate_limits.limiters[name].rejected)
+metrics.register_gauge("suggest_index_entries", "Títulos y autores en el índice de sugerencias",
+                       lambda: suggest_index.stats()["entries"])
+metrics.register_gauge("suggest_index_bytes", "Memoria del índice de sugerencias",
+                       lambda: suggest_index.stats()["memory_bytes"])
+metrics.register_gauge("cache_sync_applied", "Invalidaciones recibidas de otros workers",
+                       lambda: cache_sync.stats()["applied"])
+
+# Invalidación entre workers (ver app/invalidation.py)
+catalog_cache.on_bump = lambda: cache_sync.publish(CATALOG)
+cache_sync.subscribe(CATALOG, lambda key: catalog_cache.bump(publish=False))
+cache_sync.subscribe(USER, auth.invalidate_user)
+suggest_index.on_change = lambda book_id: cache_sync.publish(BOOK, None if book_id is None else str(book_id))
+cache_sync.subscribe(BOOK, lambda key: suggest_index.refresh_new(None, publish=False) if key is None
+                     else suggest_index.refresh(None, [int(key)], publish=False))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Crear tablas (ver app/schema.py): al arrancar, no al importar
+    if SCHEMA_ON_STARTUP:
+        await run_in_threadpool(create_schema, engine)
+    sweeper.start()
+    cache_sync.start()
+    suggest_index.start()
+    yield
+    await suggest_index.stop()
+    await cache_sync.stop()
+    await sweeper.stop()
+    hasher.shutdown()
+    # Cerrar las conexiones del motor asíncrono (hilos de aiosqlite)
+    if async_engine is not None:
+        await async_engine.dispose()
 
 app = FastAPI(
     title="Sistema Biblioteca Virtual",
     description="Proyecto Integrador - Autenticación y Autorización",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Límite global de concurrencia: dentro de CORS (los 503 llevan sus
+# cabeceras) y de las métricas (se cuentan)
+app.add_middleware(ConcurrencyLimitMiddleware)
+
 # CORS para frontend
 app.add_middleware(
     CORSMiddleware,
@@ -26,13 +85,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Dependency para BD
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# El último añadido es el más externo: mide también CORS
+app.add_middleware(MetricsMiddleware)
 
 # Incluir routers
 app.include_router(auth.router, prefix="/auth", tags=["Autenticación"])
@@ -54,5 +108,20 @@ async def root():
 async def health_check():
     return {"status": "OK", "message": "Servidor funcionando correctamente"}
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics():
+    """
+    Métricas en formato texto de Prometheus
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    import os
+    import uvicorn
+    if WORKERS > 1:
+        # El esquema se crea una vez aquí, no en cada worker
+        create_schema(engine)
+        os.environ["SCHEMA_ON_STARTUP"] = "0"
+        uvicorn.run("app.main:app", host="0.0.0.0", port=8000, workers=WORKERS)
+    else:
+        uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
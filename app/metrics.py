@@ -0,0 +1,239 @@
+# app/metrics.py
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+from sqlalchemy import event
+
+# Métricas en formato texto de Prometheus (GET /metrics).
+# - MetricsMiddleware (ASGI puro, sin BaseHTTPMiddleware): peticiones,
+#   códigos de estado e histograma de latencia por ruta (la plantilla,
+#   p. ej. /books/{book_id}, no la URL: cardinalidad acotada).
+# - instrument_engine: eventos del motor que cuentan sentencias SQL y
+#   tiempo en la base de datos, atribuidos a la petición en curso mediante
+#   una ContextVar (se propaga al threadpool y a run_sync).
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "<sin_ruta>"
+
+# Contadores de la petición en curso: [sentencias, segundos en BD]
+_request_db: ContextVar[Optional[list]] = ContextVar("request_db", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def lines(self, name: str, labels: str) -> list:
+        out = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            out.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        out.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        out.append(f"{name}_sum{{{labels}}} {self.total:.6f}")
+        out.append(f"{name}_count{{{labels}}} {self.count}")
+        return out
+
+
+class MetricsRegistry:
+    """
+    Almacén de métricas del proceso, seguro entre hilos
+    """
+
+    def __init__(self):
+        self.latency: Dict[tuple, Histogram] = {}
+        self.responses: Dict[tuple, int] = {}
+        self.db_statements: Dict[tuple, int] = {}
+        self.db_seconds: Dict[tuple, float] = {}
+        self.db_statements_outside = 0
+        self.db_seconds_outside = 0.0
+        self.in_flight = 0
+        self.gauges: Dict[str, tuple] = {}
+        self.counters: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, method: str, route: str, status: int, seconds: float,
+                         statements: int, db_seconds: float):
+        key = (method, route)
+        with self._lock:
+            self.in_flight -= 1
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram()
+            histogram.observe(seconds)
+            status_key = (method, route, status)
+            self.responses[status_key] = self.responses.get(status_key, 0) + 1
+            self.db_statements[key] = self.db_statements.get(key, 0) + statements
+            self.db_seconds[key] = self.db_seconds.get(key, 0.0) + db_seconds
+
+    def statement_outside_request(self, seconds: float):
+        # Tareas de fondo (barrido de vencidas), scripts, arranque
+        with self._lock:
+            self.db_statements_outside += 1
+            self.db_seconds_outside += seconds
+
+    def register_gauge(self, name: str, help_text: str, fn: Callable[[], float]):
+        """
+        Valor leído en el momento de exportar (cola de bcrypt, cachés...)
+        """
+        self.gauges[name] = (help_text, fn)
+
+    def register_counter(self, name: str, help_text: str, fn: Callable[[], float]):
+        """
+        Como register_gauge, para totales que solo crecen (rate()/increase())
+        """
+        self.counters[name] = (help_text, fn)
+
+    def render(self) -> str:
+        with self._lock:
+            latency = {key: (h.counts[:], h.total, h.count) for key, h in self.latency.items()}
+            responses = dict(self.responses)
+            db_statements = dict(self.db_statements)
+            db_seconds = dict(self.db_seconds)
+            outside = (self.db_statements_outside, self.db_seconds_outside)
+            in_flight = self.in_flight
+
+        lines = [
+            "# HELP http_requests_total Peticiones HTTP atendidas",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status), count in sorted(responses.items()):
+            lines.append(f'http_requests_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {count}')
+
+        lines += [
+            "# HELP http_request_duration_seconds Latencia de las peticiones HTTP",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), (counts, total, count) in sorted(latency.items()):
+            histogram = Histogram()
+            histogram.counts, histogram.total, histogram.count = counts, total, count
+            lines += histogram.lines("http_request_duration_seconds", f'method="{method}",route="{_escape(route)}"')
+
+        lines += [
+            "# HELP http_request_db_statements_total Sentencias SQL ejecutadas por las peticiones",
+            "# TYPE http_request_db_statements_total counter",
+        ]
+        for (method, route), count in sorted(db_statements.items()):
+            lines.append(f'http_request_db_statements_total{{method="{method}",route="{_escape(route)}"}} {count}')
+        lines += [
+            "# HELP http_request_db_seconds_total Tiempo en la base de datos de las peticiones",
+            "# TYPE http_request_db_seconds_total counter",
+        ]
+        for (method, route), seconds in sorted(db_seconds.items()):
+            lines.append(f'http_request_db_seconds_total{{method="{method}",route="{_escape(route)}"}} {seconds:.6f}')
+
+        lines += [
+            "# HELP db_statements_outside_requests_total Sentencias SQL fuera de peticiones (tareas de fondo)",
+            "# TYPE db_statements_outside_requests_total counter",
+            f"db_statements_outside_requests_total {outside[0]}",
+            "# HELP db_seconds_outside_requests_total Tiempo en BD fuera de peticiones",
+            "# TYPE db_seconds_outside_requests_total counter",
+            f"db_seconds_outside_requests_total {outside[1]:.6f}",
+            "# HELP http_requests_in_flight Peticiones en curso",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {in_flight}",
+        ]
+        for name, (help_text, fn) in sorted(self.gauges.items()):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {fn()}"]
+        for name, (help_text, fn) in sorted(self.counters.items()):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter", f"{name} {fn()}"]
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: latencia, estado y uso de BD por ruta
+    """
+
+    def __init__(self, app, registry: MetricsRegistry = metrics):
+        self.app = app
+        self.registry = registry
+        self._route_paths: Dict[object, str] = {}
+
+    def _route_path(self, scope) -> str:
+        # El router deja en el scope el endpoint que atendió la petición
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            for route in scope["app"].routes:
+                if getattr(route, "endpoint", None) is endpoint:
+                    path = route.path
+                    break
+            path = self._route_paths[endpoint] = path or UNMATCHED_ROUTE
+        return path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        db_counters = [0, 0.0]
+        token = _request_db.set(db_counters)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        self.registry.request_started()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_db.reset(token)
+            self.registry.request_finished(
+                scope["method"], self._route_path(scope), status_code, elapsed,
+                db_counters[0], db_counters[1]
+            )
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_start
+    counters = _request_db.get()
+    if counters is None:
+        metrics.statement_outside_request(elapsed)
+    else:
+        # Lista propia de la petición: sin lock
+        counters[0] += 1
+        counters[1] += elapsed
+
+
+def instrument_engine(engine):
+    """
+    Contar sentencias y tiempo de BD de un motor (síncrono; para el
+    asíncrono se pasa async_engine.sync_engine)
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -1,5 +1,5 @@
 # app/models/models.py
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -15,7 +15,7 @@ class User(Base):
     full_name = Column(String)
     role = Column(String, default="estudiante")  # estudiante, bibliotecario, admin
     is_active = Column(Boolean, default=True)
-    keycloak_id = Column(String, nullable=True)  # Para SSO
+    keycloak_id = Column(String, nullable=True, index=True)  # Para SSO (`sub` del token)
     two_factor_enabled = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     
@@ -37,6 +37,16 @@ class Book(Base):
     # Relaciones
     reservations = relationship("Reservation", back_populates="book")
 
+    # Índice parcial: solo los libros sin copias disponibles, ordenados
+    # por título (listado de agotados sin recorrer el catálogo)
+    __table_args__ = (
+        Index(
+            "ix_books_unavailable", "title", "id",
+            sqlite_where=text("available_copies <= 0"),
+            postgresql_where=text("available_copies <= 0")
+        ),
+    )
+
 class Reservation(Base):
     __tablename__ = "reservations"
     
@@ -52,9 +62,73 @@ class Reservation(Base):
     user = relationship("User", back_populates="reservations")
     book = relationship("Book", back_populates="reservations")
 
+    # Índices para la paginación por cursor (reservation_date, id),
+    # la búsqueda de reservas vencidas (status, due_date)
+    # y unicidad de la reserva activa por (usuario, libro)
+    __table_args__ = (
+        Index("ix_reservations_user_date", "user_id", "reservation_date", "id"),
+        Index("ix_reservations_date", "reservation_date", "id"),
+        Index("ix_reservations_status_due", "status", "due_date"),
+        Index(
+            "uq_reservations_active", "user_id", "book_id", unique=True,
+            sqlite_where=text("status = 'activa'"),
+            postgresql_where=text("status = 'activa'")
+        ),
+    )
+
+# Cola de espera (FIFO) de un libro sin copias. El id crece con cada alta,
+# así la posición en la cola es el orden por (book_id, id): la cabeza se
+# obtiene con una búsqueda en el índice al liberarse una copia.
+class Hold(Base):
+    __tablename__ = "holds"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    book_id = Column(Integer, ForeignKey("books.id"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    book = relationship("Book")
+
+    __table_args__ = (
+        Index("ix_holds_book_position", "book_id", "id"),
+        Index("uq_holds_user_book", "user_id", "book_id", unique=True),
+    )
+
+# Registro de cambios para invalidar las cachés de los demás workers
+# (ver app/invalidation.py): cada fila dice qué caché debe descartarse
+class CacheChange(Base):
+    __tablename__ = "cache_changes"
+
+    id = Column(Integer, primary_key=True)
+    origin = Column(String, nullable=False)  # worker que hizo el cambio
+    kind = Column(String, nullable=False)    # catalog, user
+    key = Column(String, nullable=True)      # p. ej. el username
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+# Agregados mantenidos en la misma transacción que cada reserva,
+# devolución o cambio de estado (ver app/inventory.py y app/stats.py)
+class BookStats(Base):
+    __tablename__ = "book_stats"
+
+    book_id = Column(Integer, ForeignKey("books.id"), primary_key=True)
+    total_reservations = Column(Integer, default=0, nullable=False)
+    active_reservations = Column(Integer, default=0, nullable=False)
+
+    # Rankings: el top-N se lee recorriendo el índice hacia atrás
+    __table_args__ = (
+        Index("ix_book_stats_total", "total_reservations", "book_id"),
+        Index("ix_book_stats_active", "active_reservations", "book_id"),
+    )
+
+class ReservationStatusCount(Base):
+    __tablename__ = "reservation_status_counts"
+
+    status = Column(String, primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+
 # Schemas para Pydantic (validación de datos)
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional, List, Literal, Dict
 from datetime import datetime
 
 class UserBase(BaseModel):
@@ -102,10 +176,74 @@ class ReservationResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class BookPage(BaseModel):
+    items: List[BookResponse]
+    next_cursor: Optional[str] = None
+
+class ReservationPage(BaseModel):
+    items: List[ReservationResponse]
+    next_cursor: Optional[str] = None
+
+class HoldResponse(BaseModel):
+    id: int
+    position: int
+    created_at: datetime
+    book: BookResponse
+
+class BatchRequest(BaseModel):
+    book_ids: List[int] = Field(..., min_length=1, max_length=50)
+    # all_or_nothing: si falla un libro no se aplica ninguno
+    # partial: se aplican los que se puedan
+    mode: Literal["all_or_nothing", "partial"] = "all_or_nothing"
+
+class BatchItemResult(BaseModel):
+    book_id: int
+    ok: bool
+    detail: str
+    reservation_id: Optional[int] = None
+    due_date: Optional[datetime] = None
+
+class BatchResult(BaseModel):
+    mode: str
+    applied: bool
+    succeeded: int
+    failed: int
+    items: List[BatchItemResult]
+
+class BookRanking(BaseModel):
+    book_id: int
+    title: str
+    author: str
+    available_copies: int
+    total_copies: int
+    total_reservations: int
+    active_reservations: int
+
+class Suggestion(BaseModel):
+    text: str
+    type: str  # title, author
+    book_id: Optional[int] = None
+    popularity: int
+
+class ReservationSummary(BaseModel):
+    total: int
+    by_status: Dict[str, int]
+
 class Token(BaseModel):
     access_token: str
     token_type: str
     role: str
 
+class CurrentUser(BaseModel):
+    """Usuario autenticado, tal como se guarda en la caché de tokens"""
+    id: int
+    username: str
+    role: str
+    is_active: bool
+
+    class Config:
+        from_attributes = True
+        frozen = True
+
 class TokenData(BaseModel):
     username: Optional[str] = None
\ No newline at end of file
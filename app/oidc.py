@@ -0,0 +1,260 @@
+# app/oidc.py
+import json
+import logging
+import threading
+import time
+import urllib.request
+from functools import lru_cache
+from typing import Callable, Dict, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.cache import LRUCache
+from app.config import (
+    OIDC_ENABLED, OIDC_ISSUER, OIDC_JWKS_URL, OIDC_AUDIENCE, OIDC_ALGORITHMS,
+    OIDC_JWKS_TTL_SECONDS, OIDC_JWKS_MIN_REFRESH_SECONDS, OIDC_LEEWAY_SECONDS,
+    OIDC_TOKEN_CACHE_SIZE,
+)
+from app.models.models import User
+
+# Validación local de los access tokens de Keycloak (OIDC).
+# - Las claves públicas del realm (JWKS) se descargan una vez y se guardan
+#   ya construidas por `kid`. Se vuelven a pedir al caducar
+#   (OIDC_JWKS_TTL_SECONDS) o al ver un `kid` desconocido, que es como se
+#   nota una rotación de claves; esto último como mucho una vez cada
+#   OIDC_JWKS_MIN_REFRESH_SECONDS, para que tokens con `kid` inventados no
+#   conviertan cada petición en una llamada al proveedor. Si el proveedor
+#   no responde se siguen usando las claves que ya había.
+# - La firma y los claims (exp, nbf, iss, aud/azp, sub) se comprueban en local:
+#   ninguna llamada al proveedor por token.
+# - Los claims de un token ya validado se guardan hasta su expiración.
+# - Los roles del token se traducen a User.role; la fila del usuario solo
+#   se escribe al crearla o si su rol o correo cambian en Keycloak.
+# - Una identidad de Keycloak solo se asocia al usuario local que creó
+#   (keycloak_id): nunca a una cuenta local existente con el mismo nombre.
+
+logger = logging.getLogger(__name__)
+
+# De mayor a menor privilegio: gana el primero que aparezca en el token
+ROLE_PRIORITY = ["admin", "bibliotecario", "estudiante"]
+DEFAULT_ROLE = "estudiante"
+
+
+class InvalidToken(Exception):
+    pass
+
+
+@lru_cache(maxsize=None)
+def _jose():
+    import jose
+    import jose.jwk
+    import jose.jwt
+    return jose
+
+
+def fetch_json(url: str, timeout: float = 5.0) -> dict:
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+class JWKSCache:
+    """
+    Claves públicas del proveedor por `kid`, con refresco por caducidad y
+    por rotación
+    """
+
+    def __init__(self, url: str, ttl: float, min_refresh: float,
+                 fetch: Callable[[str], dict] = fetch_json):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh = min_refresh
+        self.fetch = fetch
+        self.keys: Dict[str, object] = {}
+        self.fetched_at = None
+        self.attempted_at = None
+        self.fetches = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def refresh(self, requested_at: Optional[float] = None):
+        """
+        Descargar el JWKS (salvo que otro hilo lo haya hecho mientras se
+        esperaba el cerrojo)
+        """
+        jose = _jose()
+        with self._lock:
+            if requested_at is not None and self.attempted_at is not None and self.attempted_at >= requested_at:
+                return
+            self.attempted_at = time.monotonic()
+            self.fetches += 1
+            try:
+                document = self.fetch(self.url)
+            except Exception:
+                self.failures += 1
+                logger.exception("No se pudo descargar el JWKS de %s", self.url)
+                return
+            keys = {}
+            for jwk in document.get("keys", []):
+                # Solo claves de firma con un algoritmo aceptado
+                algorithm = jwk.get("alg", OIDC_ALGORITHMS[0])
+                if jwk.get("use", "sig") != "sig" or algorithm not in OIDC_ALGORITHMS or "kid" not in jwk:
+                    continue
+                try:
+                    keys[jwk["kid"]] = jose.jwk.construct(jwk, algorithm)
+                except jose.JOSEError:
+                    logger.warning("Clave %s del JWKS no válida", jwk["kid"])
+            self.keys = keys
+            self.fetched_at = self.attempted_at
+
+    def _may_refresh(self, now: float) -> bool:
+        return self.attempted_at is None or now - self.attempted_at >= self.min_refresh
+
+    def get(self, kid: str):
+        now = time.monotonic()
+        expired = self.fetched_at is None or now - self.fetched_at > self.ttl
+        if expired and self._may_refresh(now):
+            self.refresh(now)
+        key = self.keys.get(kid)
+        if key is None and self._may_refresh(now):
+            # `kid` nuevo: el proveedor ha rotado sus claves
+            self.refresh(now)
+            key = self.keys.get(kid)
+        if key is None:
+            raise InvalidToken("Clave de firma desconocida")
+        return key
+
+    def stats(self) -> dict:
+        return {"keys": sorted(self.keys), "fetches": self.fetches, "failures": self.failures}
+
+
+class OIDCVerifier:
+    """
+    Verificación local de access tokens y caché de los ya validados
+    """
+
+    def __init__(self, issuer: str, audience: str, jwks: JWKSCache,
+                 leeway: int = OIDC_LEEWAY_SECONDS, cache_size: int = OIDC_TOKEN_CACHE_SIZE):
+        self.issuer = issuer
+        self.audience = audience
+        self.jwks = jwks
+        self.leeway = leeway
+        self.tokens = LRUCache(maxsize=cache_size)
+        self.verified = 0
+        self.rejected = 0
+
+    def accepts(self, token: str) -> bool:
+        """
+        ¿Es un token de este proveedor? (firmado con un algoritmo aceptado;
+        los tokens propios van con HS256)
+        """
+        try:
+            return _jose().jwt.get_unverified_header(token).get("alg") in OIDC_ALGORITHMS
+        except Exception:
+            return False
+
+    def verify(self, token: str) -> dict:
+        """
+        Claims del token si es válido; InvalidToken si no
+        """
+        claims = self.tokens.get(token)
+        if claims is not None:
+            return claims
+        jose = _jose()
+        try:
+            header = jose.jwt.get_unverified_header(token)
+            if header.get("alg") not in OIDC_ALGORITHMS:
+                raise InvalidToken("Algoritmo no aceptado")
+            key = self.jwks.get(header.get("kid"))
+            claims = jose.jwt.decode(
+                token, key, algorithms=[header["alg"]], issuer=self.issuer,
+                options={"verify_aud": False, "require_exp": True, "require_sub": True, "leeway": self.leeway}
+            )
+        except InvalidToken:
+            self.rejected += 1
+            raise
+        except jose.JWTError as exc:
+            self.rejected += 1
+            raise InvalidToken(str(exc))
+        # Keycloak pone el cliente en `azp`; `aud` suele ser "account"
+        audience = claims.get("aud", [])
+        if isinstance(audience, str):
+            audience = [audience]
+        if self.audience not in audience and claims.get("azp") != self.audience:
+            self.rejected += 1
+            raise InvalidToken("Audiencia no válida")
+        self.verified += 1
+        self.tokens.set(token, claims, ttl=max(0, claims["exp"] + self.leeway - time.time()))
+        return claims
+
+    def stats(self) -> dict:
+        return {
+            "verified": self.verified,
+            "rejected": self.rejected,
+            "token_cache": self.tokens.stats(),
+            "jwks": self.jwks.stats(),
+        }
+
+
+def map_role(claims: dict, client_id: str = OIDC_AUDIENCE) -> str:
+    """
+    Rol de la aplicación a partir de los roles del realm y del cliente
+    """
+    roles = set(claims.get("realm_access", {}).get("roles", []))
+    roles.update(claims.get("resource_access", {}).get(client_id, {}).get("roles", []))
+    for role in ROLE_PRIORITY:
+        if role in roles:
+            return role
+    return DEFAULT_ROLE
+
+
+def find_user(db: Session, claims: dict) -> Optional[User]:
+    """
+    Usuario local de un token (por `sub`)
+    """
+    return db.query(User).filter(User.keycloak_id == claims["sub"]).first()
+
+
+def sync_user(db: Session, claims: dict, hashed_password: Optional[str] = None) -> Optional[User]:
+    """
+    Usuario local del token, actualizado solo si su rol o correo cambiaron.
+    Si no existe se crea con `hashed_password`; sin ella devuelve None.
+    InvalidToken si al token le falta el nombre de usuario o este (o el
+    correo) ya pertenece a otra cuenta.
+    """
+    username = claims.get("preferred_username")
+    if not username:
+        # Tokens de client-credentials o mappers sin el claim
+        raise InvalidToken("Token sin preferred_username")
+    user = find_user(db, claims)
+    role = map_role(claims)
+    email = claims.get("email") or f"{username}@biblioteca.com"
+    if user is None:
+        if hashed_password is None:
+            return None
+        user = User(email=email, username=username, full_name=claims.get("name") or username.title(),
+                    hashed_password=hashed_password, role=role, keycloak_id=claims["sub"])
+        db.add(user)
+    elif (user.role, user.email) != (role, email):
+        user.role, user.email = role, email
+    else:
+        return user
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        # Otra petición con el mismo token nuevo lo creó a la vez, o el
+        # correo nuevo ya es de otra cuenta: el rol se aplica igualmente
+        user = find_user(db, claims)
+        if user is None:
+            raise InvalidToken("El nombre de usuario o el correo ya pertenecen a otra cuenta")
+        if user.role == role:
+            return user
+        user.role = role
+        db.commit()
+    db.refresh(user)
+    return user
+
+
+verifier = OIDCVerifier(
+    OIDC_ISSUER, OIDC_AUDIENCE,
+    JWKSCache(OIDC_JWKS_URL, OIDC_JWKS_TTL_SECONDS, OIDC_JWKS_MIN_REFRESH_SECONDS)
+) if OIDC_ENABLED else None
@@ -0,0 +1,76 @@
+# app/pagination.py
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import DateTime, bindparam, tuple_
+from sqlalchemy.orm import Query
+
+# Paginación por cursor (keyset): cada página continúa desde la clave
+# (sort_key, id) de la última fila entregada, por lo que el coste de una
+# página no depende de su profundidad (a diferencia de OFFSET).
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(values) -> str:
+    """
+    Codificar los valores de la clave de orden en un token opaco
+    """
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys) -> list:
+    """
+    Decodificar un token generado por encode_cursor para las claves dadas
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError("longitud incorrecta")
+        return [
+            datetime.fromisoformat(value) if isinstance(key.type, DateTime) else value
+            for key, value in zip(keys, values)
+        ]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def paginate(
+    query: Query,
+    keys: list,
+    cursor: Optional[str],
+    limit: int,
+    descending: bool = False
+) -> Tuple[List, Optional[str]]:
+    """
+    Devolver una página de `query` ordenada por `keys` (la última clave
+    debe ser única, normalmente el id) y el cursor de la página siguiente.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    if cursor:
+        values = decode_cursor(cursor, keys)
+        bound = tuple_(*[
+            bindparam(None, value, type_=key.type) for key, value in zip(keys, values)
+        ])
+        position = tuple_(*keys)
+        query = query.filter(position < bound if descending else position > bound)
+
+    # Consulta de una entidad: se devuelven los objetos; de varias
+    # columnas: las filas sin las claves de orden añadidas
+    width = len(query.column_descriptions)
+    order = [key.desc() for key in keys] if descending else list(keys)
+    rows = query.add_columns(*keys).order_by(None).order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][width:])
+    if width == 1:
+        return [row[0] for row in rows], next_cursor
+    return [row[:width] for row in rows], next_cursor
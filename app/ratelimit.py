@@ -0,0 +1,203 @@
+# app/ratelimit.py
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+from fastapi import HTTPException, Request, status
+from app.config import (
+    RATE_LIMIT_ENABLED, RATE_LIMIT_MAX_KEYS, RATE_LIMIT_LOGIN, RATE_LIMIT_LOGIN_USER,
+    RATE_LIMIT_REGISTER, RATE_LIMIT_SEARCH, RATE_LIMIT_SEARCH_USER, MAX_CONCURRENT_REQUESTS,
+    OVERLOAD_RETRY_AFTER_SECONDS,
+)
+
+# Protección de los endpoints caros (bcrypt en login/registro, búsqueda en
+# el catálogo) frente a un único cliente que sature el servidor.
+# - Límite por cliente: cubo de fichas (token bucket) por clave (IP, y
+#   usuario en el login y en la búsqueda). Cada petición cuesta O(1): leer el cubo, rellenarlo
+#   con el tiempo transcurrido y gastar una ficha. Los cubos viven en un
+#   LRU acotado (RATE_LIMIT_MAX_KEYS); un cubo expulsado vuelve lleno, que
+#   es lo mismo que tendría tras un rato sin peticiones. Se responde 429
+#   con Retry-After antes de tocar la base de datos o bcrypt.
+# - Límite global: ConcurrencyLimitMiddleware rechaza con 503 las peticiones
+#   que superan MAX_CONCURRENT_REQUESTS en curso, antes de ejecutar nada.
+#   /health y /metrics no se rechazan nunca.
+# Los límites se expresan como "peticiones/segundos" (p. ej. "10/60"); se
+# configuran por ruta en app/config.py y se exportan en GET /metrics.
+
+
+def parse_limit(value: str) -> Optional[Tuple[int, float]]:
+    """
+    "10/60" -> (10, 60.0); "" o "0" -> None (sin límite)
+    """
+    value = value.strip()
+    if not value or value == "0":
+        return None
+    requests, _, seconds = value.partition("/")
+    return int(requests), float(seconds or 1)
+
+
+class RateLimiter:
+    """
+    Cubos de fichas por clave: `requests` de ráfaga que se reponen a razón
+    de requests/seconds por segundo
+    """
+
+    def __init__(self, name: str, requests: int, seconds: float, maxsize: int = RATE_LIMIT_MAX_KEYS):
+        self.name = name
+        self.burst = requests
+        self.rate = requests / seconds
+        self.maxsize = maxsize
+        self.allowed = 0
+        self.rejected = 0
+        self._buckets: "OrderedDict[object, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key) -> float:
+        """
+        Gastar una ficha de `key`: 0 si hay, o segundos hasta la siguiente
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now]
+                if len(self._buckets) > self.maxsize:
+                    self._buckets.popitem(last=False)
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                self._buckets.move_to_end(key)
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                self.allowed += 1
+                return 0.0
+            self.rejected += 1
+            return (1 - bucket[0]) / self.rate
+
+    def stats(self) -> dict:
+        return {
+            "burst": self.burst,
+            "per_second": round(self.rate, 4),
+            "keys": len(self._buckets),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
+
+
+class RateLimits:
+    """
+    Límites configurados, por nombre; `enabled` los desactiva todos
+    """
+
+    def __init__(self, enabled: bool = RATE_LIMIT_ENABLED):
+        self.enabled = enabled
+        self.limiters: Dict[str, RateLimiter] = {}
+
+    def configure(self, name: str, value: str):
+        limit = parse_limit(value)
+        if limit is None:
+            self.limiters.pop(name, None)
+        else:
+            self.limiters[name] = RateLimiter(name, *limit)
+
+    def check(self, name: str, key):
+        """
+        429 si `key` ha agotado su límite `name`
+        """
+        limiter = self.limiters.get(name)
+        if not self.enabled or limiter is None:
+            return
+        wait = limiter.acquire(key)
+        if wait:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Demasiadas peticiones, inténtalo más tarde",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+    def stats(self) -> dict:
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
+
+
+rate_limits = RateLimits()
+rate_limits.configure("login", RATE_LIMIT_LOGIN)
+rate_limits.configure("login_user", RATE_LIMIT_LOGIN_USER)
+rate_limits.configure("register", RATE_LIMIT_REGISTER)
+rate_limits.configure("search", RATE_LIMIT_SEARCH)
+rate_limits.configure("search_user", RATE_LIMIT_SEARCH_USER)
+
+
+def client_ip(request: Request) -> str:
+    # Detrás de un proxy, uvicorn --proxy-headers ya pone aquí X-Forwarded-For
+    return request.client.host if request.client else "-"
+
+
+def rate_limit(name: str, key: Callable[[Request], object] = client_ip):
+    """
+    Dependencia que aplica el límite `name` a la clave de la petición
+    (por defecto, la IP del cliente); key() puede devolver None para no
+    limitar esa petición
+    """
+    async def limiter(request: Request):
+        value = key(request)
+        if value is not None:
+            rate_limits.check(name, value)
+    return limiter
+
+
+class ConcurrencyLimit:
+    """
+    Peticiones en curso y rechazadas por encima de `limit` (0 = sin límite)
+    """
+
+    def __init__(self, limit: int, retry_after: int):
+        self.limit = limit
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.shed = 0
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "in_flight": self.in_flight, "shed": self.shed}
+
+
+concurrency_limit = ConcurrencyLimit(MAX_CONCURRENT_REQUESTS, OVERLOAD_RETRY_AFTER_SECONDS)
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Middleware ASGI: 503 inmediato por encima del límite de peticiones en curso
+    """
+
+    EXEMPT_PATHS = ("/health", "/metrics")
+    BODY = json.dumps({"detail": "Servidor saturado, inténtalo más tarde"}).encode()
+
+    def __init__(self, app, state: ConcurrencyLimit = concurrency_limit):
+        self.app = app
+        self.state = state
+
+    async def __call__(self, scope, receive, send):
+        state = self.state
+        if scope["type"] != "http" or state.limit <= 0 or scope["path"] in self.EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        # Un solo hilo (el bucle de eventos): los contadores no necesitan lock
+        if state.in_flight >= state.limit:
+            state.shed += 1
+            await send({
+                "type": "http.response.start",
+                "status": status.HTTP_503_SERVICE_UNAVAILABLE,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(self.BODY)).encode()),
+                    (b"retry-after", str(state.retry_after).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": self.BODY})
+            return
+        state.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            state.in_flight -= 1
@@ -1,15 +1,23 @@
 # app/routers/auth.py
-from fastapi import APIRouter, Depends, HTTPException, status, Form
+from fastapi import APIRouter, Depends, HTTPException, status, Form, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
-from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from app.database import get_database
-from app.models.models import User, UserCreate, UserResponse, Token
-import requests
+from functools import lru_cache
+from app.database import get_database, DatabaseSession
+from app.models.models import User, UserCreate, UserResponse, Token, CurrentUser
+from app.cache import LRUCache
+from app.config import USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS
+from app.hashing import hasher, hash_password_sync, verify_password_sync
+from app.invalidation import record_change, USER
+from app import oidc
+from app.ratelimit import rate_limits, rate_limit, client_ip
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
-import os
+import secrets
+import threading
+import time
 
 router = APIRouter()
 
@@ -18,20 +26,26 @@ SECRET_KEY = "tu-clave-secreta-super-segura-aqui"  # En producción usar variabl
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Configuración Keycloak
-KEYCLOAK_URL = "http://localhost:8080"  # Cambiar por tu instancia
-KEYCLOAK_REALM = "biblioteca"
-KEYCLOAK_CLIENT_ID = "biblioteca-app"
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
+# Caché de tokens ya validados -> usuario (evita una consulta por petición)
+user_cache = LRUCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+# python-jose (y sus backends criptográficos) se importa al primer token
+# emitido o validado: importar la aplicación no paga ese coste
+@lru_cache(maxsize=None)
+def _jose():
+    import jose
+    import jose.jwt
+    return jose
 
 # Funciones de utilidad
+# Versiones síncronas (scripts como init_data.py); los endpoints usan el
+# pool de procesos de app/hashing.py
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return verify_password_sync(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return hash_password_sync(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -40,7 +54,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = _jose().jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 def get_user_by_email(db: Session, email: str):
@@ -49,38 +63,138 @@ def get_user_by_email(db: Session, email: str):
 def get_user_by_username(db: Session, username: str):
     return db.query(User).filter(User.username == username).first()
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = get_user_by_username(db, username)
+async def authenticate_user(db: DatabaseSession, username: str, password: str):
+    user = await db.run_sync(get_user_by_username, username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    # bcrypt es costoso en CPU: se ejecuta en el pool de procesos
+    if not await hasher.verify(password, user.hashed_password):
         return False
     return user
 
+# Se incrementa con cada invalidación: una resolución de token que empezó
+# antes no deja en la caché un usuario que pudo leerse con el dato viejo.
+# Las invalidaciones llegan desde after_commit en varios hilos: el
+# incremento y la comprobación + escritura en la caché van con el lock
+_user_generation = 0
+_generation_lock = threading.Lock()
+
+def invalidate_user(username: str):
+    """
+    Descartar de la caché los tokens de un usuario (cambio de rol o de estado)
+    """
+    global _user_generation
+    with _generation_lock:
+        _user_generation += 1
+        return user_cache.invalidate_where(lambda cached: cached.username == username)
+
+def _pending_invalidations(session) -> set:
+    return session.info.setdefault("invalidate_users", set())
+
+@event.listens_for(User, "after_update")
+def _invalidate_changed_user(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.role.history.has_changes() or state.attrs.is_active.history.has_changes():
+        # La caché se limpia al confirmar (ver _invalidate_committed_users):
+        # hacerlo aquí, en el flush, deja que otra petición vuelva a leer y
+        # cachear el rol viejo antes del commit
+        _pending_invalidations(state.session).add(target.username)
+        # Los demás workers lo ven al confirmarse esta misma transacción
+        record_change(connection, USER, target.username)
+
+@event.listens_for(User, "after_delete")
+def _invalidate_deleted_user(mapper, connection, target):
+    _pending_invalidations(inspect(target).session).add(target.username)
+    record_change(connection, USER, target.username)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    for username in session.info.pop("invalidate_users", ()):
+        invalidate_user(username)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_invalidations(session):
+    session.info.pop("invalidate_users", None)
+
+async def _oidc_user(db: DatabaseSession, claims: dict) -> User:
+    """
+    Usuario local de un token de Keycloak, creado o actualizado solo si hace falta
+    """
+    user = await db.run_sync(oidc.sync_user, claims)
+    if user is None:
+        # Primer acceso: contraseña local imposible de adivinar (entra por SSO)
+        hashed_password = await hasher.hash(secrets.token_urlsafe(32))
+        user = await db.run_sync(oidc.sync_user, claims, hashed_password)
+    return user
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_database)
-):
+    db: DatabaseSession = Depends(get_database)
+) -> CurrentUser:
+    token = credentials.credentials
+    cached = user_cache.get(token)
+    if cached is not None:
+        return cached
+    generation = _user_generation
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudieron validar las credenciales",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    if oidc.verifier is not None and oidc.verifier.accepts(token):
+        # Access token de Keycloak (ver app/oidc.py)
+        try:
+            payload = await run_in_threadpool(oidc.verifier.verify, token)
+            user = await _oidc_user(db, payload)
+        except oidc.InvalidToken:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = get_user_by_username(db, username=username)
+    else:
+        jose = _jose()
+        try:
+            payload = jose.jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            username: str = payload.get("sub")
+            if username is None:
+                raise credentials_exception
+        except jose.JWTError:
+            raise credentials_exception
+
+        user = await db.run_sync(get_user_by_username, username)
     if user is None:
         raise credentials_exception
-    return user
+    if not user.is_active:
+        # Cuenta desactivada: sus tokens dejan de valer aunque no hayan expirado
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Usuario inactivo",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # Nunca mantener en caché un token más allá de su expiración
+    current_user = CurrentUser.model_validate(user)
+    ttl = USER_CACHE_TTL_SECONDS
+    if payload.get("exp"):
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        with _generation_lock:
+            if generation == _user_generation:
+                user_cache.set(token, current_user, ttl=ttl)
+    return current_user
+
+async def get_optional_user(request: Request, db: DatabaseSession) -> Optional[CurrentUser]:
+    """
+    Usuario del Bearer de una ruta pública; None sin token o si no es válido
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return await get_current_user(HTTPAuthorizationCredentials(scheme=scheme, credentials=token), db)
+    except HTTPException:
+        return None
 
 def require_role(required_role: str):
-    def role_checker(current_user: User = Depends(get_current_user)):
+    async def role_checker(current_user: CurrentUser = Depends(get_current_user)):
         if current_user.role != required_role and current_user.role != "admin":
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -90,8 +204,7 @@ def require_role(required_role: str):
     return role_checker
 
 # Endpoints
-@router.post("/register", response_model=UserResponse)
-def register_user(user: UserCreate, db: Session = Depends(get_database)):
+def _ensure_new_user(db: Session, user: UserCreate):
     # Verificar si el usuario ya existe
     db_user = get_user_by_email(db, email=user.email)
     if db_user:
@@ -106,9 +219,8 @@ def register_user(user: UserCreate, db: Session = Depends(get_database)):
             status_code=400,
             detail="El username ya está en uso"
         )
-    
-    # Crear usuario
-    hashed_password = get_password_hash(user.password)
+
+def _create_user(db: Session, user: UserCreate, hashed_password: str):
     db_user = User(
         email=user.email,
         username=user.username,
@@ -119,15 +231,29 @@ def register_user(user: UserCreate, db: Session = Depends(get_database)):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
-    return db_user
+    return UserResponse.model_validate(db_user)
+
+async def _login_rate_limit(request: Request, username: str = Form(...)):
+    # Por IP (un script contra muchas cuentas) y por usuario (muchas IPs
+    # contra una cuenta), antes de bcrypt
+    rate_limits.check("login", client_ip(request))
+    rate_limits.check("login_user", username.lower())
 
-@router.post("/login", response_model=Token)
-def login_user(
+@router.post("/register", response_model=UserResponse, dependencies=[Depends(rate_limit("register"))])
+async def register_user(user: UserCreate, db: DatabaseSession = Depends(get_database)):
+    await db.run_sync(_ensure_new_user, user)
+    
+    # Crear usuario
+    hashed_password = await hasher.hash(user.password)
+    return await db.run_sync(_create_user, user, hashed_password)
+
+@router.post("/login", response_model=Token, dependencies=[Depends(_login_rate_limit)])
+async def login_user(
     username: str = Form(...), 
     password: str = Form(...), 
-    db: Session = Depends(get_database)
+    db: DatabaseSession = Depends(get_database)
 ):
-    user = authenticate_user(db, username, password)
+    user = await authenticate_user(db, username, password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -146,14 +272,33 @@ def login_user(
     }
 
 @router.get("/me", response_model=UserResponse)
-def read_users_me(current_user: User = Depends(get_current_user)):
-    return current_user
+async def read_users_me(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: DatabaseSession = Depends(get_database)
+):
+    user = await db.run_sync(get_user_by_username, current_user.username)
+    return UserResponse.model_validate(user)
+
+def _create_keycloak_user(db: Session, keycloak_response: dict, hashed_password: str):
+    username = keycloak_response["username"]
+    user = User(
+        email=keycloak_response["email"],
+        username=username,
+        full_name=username.title(),
+        hashed_password=hashed_password,
+        role="estudiante",
+        keycloak_id=keycloak_response["access_token"]
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
 
 @router.post("/keycloak/login")
-def keycloak_login(
+async def keycloak_login(
     username: str = Form(...), 
     password: str = Form(...), 
-    db: Session = Depends(get_database)
+    db: DatabaseSession = Depends(get_database)
 ):
     """
     Login usando Keycloak SSO
@@ -170,21 +315,11 @@ def keycloak_login(
         }
         
         # Buscar o crear usuario basado en datos de Keycloak
-        user = get_user_by_username(db, username)
+        user = await db.run_sync(get_user_by_username, username)
         if not user:
             # Crear usuario automáticamente desde Keycloak
-            hashed_password = get_password_hash("keycloak-managed")
-            user = User(
-                email=keycloak_response["email"],
-                username=username,
-                full_name=username.title(),
-                hashed_password=hashed_password,
-                role="estudiante",
-                keycloak_id=keycloak_response["access_token"]
-            )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
+            hashed_password = await hasher.hash("keycloak-managed")
+            user = await db.run_sync(_create_keycloak_user, keycloak_response, hashed_password)
         
         # Crear nuestro JWT
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -201,24 +336,33 @@ def keycloak_login(
             "two_factor_enabled": user.two_factor_enabled
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Error en autenticación SSO"
         )
 
+def _enable_2fa(db: Session, username: str):
+    user = get_user_by_username(db, username)
+    user.two_factor_enabled = True
+    db.commit()
+
 @router.post("/2fa/enable")
-def enable_2fa(current_user: User = Depends(get_current_user), db: Session = Depends(get_database)):
+async def enable_2fa(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: DatabaseSession = Depends(get_database)
+):
     """
     Habilitar 2FA (simulado)
     En producción integrarías con SMS/Email/TOTP
     """
-    current_user.two_factor_enabled = True
-    db.commit()
+    await db.run_sync(_enable_2fa, current_user.username)
     return {"message": "2FA habilitado correctamente", "qr_code": "data:image/png;base64,fake-qr"}
 
 @router.post("/2fa/verify")
-def verify_2fa(code: str = Form(...), current_user: User = Depends(get_current_user)):
+async def verify_2fa(code: str = Form(...), current_user: CurrentUser = Depends(get_current_user)):
     """
     Verificar código 2FA (simulado)
     """
@@ -228,4 +372,18 @@ def verify_2fa(code: str = Form(...), current_user: User = Depends(get_current_u
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Código 2FA inválido"
-        )
\ No newline at end of file
+        )
+
+@router.get("/admin/cache")
+async def user_cache_stats(admin: CurrentUser = Depends(require_role("admin"))):
+    """
+    Estadísticas de la caché de usuarios autenticados (solo administradores)
+    """
+    return user_cache.stats()
+
+@router.get("/admin/hashing")
+async def hashing_stats(admin: CurrentUser = Depends(require_role("admin"))):
+    """
+    Estado del pool de bcrypt: profundidad de cola y latencias (solo administradores)
+    """
+    return hasher.stats()
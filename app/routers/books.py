@@ -1,9 +1,36 @@
 # app/routers/books.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Form
-from sqlalchemy.orm import Session
-from app.database import get_database
-from app.models.models import Book, User, Reservation, BookCreate, BookResponse, ReservationResponse
-from app.routers.auth import get_current_user, require_role
+from fastapi import APIRouter, Depends, HTTPException, Query, Form, File, UploadFile, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, insert, delete, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
+from app.database import get_database, DatabaseSession
+from app.models.models import (
+    Book, Reservation, Hold, BookCreate, BookResponse,
+    BookPage, ReservationPage, CurrentUser, BatchRequest, BatchItemResult, BatchResult,
+    BookStats, BookRanking, ReservationSummary, HoldResponse, Suggestion
+)
+from app.routers.auth import get_current_user, get_optional_user, require_role
+from app.search import apply_search, fuzzy_search
+from app.pagination import paginate, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.importer import import_books, detect_format
+from app.export import export_statement, iter_export, MEDIA_TYPES
+from app.sweeper import sweeper
+from app.catalog_cache import catalog_cache
+from app.suggest import suggest_index
+from app.config import SUGGEST_MAX_RESULTS
+from app.ratelimit import rate_limits, client_ip
+from app.serialization import book_rows, reservation_rows, book_dict, reservation_dict, dump_page, json_response
+from app.inventory import (
+    ACTIVE, VALID_STATUSES, RETURNED, OVERDUE,
+    take_copy, release_copy, close_active_reservation, set_reservation_status,
+    take_copies, release_copies, close_active_reservations,
+    record_new_reservations, record_status_changes, hand_off
+)
+from app.stats import top_books, reservation_summary, unavailable_books_query
+from collections import Counter
+import orjson
 from typing import List, Optional
 from datetime import datetime, timedelta
 
@@ -13,8 +40,8 @@ router = APIRouter()
 def get_book_by_id(db: Session, book_id: int):
     return db.query(Book).filter(Book.id == book_id).first()
 
-def get_books(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Book).offset(skip).limit(limit).all()
+def get_books(db: Session, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE):
+    return paginate(db.query(Book), [Book.title, Book.id], cursor, limit)
 
 def create_book(db: Session, book: BookCreate):
     db_book = Book(**book.dict(), available_copies=book.total_copies)
@@ -24,77 +51,108 @@ def create_book(db: Session, book: BookCreate):
     return db_book
 
 # Endpoints públicos (solo lectura)
-@router.get("/", response_model=List[BookResponse])
-def list_books(
-    skip: int = 0, 
-    limit: int = 100,
+# Cada endpoint es async y delega el trabajo con la base de datos en una
+# función síncrona mediante `db.run_sync` (ver app/database.py).
+def _list_books(db: Session, cursor: Optional[str], limit: int, search: Optional[str], fuzzy: bool = False) -> bytes:
+    # Solo las columnas de BookResponse, serializadas con orjson
+    # (ver app/serialization.py)
+    query = book_rows(db)
+    keys = [Book.title, Book.id]
+    
+    if search and fuzzy:
+        # Tolerante a errores: una sola página, ordenada por similitud
+        rows = fuzzy_search(query, search, max(1, min(limit, MAX_PAGE_SIZE)))
+        return dump_page([book_dict(row) for row in rows], None)
+    if search:
+        # Índice FTS5 con ranking BM25 (ver app/search.py)
+        query, keys = apply_search(query, search)
+    
+    rows, next_cursor = paginate(query, keys, cursor, limit)
+    return dump_page([book_dict(row) for row in rows], next_cursor)
+
+async def _search_rate_limit(request: Request, db: DatabaseSession = Depends(get_database)):
+    # Solo las búsquedas: el listado simple sale casi siempre de la caché.
+    # Por IP y, con token, por usuario (una cuenta desde muchas IPs)
+    if not request.query_params.get("search"):
+        return
+    rate_limits.check("search", client_ip(request))
+    user = await get_optional_user(request, db)
+    if user is not None:
+        rate_limits.check("search_user", user.username)
+
+@router.get("/", response_model=BookPage, dependencies=[Depends(_search_rate_limit)])
+async def list_books(
+    request: Request,
+    cursor: Optional[str] = Query(None, description="Cursor devuelto como next_cursor"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     search: Optional[str] = Query(None, description="Buscar por título o autor"),
-    db: Session = Depends(get_database)
+    fuzzy: bool = Query(False, description="Tolerar errores de escritura en la búsqueda (sin cursor)"),
+    db: DatabaseSession = Depends(get_database)
 ):
     """
     Listar todos los libros disponibles (público)
+    Ordenados por título, o por relevancia si hay búsqueda
+    (por similitud con fuzzy=true: "cervantez" encuentra "Cervantes").
+    Admite GET condicional (ETag / If-None-Match)
     """
-    query = db.query(Book)
-    
-    if search:
-        query = query.filter(
-            (Book.title.contains(search)) | 
-            (Book.author.contains(search))
-        )
-    
-    books = query.offset(skip).limit(limit).all()
-    return books
+    key, cached = catalog_cache.lookup(request)
+    if cached is not None:
+        return cached
+    body = await db.run_sync(_list_books, cursor, limit, search, fuzzy)
+    return catalog_cache.store(request, key, body)
+
+@router.get("/suggest", response_model=List[Suggestion])
+async def suggest_books(
+    q: str = Query(..., min_length=1, max_length=100, description="Lo escrito hasta ahora"),
+    limit: int = Query(SUGGEST_MAX_RESULTS, ge=1, le=SUGGEST_MAX_RESULTS)
+):
+    """
+    Sugerencias de títulos y autores mientras se escribe (público).
+    Palabras que empiezan por `q`, de más a menos reservadas; se responden
+    desde memoria (ver app/suggest.py), sin consultar la base de datos
+    """
+    return json_response(orjson.dumps(suggest_index.suggest(q, limit)))
 
 @router.get("/{book_id}", response_model=BookResponse)
-def get_book(book_id: int, db: Session = Depends(get_database)):
+async def get_book(request: Request, book_id: int, db: DatabaseSession = Depends(get_database)):
     """
-    Obtener detalles de un libro específico
+    Obtener detalles de un libro específico.
+    Admite GET condicional (ETag / If-None-Match)
     """
-    book = get_book_by_id(db, book_id)
+    key, cached = catalog_cache.lookup(request)
+    if cached is not None:
+        return cached
+    book = await db.run_sync(get_book_by_id, book_id)
     if book is None:
         raise HTTPException(status_code=404, detail="Libro no encontrado")
-    return book
+    return catalog_cache.store(request, key, BookResponse.model_validate(book))
 
 # Endpoints que requieren autenticación
-@router.post("/{book_id}/reserve")
-def reserve_book(
-    book_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_database)
-):
-    """
-    Reservar un libro (requiere autenticación)
-    """
-    book = get_book_by_id(db, book_id)
-    if not book:
-        raise HTTPException(status_code=404, detail="Libro no encontrado")
-    
-    if book.available_copies <= 0:
+def _reserve_book(db: Session, user_id: int, book_id: int):
+    # Descuento atómico: solo tiene éxito si queda alguna copia
+    if not take_copy(db, book_id):
+        db.rollback()
+        if not get_book_by_id(db, book_id):
+            raise HTTPException(status_code=404, detail="Libro no encontrado")
         raise HTTPException(status_code=400, detail="No hay copias disponibles")
     
-    # Verificar si el usuario ya tiene este libro reservado
-    existing_reservation = db.query(Reservation).filter(
-        Reservation.user_id == current_user.id,
-        Reservation.book_id == book_id,
-        Reservation.status == "activa"
-    ).first()
-    
-    if existing_reservation:
-        raise HTTPException(status_code=400, detail="Ya tienes este libro reservado")
-    
     # Crear reserva
     due_date = datetime.utcnow() + timedelta(days=14)  # 2 semanas
     reservation = Reservation(
-        user_id=current_user.id,
+        user_id=user_id,
         book_id=book_id,
         due_date=due_date
     )
-    
-    # Reducir copias disponibles
-    book.available_copies -= 1
-    
     db.add(reservation)
-    db.commit()
+    record_new_reservations(db, [book_id])
+    
+    # El índice único uq_reservations_active impide dos reservas activas
+    # del mismo libro por usuario; el rollback devuelve la copia descontada
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Ya tienes este libro reservado")
     db.refresh(reservation)
     
     return {
@@ -103,144 +161,500 @@ def reserve_book(
         "due_date": due_date
     }
 
-@router.get("/my/reservations", response_model=List[ReservationResponse])
-def my_reservations(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_database)
+@router.post("/{book_id}/reserve")
+async def reserve_book(
+    book_id: int,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: DatabaseSession = Depends(get_database)
 ):
     """
-    Ver mis reservas actuales
+    Reservar un libro (requiere autenticación)
     """
-    reservations = db.query(Reservation).filter(
-        Reservation.user_id == current_user.id
-    ).all()
-    return reservations
+    result = await db.run_sync(_reserve_book, current_user.id, book_id)
+    catalog_cache.bump()
+    return result
 
-@router.put("/{book_id}/return")
-def return_book(
+# Cola de espera: cuando no quedan copias el usuario se apunta una vez y
+# recibe la reserva automáticamente al liberarse una copia (ver
+# app/inventory.py: hand_off), en lugar de reintentar la reserva
+def _queue_position(db: Session, hold_id: int, book_id: int) -> int:
+    return db.execute(
+        select(func.count()).select_from(Hold).where(Hold.book_id == book_id, Hold.id <= hold_id)
+    ).scalar()
+
+def _hold_book(db: Session, user_id: int, book_id: int):
+    # Primero la escritura: con el bloqueo de escritura tomado, una
+    # devolución anterior ya es visible y una posterior verá esta entrada
+    hold = Hold(user_id=user_id, book_id=book_id)
+    db.add(hold)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Ya estás en la cola de este libro")
+
+    book = get_book_by_id(db, book_id)
+    if not book:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Libro no encontrado")
+    if book.available_copies > 0:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Hay copias disponibles: reserva el libro directamente")
+    holding = db.query(Reservation.id).filter(
+        Reservation.user_id == user_id,
+        Reservation.book_id == book_id,
+        Reservation.status == ACTIVE
+    ).first()
+    if holding:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Ya tienes este libro reservado")
+
+    position = _queue_position(db, hold.id, book_id)
+    hold_id = hold.id
+    db.commit()
+    return {
+        "message": "Te has unido a la cola de espera",
+        "hold_id": hold_id,
+        "position": position
+    }
+
+@router.post("/{book_id}/hold")
+async def hold_book(
     book_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_database)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: DatabaseSession = Depends(get_database)
 ):
     """
-    Devolver un libro reservado
+    Apuntarse a la cola de espera de un libro sin copias (requiere autenticación).
+    Al devolverse una copia se reserva automáticamente para el primero de la cola.
     """
-    reservation = db.query(Reservation).filter(
-        Reservation.user_id == current_user.id,
-        Reservation.book_id == book_id,
-        Reservation.status == "activa"
-    ).first()
-    
-    if not reservation:
+    return await db.run_sync(_hold_book, current_user.id, book_id)
+
+def _cancel_hold(db: Session, user_id: int, book_id: int):
+    result = db.execute(delete(Hold).where(Hold.user_id == user_id, Hold.book_id == book_id))
+    if result.rowcount != 1:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="No estás en la cola de este libro")
+    db.commit()
+
+@router.delete("/{book_id}/hold")
+async def cancel_hold(
+    book_id: int,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: DatabaseSession = Depends(get_database)
+):
+    """
+    Salir de la cola de espera de un libro
+    """
+    await db.run_sync(_cancel_hold, current_user.id, book_id)
+    return {"message": "Has salido de la cola de espera"}
+
+def _list_holds(db: Session, user_id: int):
+    holds = db.query(Hold).options(joinedload(Hold.book)).filter(Hold.user_id == user_id).order_by(Hold.id).all()
+    return [
+        HoldResponse(
+            id=hold.id, position=_queue_position(db, hold.id, hold.book_id),
+            created_at=hold.created_at, book=BookResponse.model_validate(hold.book)
+        )
+        for hold in holds
+    ]
+
+@router.get("/my/holds", response_model=List[HoldResponse])
+async def my_holds(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: DatabaseSession = Depends(get_database)
+):
+    """
+    Ver mis colas de espera y mi posición en cada una
+    """
+    return await db.run_sync(_list_holds, current_user.id)
+
+def _list_reservations(db: Session, user_id: Optional[int], cursor: Optional[str], limit: int) -> bytes:
+    # El libro se lee en la misma consulta (evita un SELECT por reserva);
+    # filas serializadas con orjson (ver app/serialization.py)
+    query = reservation_rows(db)
+    if user_id is not None:
+        query = query.filter(Reservation.user_id == user_id)
+    rows, next_cursor = paginate(
+        query, [Reservation.reservation_date, Reservation.id], cursor, limit, descending=True
+    )
+    return dump_page([reservation_dict(row) for row in rows], next_cursor)
+
+@router.get("/my/reservations", response_model=ReservationPage)
+async def my_reservations(
+    cursor: Optional[str] = Query(None, description="Cursor devuelto como next_cursor"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: DatabaseSession = Depends(get_database)
+):
+    """
+    Ver mis reservas actuales (más recientes primero)
+    """
+    return json_response(await db.run_sync(_list_reservations, current_user.id, cursor, limit))
+
+def _return_book(db: Session, user_id: int, book_id: int):
+    # Marcar como devuelto solo si la reserva sigue activa
+    if not close_active_reservation(db, user_id, book_id, RETURNED):
+        db.rollback()
         raise HTTPException(status_code=404, detail="No tienes este libro reservado")
     
-    # Marcar como devuelto
-    reservation.status = "devuelto"
-    reservation.return_date = datetime.utcnow()
-    
     # Aumentar copias disponibles
-    book = get_book_by_id(db, book_id)
-    book.available_copies += 1
-    
+    release_copy(db, book_id)
+    record_status_changes(db, ACTIVE, RETURNED, [book_id])
     db.commit()
-    
+
+@router.put("/{book_id}/return")
+async def return_book(
+    book_id: int,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: DatabaseSession = Depends(get_database)
+):
+    """
+    Devolver un libro reservado
+    """
+    await db.run_sync(_return_book, current_user.id, book_id)
+    catalog_cache.bump()
     return {"message": "Libro devuelto exitosamente"}
 
+# Operaciones por lotes: una transacción, un UPDATE por paso para todos los
+# libros y un solo commit, con el resultado de cada libro
+def _batch_result(book_ids: List[int], mode: str, errors: dict, done: dict) -> BatchResult:
+    applied = bool(done) and (mode == "partial" or not errors)
+    items = []
+    for book_id in book_ids:
+        if book_id in errors:
+            items.append(BatchItemResult(book_id=book_id, ok=False, detail=errors[book_id]))
+        elif applied:
+            items.append(BatchItemResult(book_id=book_id, ok=True, **done[book_id]))
+        else:
+            items.append(BatchItemResult(book_id=book_id, ok=False, detail="No aplicado: otro libro del lote falló"))
+    succeeded = len(done) if applied else 0
+    return BatchResult(
+        mode=mode, applied=applied, succeeded=succeeded,
+        failed=len(book_ids) - succeeded, items=items
+    )
+
+def _reserve_books(db: Session, user_id: int, book_ids: List[int], mode: str):
+    book_ids = list(dict.fromkeys(book_ids))
+    errors = {}
+
+    # Libros que el usuario ya tiene reservados: no se descuenta copia
+    already = set(db.execute(
+        select(Reservation.book_id).where(
+            Reservation.user_id == user_id,
+            Reservation.status == ACTIVE,
+            Reservation.book_id.in_(book_ids)
+        )
+    ).scalars())
+    for book_id in already:
+        errors[book_id] = "Ya tienes este libro reservado"
+    if errors and mode == "all_or_nothing":
+        return _batch_result(book_ids, mode, errors, {})
+
+    # Descuento atómico de una copia de cada libro restante
+    candidates = [book_id for book_id in book_ids if book_id not in already]
+    taken = take_copies(db, candidates)
+    not_taken = [book_id for book_id in candidates if book_id not in taken]
+    if not_taken:
+        existing = set(db.execute(select(Book.id).where(Book.id.in_(not_taken))).scalars())
+        for book_id in not_taken:
+            errors[book_id] = "No hay copias disponibles" if book_id in existing else "Libro no encontrado"
+    if not taken or (errors and mode == "all_or_nothing"):
+        db.rollback()
+        return _batch_result(book_ids, mode, errors, {})
+
+    due_date = datetime.utcnow() + timedelta(days=14)  # 2 semanas
+    try:
+        rows = db.execute(
+            insert(Reservation).returning(Reservation.id, Reservation.book_id),
+            [{"user_id": user_id, "book_id": book_id, "due_date": due_date}
+             for book_id in book_ids if book_id in taken]
+        ).all()
+        record_new_reservations(db, [row.book_id for row in rows])
+        db.commit()
+    except IntegrityError:
+        # Otra petición del mismo usuario reservó alguno entretanto
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Ya tienes alguno de estos libros reservado")
+
+    done = {row.book_id: {"detail": "Libro reservado exitosamente", "reservation_id": row.id,
+                          "due_date": due_date} for row in rows}
+    return _batch_result(book_ids, mode, errors, done)
+
+def _raise_if_not_applied(result: BatchResult):
+    if not result.applied and result.mode == "all_or_nothing":
+        raise HTTPException(status_code=409, detail=jsonable_encoder(result))
+
+@router.post("/reserve/batch", response_model=BatchResult)
+async def reserve_books(
+    batch: BatchRequest,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: DatabaseSession = Depends(get_database)
+):
+    """
+    Reservar varios libros en una sola operación (hasta 50).
+    all_or_nothing: 409 y ningún cambio si falla alguno; partial: se
+    reservan los posibles. Devuelve el resultado de cada libro.
+    """
+    result = await db.run_sync(_reserve_books, current_user.id, batch.book_ids, batch.mode)
+    if result.succeeded:
+        catalog_cache.bump()
+    _raise_if_not_applied(result)
+    return result
+
+def _return_books(db: Session, user_id: int, book_ids: List[int], mode: str):
+    book_ids = list(dict.fromkeys(book_ids))
+
+    returned = close_active_reservations(db, user_id, book_ids, RETURNED)
+    errors = {
+        book_id: "No tienes este libro reservado"
+        for book_id in book_ids if book_id not in returned
+    }
+    if not returned or (errors and mode == "all_or_nothing"):
+        db.rollback()
+        return _batch_result(book_ids, mode, errors, {})
+
+    release_copies(db, list(returned))
+    record_status_changes(db, ACTIVE, RETURNED, list(returned))
+    db.commit()
+    done = {book_id: {"detail": "Libro devuelto exitosamente"} for book_id in returned}
+    return _batch_result(book_ids, mode, errors, done)
+
+@router.put("/return/batch", response_model=BatchResult)
+async def return_books(
+    batch: BatchRequest,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: DatabaseSession = Depends(get_database)
+):
+    """
+    Devolver varios libros en una sola operación (hasta 50)
+    """
+    result = await db.run_sync(_return_books, current_user.id, batch.book_ids, batch.mode)
+    if result.succeeded:
+        catalog_cache.bump()
+    _raise_if_not_applied(result)
+    return result
+
 # Endpoints para bibliotecarios
-@router.get("/admin/reservations", response_model=List[ReservationResponse])
-def list_all_reservations(
-    bibliotecario: User = Depends(require_role("bibliotecario")),
-    db: Session = Depends(get_database)
+@router.get("/admin/reservations", response_model=ReservationPage)
+async def list_all_reservations(
+    cursor: Optional[str] = Query(None, description="Cursor devuelto como next_cursor"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    bibliotecario: CurrentUser = Depends(require_role("bibliotecario")),
+    db: DatabaseSession = Depends(get_database)
 ):
     """
-    Ver todas las reservas (solo bibliotecarios)
+    Ver todas las reservas (solo bibliotecarios, más recientes primero)
     """
-    reservations = db.query(Reservation).all()
-    return reservations
+    return json_response(await db.run_sync(_list_reservations, None, cursor, limit))
 
-@router.put("/admin/reservations/{reservation_id}/status")
-def update_reservation_status(
-    reservation_id: int,
-    new_status: str = Form(...),
-    bibliotecario: User = Depends(require_role("bibliotecario")),
-    db: Session = Depends(get_database)
+@router.get("/admin/reservations/export")
+async def export_reservations(
+    format: str = Query("ndjson", pattern="^(csv|ndjson)$"),
+    reservation_status: Optional[str] = Query(None, alias="status", description="activa, devuelto o vencido"),
+    date_from: Optional[datetime] = Query(None, description="Reservadas desde (incluida)"),
+    date_to: Optional[datetime] = Query(None, description="Reservadas hasta (excluida)"),
+    book_id: Optional[int] = Query(None),
+    user_id: Optional[int] = Query(None),
+    bibliotecario: CurrentUser = Depends(require_role("bibliotecario"))
 ):
     """
-    Actualizar estado de una reserva (solo bibliotecarios)
+    Exportar reservas en NDJSON o CSV (solo bibliotecarios).
+    La respuesta se genera por bloques: apta para millones de filas.
     """
-    valid_statuses = ["activa", "devuelto", "vencido"]
-    if new_status not in valid_statuses:
+    if reservation_status is not None and reservation_status not in VALID_STATUSES:
         raise HTTPException(status_code=400, detail="Estado inválido")
-    
+
+    stmt = export_statement(reservation_status, date_from, date_to, book_id, user_id)
+    return StreamingResponse(
+        iter_export(stmt, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="reservas.{format}"'}
+    )
+
+def _update_reservation_status(db: Session, reservation_id: int, new_status: str):
     reservation = db.query(Reservation).filter(Reservation.id == reservation_id).first()
     if not reservation:
         raise HTTPException(status_code=404, detail="Reserva no encontrada")
     
     old_status = reservation.status
-    reservation.status = new_status
+    book_id = reservation.book_id
+    
+    # Reactivar una reserva vuelve a ocupar una copia: se descuenta antes
+    # de cambiar el estado, igual que al reservar
+    if new_status == ACTIVE and old_status != ACTIVE and not take_copy(db, book_id):
+        db.rollback()
+        raise HTTPException(status_code=409, detail="No hay copias disponibles")
+    
+    # Escritura condicionada al estado leído: si otra petición lo cambió
+    # entretanto no se ajusta el inventario dos veces; el rollback
+    # devuelve la copia descontada
+    try:
+        updated = set_reservation_status(db, reservation_id, old_status, new_status)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="El usuario ya tiene otra reserva activa de este libro")
+    if not updated:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="La reserva fue modificada por otra operación")
     
     # Ajustar copias disponibles si es necesario
-    if old_status == "activa" and new_status in ["devuelto", "vencido"]:
-        book = get_book_by_id(db, reservation.book_id)
-        book.available_copies += 1
+    if old_status == ACTIVE and new_status in [RETURNED, OVERDUE]:
+        release_copy(db, book_id)
+    record_status_changes(db, old_status, new_status, [book_id])
     
     db.commit()
+    return old_status
+
+@router.put("/admin/reservations/{reservation_id}/status")
+async def update_reservation_status(
+    reservation_id: int,
+    new_status: str = Form(...),
+    bibliotecario: CurrentUser = Depends(require_role("bibliotecario")),
+    db: DatabaseSession = Depends(get_database)
+):
+    """
+    Actualizar estado de una reserva (solo bibliotecarios)
+    """
+    if new_status not in VALID_STATUSES:
+        raise HTTPException(status_code=400, detail="Estado inválido")
     
+    old_status = await db.run_sync(_update_reservation_status, reservation_id, new_status)
+    catalog_cache.bump()
     return {"message": f"Estado actualizado de {old_status} a {new_status}"}
 
-# Endpoints para administradores
-@router.post("/admin/create", response_model=BookResponse)
-def create_new_book(
-    book: BookCreate,
-    admin: User = Depends(require_role("admin")),
-    db: Session = Depends(get_database)
+@router.get("/admin/stats/top", response_model=List[BookRanking])
+async def most_reserved_books(
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    order: str = Query("total", pattern="^(total|active)$", description="total: histórico; active: reservas activas"),
+    bibliotecario: CurrentUser = Depends(require_role("bibliotecario")),
+    db: DatabaseSession = Depends(get_database)
 ):
     """
-    Crear un nuevo libro (solo administradores)
+    Libros más reservados (solo bibliotecarios)
+    """
+    return await db.run_sync(top_books, limit, order)
+
+@router.get("/admin/stats/summary", response_model=ReservationSummary)
+async def reservations_summary(
+    bibliotecario: CurrentUser = Depends(require_role("bibliotecario")),
+    db: DatabaseSession = Depends(get_database)
+):
+    """
+    Número de reservas por estado (solo bibliotecarios)
+    """
+    return await db.run_sync(reservation_summary)
+
+def _unavailable_books(db: Session, cursor: Optional[str], limit: int):
+    books, next_cursor = paginate(unavailable_books_query(db), [Book.title, Book.id], cursor, limit)
+    return BookPage(items=books, next_cursor=next_cursor)
+
+@router.get("/admin/stats/unavailable", response_model=BookPage)
+async def unavailable_books(
+    cursor: Optional[str] = Query(None, description="Cursor devuelto como next_cursor"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    bibliotecario: CurrentUser = Depends(require_role("bibliotecario")),
+    db: DatabaseSession = Depends(get_database)
+):
+    """
+    Libros sin copias disponibles, por título (solo bibliotecarios)
+    """
+    return await db.run_sync(_unavailable_books, cursor, limit)
+
+@router.get("/admin/sweeper")
+async def sweeper_stats(bibliotecario: CurrentUser = Depends(require_role("bibliotecario"))):
+    """
+    Estado del barrido de reservas vencidas: filas y duración del último (solo bibliotecarios)
+    """
+    return sweeper.stats()
+
+@router.get("/admin/catalog-cache")
+async def catalog_cache_stats(admin: CurrentUser = Depends(require_role("admin"))):
+    """
+    Versión del catálogo y estadísticas de la caché de respuestas (solo administradores)
     """
+    return catalog_cache.stats()
+
+# Endpoints para administradores
+def _create_new_book(db: Session, book: BookCreate):
     # Verificar ISBN único
     existing_book = db.query(Book).filter(Book.isbn == book.isbn).first()
     if existing_book:
         raise HTTPException(status_code=400, detail="ISBN ya existe")
     
-    return create_book(db, book)
+    return BookResponse.model_validate(create_book(db, book))
 
-@router.put("/admin/{book_id}", response_model=BookResponse)
-def update_book(
-    book_id: int,
-    book_update: BookCreate,
-    admin: User = Depends(require_role("admin")),
-    db: Session = Depends(get_database)
+@router.post("/admin/create", response_model=BookResponse)
+async def create_new_book(
+    book: BookCreate,
+    admin: CurrentUser = Depends(require_role("admin")),
+    db: DatabaseSession = Depends(get_database)
 ):
     """
-    Actualizar información de un libro (solo administradores)
+    Crear un nuevo libro (solo administradores)
+    """
+    result = await db.run_sync(_create_new_book, book)
+    catalog_cache.bump()
+    await db.run_sync(suggest_index.refresh, [result.id])
+    return result
+
+@router.post("/admin/import")
+async def import_catalog(
+    file: UploadFile = File(..., description="Fichero CSV (con cabecera) o NDJSON"),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$", description="Por defecto según la extensión"),
+    admin: CurrentUser = Depends(require_role("admin")),
+    db: DatabaseSession = Depends(get_database)
+):
     """
+    Importación masiva de libros (solo administradores).
+    Columnas/campos: title, author, isbn, description, total_copies.
+    Las filas inválidas o con ISBN existente se informan y se saltan.
+    """
+    file_format = format or detect_format(file.filename)
+    report = await import_books(db, file.file, file_format)
+    if report["inserted"]:
+        catalog_cache.bump()
+        await db.run_sync(suggest_index.refresh_new)
+    return report
+
+def _update_book(db: Session, book_id: int, book_update: BookCreate):
     book = get_book_by_id(db, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Libro no encontrado")
     
+    previous_total = book.total_copies
     for field, value in book_update.dict().items():
         setattr(book, field, value)
     
     # Ajustar copias disponibles si cambió el total
-    if book_update.total_copies != book.total_copies:
-        difference = book_update.total_copies - book.total_copies
+    if book_update.total_copies != previous_total:
+        difference = book_update.total_copies - previous_total
+        if difference > 0:
+            # Las copias nuevas atienden primero la cola de espera
+            difference = hand_off(db, Counter({book_id: difference}))[book_id]
         book.available_copies += difference
         book.total_copies = book_update.total_copies
     
     db.commit()
     db.refresh(book)
-    return book
+    return BookResponse.model_validate(book)
 
-@router.delete("/admin/{book_id}")
-def delete_book(
+@router.put("/admin/{book_id}", response_model=BookResponse)
+async def update_book(
     book_id: int,
-    admin: User = Depends(require_role("admin")),
-    db: Session = Depends(get_database)
+    book_update: BookCreate,
+    admin: CurrentUser = Depends(require_role("admin")),
+    db: DatabaseSession = Depends(get_database)
 ):
     """
-    Eliminar un libro (solo administradores)
+    Actualizar información de un libro (solo administradores)
     """
+    result = await db.run_sync(_update_book, book_id, book_update)
+    catalog_cache.bump()
+    await db.run_sync(suggest_index.refresh, [book_id])
+    return result
+
+def _delete_book(db: Session, book_id: int):
     book = get_book_by_id(db, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Libro no encontrado")
@@ -248,7 +662,7 @@ def delete_book(
     # Verificar que no tenga reservas activas
     active_reservations = db.query(Reservation).filter(
         Reservation.book_id == book_id,
-        Reservation.status == "activa"
+        Reservation.status == ACTIVE
     ).first()
     
     if active_reservations:
@@ -257,16 +671,30 @@ def delete_book(
             detail="No se puede eliminar un libro con reservas activas"
         )
     
+    db.execute(delete(BookStats).where(BookStats.book_id == book_id))
+    db.execute(delete(Hold).where(Hold.book_id == book_id))
     db.delete(book)
     db.commit()
-    
+
+@router.delete("/admin/{book_id}")
+async def delete_book(
+    book_id: int,
+    admin: CurrentUser = Depends(require_role("admin")),
+    db: DatabaseSession = Depends(get_database)
+):
+    """
+    Eliminar un libro (solo administradores)
+    """
+    await db.run_sync(_delete_book, book_id)
+    catalog_cache.bump()
+    await db.run_sync(suggest_index.refresh, [book_id])
     return {"message": "Libro eliminado exitosamente"}
 
 # Endpoint especial: comunicación encriptada
 @router.post("/secure/data")
-def secure_data_exchange(
+async def secure_data_exchange(
     data: dict,
-    current_user: User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Endpoint que simula comunicación encriptada (HTTPS + JWT)
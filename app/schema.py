@@ -0,0 +1,27 @@
+# app/schema.py
+import time
+from app.database import Base, engine, create_missing_indexes
+from app.models import models  # noqa: F401 (registra las tablas en Base)
+from app.search import create_search_index
+from app.stats import ensure_stats
+
+# Creación del esquema fuera de la importación de la aplicación: importar
+# app.main (workers, scripts, benchmarks) ya no toca la base de datos.
+# Se ejecuta en el lifespan (SCHEMA_ON_STARTUP) o una vez con
+# `python -m app.schema`. Todas las operaciones son idempotentes.
+
+
+def create_schema(bind=engine):
+    """
+    Tablas, índices nuevos, índice de búsqueda y agregados iniciales
+    """
+    Base.metadata.create_all(bind=bind)
+    create_missing_indexes(bind)
+    create_search_index(bind)
+    ensure_stats(bind)
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    create_schema()
+    print(f"✅ Esquema actualizado en {time.perf_counter() - start:.2f}s ({engine.url})")
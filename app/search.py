@@ -0,0 +1,446 @@
+# app/search.py
+import argparse
+import re
+import sys
+import unicodedata
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import Float, event, inspect, text, func, literal_column, table, column
+from sqlalchemy.orm import Query
+from app.config import FUZZY_SIMILARITY_THRESHOLD, FUZZY_MAX_ALTERNATIVES, FUZZY_CANDIDATES
+from app.models.models import Book
+
+# Índice de texto completo (SQLite FTS5) sobre el catálogo de libros.
+# Tabla de contenido externo: el texto vive en "books" y el índice se
+# mantiene sincronizado mediante triggers, sin tocar el código de escritura.
+# El tokenizer unicode61 con remove_diacritics ignora mayúsculas y acentos,
+# así "garcia marquez" encuentra "Gabriel García Márquez".
+FTS_TABLE = "books_fts"
+
+# Peso de cada columna en el ranking BM25 (title, author, description)
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+_FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, author, description,
+        content='books', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, author, description)
+        VALUES (new.id, new.title, new.author, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, author, description)
+        VALUES ('delete', old.id, old.title, old.author, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author, description ON books BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, author, description)
+        VALUES ('delete', old.id, old.title, old.author, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, author, description)
+        VALUES (new.id, new.title, new.author, new.description);
+    END
+    """,
+]
+
+_FTS_TRIGGERS = ["books_fts_ai", "books_fts_ad", "books_fts_au"]
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Búsqueda tolerante a errores de escritura (fuzzy=true): "garcia marques"
+# o "cervantez" no coinciden con ningún término del índice FTS5.
+# - Diccionario de términos: cada palabra distinta de título y autor,
+#   normalizada (minúsculas, sin acentos) y con el número de libros que
+#   la contienen. Lo mantiene la aplicación en la misma transacción que la
+#   escritura del libro (eventos del ORM sobre Book y la importación
+#   masiva, ver update_term_index), no triggers: la normalización está en
+#   Python y un trigger que la llamara dejaría la tabla books sin poder
+#   escribirse desde cualquier otra conexión (sqlite3, copias de
+#   seguridad, migraciones). Lo que se escriba por fuera de la aplicación
+#   se recoge al reconstruir: python -m app.search --rebuild (también
+#   descarta los términos que ya no están en ningún libro).
+# - Índice de trigramas (FTS5, tokenizer trigram) sobre ese diccionario:
+#   de cada palabra de la consulta se buscan los términos que comparten
+#   sus trigramas y se puntúan con la similitud de pg_trgm (Jaccard de
+#   trigramas con relleno). Indexar términos y no libros mantiene el
+#   índice pequeño (cientos de miles de términos para un millón de libros)
+#   y rápido: un OR de trigramas sobre los libros tarda segundos.
+# - Las palabras corregidas se buscan en books_fts (un OR de alternativas
+#   por palabra) y los candidatos se ordenan por similitud con la consulta.
+TERMS_TABLE = "search_terms"
+TRIGRAM_TABLE = "search_terms_trigram"
+
+# Las palabras más cortas no tienen trigramas propios: se ignoran
+MIN_TERM_LENGTH = 3
+
+# Similitud a partir de la cual no se prueba la búsqueda completa de trigramas
+_STRONG_SIMILARITY = 0.5
+
+_TERM_DDL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {TERMS_TABLE} (
+        id INTEGER PRIMARY KEY,
+        term TEXT NOT NULL UNIQUE,
+        docs INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TRIGRAM_TABLE} USING fts5(
+        term,
+        content='{TERMS_TABLE}', content_rowid='id',
+        tokenize='trigram', detail='none'
+    )
+    """,
+    # Los términos no se borran (docs puede quedar a 0) hasta reconstruir;
+    # term_index_status cuenta cuántos hay
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_terms_trigram_ai AFTER INSERT ON {TERMS_TABLE} BEGIN
+        INSERT INTO {TRIGRAM_TABLE}(rowid, term) VALUES (new.id, new.term);
+    END
+    """,
+]
+
+# Triggers de versiones anteriores sobre books (usaban una función Python
+# registrada solo en las conexiones de la aplicación): se eliminan
+_LEGACY_TERM_TRIGGERS = ["search_terms_ai", "search_terms_ad", "search_terms_au"]
+
+_UPSERT_TERMS = text(f"""
+    INSERT INTO {TERMS_TABLE}(term, docs) VALUES (:term, :docs)
+    ON CONFLICT(term) DO UPDATE SET docs = docs + excluded.docs
+""")
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+class _FoldTable(dict):
+    """
+    Tabla para str.translate: cada carácter sin sus diacríticos,
+    calculada la primera vez que aparece
+    """
+
+    def __missing__(self, code: int) -> str:
+        decomposed = unicodedata.normalize("NFKD", chr(code))
+        folded = self[code] = "".join(c for c in decomposed if not unicodedata.combining(c))
+        return folded
+
+
+_FOLD_TABLE = _FoldTable()
+
+
+def fold(value: str) -> str:
+    """
+    Minúsculas y sin diacríticos ("Márquez" -> "marquez"), como el
+    tokenizer del índice FTS5
+    """
+    value = value.lower()
+    return value if value.isascii() else value.translate(_FOLD_TABLE)
+
+
+def index_terms(*values) -> List[str]:
+    """
+    Palabras distintas y normalizadas de los textos dados
+    """
+    terms = set()
+    for value in values:
+        if value:
+            terms.update(word for word in _WORD_RE.findall(fold(value)) if len(word) >= MIN_TERM_LENGTH)
+    return sorted(terms)
+
+
+def update_term_index(conn, removed: Iterable[Tuple] = (), added: Iterable[Tuple] = ()):
+    """
+    Ajustar el diccionario de términos dentro de la transacción de `conn`:
+    los libros `removed` dejan de contar y los `added` cuentan, ambos como
+    pares (title, author). Un solo executemany con los cambios netos.
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    deltas = Counter()
+    for title, author in removed:
+        deltas.subtract(index_terms(title, author))
+    for title, author in added:
+        deltas.update(index_terms(title, author))
+    rows = [{"term": term, "docs": docs} for term, docs in deltas.items() if docs]
+    if rows:
+        conn.execute(_UPSERT_TERMS, rows)
+
+
+def _stored_text(connection, book_id: int) -> Tuple:
+    return tuple(connection.execute(
+        text("SELECT title, author FROM books WHERE id = :id"), {"id": book_id}
+    ).one())
+
+
+@event.listens_for(Book, "after_insert")
+def _index_inserted_book(mapper, connection, target):
+    update_term_index(connection, added=[(target.title, target.author)])
+
+
+@event.listens_for(Book, "before_update")
+def _index_updated_book(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.title.history.has_changes() or state.attrs.author.history.has_changes():
+        # El texto anterior se lee de la fila (aún sin actualizar)
+        update_term_index(connection, removed=[_stored_text(connection, target.id)],
+                          added=[(target.title, target.author)])
+
+
+@event.listens_for(Book, "before_delete")
+def _unindex_deleted_book(mapper, connection, target):
+    update_term_index(connection, removed=[_stored_text(connection, target.id)])
+
+
+def _trigrams(term: str) -> set:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a: str, b: str) -> float:
+    """
+    Similitud de trigramas (como pg_trgm): trigramas comunes / trigramas totales
+    """
+    grams_a, grams_b = _trigrams(a), _trigrams(b)
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+
+def _table_exists(conn, name: str) -> bool:
+    return conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": name}
+    ).first() is not None
+
+
+def create_search_index(bind):
+    """
+    Crear el índice FTS5, el diccionario de términos y sus triggers si no
+    existen. Si son nuevos (base de datos ya poblada) se reconstruyen
+    a partir de la tabla books. Quita los triggers antiguos del
+    diccionario (ver _LEGACY_TERM_TRIGGERS).
+    """
+    if bind.dialect.name != "sqlite":
+        return
+    with bind.begin() as conn:
+        exists = _table_exists(conn, FTS_TABLE)
+        terms_exist = _table_exists(conn, TERMS_TABLE)
+        for trigger in _LEGACY_TERM_TRIGGERS:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        for statement in _FTS_DDL + _TERM_DDL:
+            conn.execute(text(statement))
+        if not exists:
+            rebuild_search_index(conn)
+        elif not terms_exist:
+            rebuild_term_index(conn)
+
+
+@contextmanager
+def search_index_suspended(bind):
+    """
+    Desactivar los triggers del índice durante una carga masiva y
+    reconstruirlo una sola vez al terminar (mucho más rápido que
+    actualizarlo fila a fila). Solo sin escrituras concurrentes: lo que se
+    escriba mientras tanto no queda indexado hasta la reconstrucción.
+    """
+    if bind.dialect.name != "sqlite":
+        yield
+        return
+    with bind.begin() as conn:
+        for trigger in _FTS_TRIGGERS:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    try:
+        yield
+    finally:
+        create_search_index(bind)
+        with bind.begin() as conn:
+            rebuild_search_index(conn)
+
+
+def rebuild_search_index(conn):
+    """
+    Reconstruir el índice completo (útil tras cargas masivas)
+    """
+    conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    rebuild_term_index(conn)
+
+
+def rebuild_term_index(conn):
+    """
+    Recalcular el diccionario de términos y su índice de trigramas
+    (descarta los términos que ya no aparecen en ningún libro)
+    """
+    counts = Counter()
+    for title, author in conn.execute(text("SELECT title, author FROM books")):
+        counts.update(index_terms(title, author))
+    conn.execute(text(f"DELETE FROM {TERMS_TABLE}"))
+    conn.execute(text(f"INSERT INTO {TRIGRAM_TABLE}({TRIGRAM_TABLE}) VALUES ('delete-all')"))
+    if counts:
+        conn.execute(text(f"INSERT INTO {TERMS_TABLE}(term, docs) VALUES (:term, :docs)"),
+                     [{"term": term, "docs": docs} for term, docs in counts.items()])
+
+
+def term_index_status(conn) -> dict:
+    """
+    Términos del diccionario y cuántos no aparecen ya en ningún libro
+    """
+    terms, stale = conn.execute(text(
+        f"SELECT count(*), coalesce(sum(docs <= 0), 0) FROM {TERMS_TABLE}"
+    )).one()
+    return {"terms": terms, "stale": stale}
+
+
+def build_match_expression(search: str) -> str:
+    """
+    Convertir el texto del usuario en una consulta FTS5 segura:
+    cada palabra se busca como prefijo y todas deben aparecer.
+    """
+    tokens = _TOKEN_RE.findall(search)
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def apply_search(query: Query, search: str):
+    """
+    Filtrar una consulta sobre Book por relevancia (BM25).
+    Devuelve la consulta y las claves de orden (rank, id) para paginar.
+    En motores distintos de SQLite se usa la búsqueda por subcadena.
+    """
+    dialect = query.session.get_bind().dialect.name
+    if dialect != "sqlite":
+        query = query.filter(
+            (Book.title.contains(search)) |
+            (Book.author.contains(search))
+        )
+        return query, [Book.title, Book.id]
+
+    match = build_match_expression(search)
+    if not match:
+        return query, [Book.title, Book.id]
+
+    fts = table(FTS_TABLE, column("rowid"))
+    fts_ref = literal_column(FTS_TABLE)
+    query = (
+        query.join(fts, fts.c.rowid == Book.id)
+        .filter(fts_ref.op("MATCH")(match))
+    )
+    rank = func.bm25(fts_ref, *BM25_WEIGHTS, type_=Float)
+    return query, [rank, Book.id]
+
+
+def _term_candidates(session, match: str, token: str, ranked: bool) -> List[str]:
+    statement = f"""
+        SELECT t.term FROM {TRIGRAM_TABLE} JOIN {TERMS_TABLE} t ON t.id = {TRIGRAM_TABLE}.rowid
+        WHERE {TRIGRAM_TABLE} MATCH :match AND t.docs > 0
+          AND length(t.term) BETWEEN :shortest AND :longest
+        {"ORDER BY rank" if ranked else ""} LIMIT :limit
+    """
+    return session.execute(text(statement), {
+        "match": match, "shortest": len(token) - 2, "longest": len(token) + 2, "limit": FUZZY_CANDIDATES,
+    }).scalars().all()
+
+
+def similar_terms(session, token: str) -> Dict[str, float]:
+    """
+    Términos del catálogo parecidos a `token` (ya normalizado) y su
+    similitud, los FUZZY_MAX_ALTERNATIVES mejores por encima del umbral.
+    Primero los que contienen todos los trigramas de uno de sus tramos
+    (una errata estropea como mucho tres trigramas seguidos y deja intacto
+    algún tramo: consulta muy selectiva); si no aparece nada claro, los que
+    comparten más trigramas.
+    """
+    grams = [token[i:i + 3] for i in range(len(token) - 2)]
+    pieces = 1 if len(grams) <= 2 else 2 if len(grams) < 9 else 3
+    size = -(-len(grams) // pieces)
+    parts = [grams[i:i + size] for i in range(0, len(grams), size)]
+    match = " OR ".join("(" + " AND ".join(f'"{gram}"' for gram in part) + ")" for part in parts)
+    scores = {term: similarity(token, term) for term in _term_candidates(session, match, token, False)}
+    if max(scores.values(), default=0) < _STRONG_SIMILARITY:
+        match = " OR ".join(f'"{gram}"' for gram in sorted(set(grams)))
+        for term in _term_candidates(session, match, token, True):
+            scores.setdefault(term, similarity(token, term))
+    best = sorted(
+        ((score, term) for term, score in scores.items() if score >= FUZZY_SIMILARITY_THRESHOLD),
+        reverse=True
+    )
+    return {term: score for score, term in best[:FUZZY_MAX_ALTERNATIVES]}
+
+
+def _fuzzy_match_expression(alternatives: List[Dict[str, float]]) -> str:
+    return " AND ".join(
+        "{title author}: (" + " OR ".join(f'"{term}"' for term in terms) + ")"
+        for terms in alternatives
+    )
+
+
+def fuzzy_search(query: Query, search: str, limit: int) -> list:
+    """
+    Hasta `limit` filas de `query` (sobre Book, con title y author) cuyo
+    título o autor se parece a `search`, de más a menos parecidas: cada
+    palabra de la búsqueda puntúa con su mejor alternativa presente en el
+    libro y el libro con la media. Sin cursor: la búsqueda aproximada
+    devuelve solo la mejor página.
+    En motores distintos de SQLite se usa la búsqueda por subcadena.
+    """
+    session = query.session
+    if session.get_bind().dialect.name != "sqlite":
+        query = query.filter((Book.title.contains(search)) | (Book.author.contains(search)))
+        return query.order_by(Book.title, Book.id).limit(limit).all()
+
+    tokens = list(dict.fromkeys(word for word in _WORD_RE.findall(fold(search)) if len(word) >= MIN_TERM_LENGTH))
+    if not tokens:
+        # Solo palabras cortas (sin trigramas): búsqueda exacta
+        query, keys = apply_search(query, search)
+        return query.order_by(*keys).limit(limit).all()
+    # Las palabras sin ningún término parecido no restringen la búsqueda
+    alternatives = [terms for terms in (similar_terms(session, token) for token in tokens) if terms]
+    if not alternatives:
+        return []
+
+    fts = table(FTS_TABLE, column("rowid"))
+    fts_ref = literal_column(FTS_TABLE)
+    base = query.join(fts, fts.c.rowid == Book.id)
+    # Primero con la mejor alternativa de cada palabra: esos libros tienen
+    # la puntuación máxima posible, así que bastan `limit` (sin ranking
+    # BM25). Si no llenan la página, hasta FUZZY_CANDIDATES con cualquier
+    # alternativa, ordenados después por similitud
+    best = [{term: score for term, score in terms.items() if score == max(terms.values())}
+            for terms in alternatives]
+    rows = {}
+    for tier, size in [(best, limit), (alternatives, FUZZY_CANDIDATES)]:
+        if len(rows) >= limit or (tier is alternatives and best == alternatives):
+            break
+        match = _fuzzy_match_expression(tier)
+        for row in base.filter(fts_ref.op("MATCH")(match)).limit(size):
+            rows.setdefault(row.id, row)
+
+    def score(row) -> float:
+        words = _WORD_RE.findall(fold(f"{row.title} {row.author}"))
+        return sum(max(map(terms.get, words, [0] * len(words)), default=0)
+                   for terms in alternatives) / len(alternatives)
+
+    return sorted(rows.values(), key=lambda row: (-score(row), row.id))[:limit]
+
+
+if __name__ == "__main__":
+    from app.database import engine
+
+    parser = argparse.ArgumentParser(description="Comprobar o reconstruir el índice de búsqueda")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="reconstruir el índice FTS5 y el diccionario de términos (bloquea las escrituras mientras dura)")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "sqlite":
+        sys.exit("El índice de búsqueda solo existe en SQLite")
+    create_search_index(engine)
+    with engine.begin() as conn:
+        status = term_index_status(conn)
+        print(f"Diccionario: {status['terms']:,} términos, {status['stale']:,} sin libros")
+        if args.rebuild:
+            rebuild_search_index(conn)
+            status = term_index_status(conn)
+            print(f"✅ Índice reconstruido: {status['terms']:,} términos")
@@ -0,0 +1,57 @@
+# app/serialization.py
+from typing import Optional
+import orjson
+from fastapi import Response
+from sqlalchemy.orm import Query, Session
+from app.models.models import Book, Reservation, BookResponse, ReservationResponse
+
+# Ruta rápida de los listados: en lugar de cargar objetos ORM, validarlos
+# con el esquema (from_attributes), volver a validarlos como response_model
+# y codificarlos con jsonable_encoder + json, se seleccionan solo las
+# columnas del esquema, cada fila se convierte en dict y se codifica con
+# orjson. Los endpoints conservan su response_model, así el esquema de
+# OpenAPI no cambia; devolver un Response evita la validación de FastAPI.
+# Las columnas salen de los campos de los esquemas, en su mismo orden:
+# el JSON es idéntico al de la ruta con Pydantic.
+
+BOOK_FIELDS = list(BookResponse.model_fields)
+BOOK_COLUMNS = [getattr(Book, name) for name in BOOK_FIELDS]
+
+RESERVATION_FIELDS = [name for name in ReservationResponse.model_fields if name != "book"]
+RESERVATION_COLUMNS = [getattr(Reservation, name) for name in RESERVATION_FIELDS]
+_BOOK_OFFSET = len(RESERVATION_FIELDS)
+
+
+def book_rows(db: Session) -> Query:
+    """
+    Consulta de las columnas de BookResponse (filas, no objetos ORM)
+    """
+    return db.query(*BOOK_COLUMNS)
+
+
+def reservation_rows(db: Session) -> Query:
+    """
+    Consulta de las columnas de ReservationResponse con su libro (un JOIN)
+    """
+    return db.query(*RESERVATION_COLUMNS, *BOOK_COLUMNS).join(Book, Book.id == Reservation.book_id)
+
+
+def book_dict(row) -> dict:
+    return dict(zip(BOOK_FIELDS, row))
+
+
+def reservation_dict(row) -> dict:
+    item = dict(zip(RESERVATION_FIELDS, row))
+    item["book"] = dict(zip(BOOK_FIELDS, row[_BOOK_OFFSET:]))
+    return item
+
+
+def dump_page(items: list, next_cursor: Optional[str]) -> bytes:
+    """
+    JSON de una página (BookPage / ReservationPage) ya convertida a dicts
+    """
+    return orjson.dumps({"items": items, "next_cursor": next_cursor})
+
+
+def json_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
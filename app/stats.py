@@ -0,0 +1,148 @@
+# app/stats.py
+import argparse
+import sys
+from sqlalchemy import select, delete, insert, func, case
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.models import Book, Reservation, BookStats, ReservationStatusCount, BookRanking, ReservationSummary
+from app.inventory import ACTIVE, VALID_STATUSES
+
+# Estadísticas del catálogo para los paneles de bibliotecarios.
+# Se leen de tablas agregadas que se mantienen de forma incremental en la
+# transacción de cada escritura (app/inventory.py), así cada consulta cuesta
+# O(tamaño del resultado) y no un GROUP BY sobre todas las reservas.
+# rebuild_stats las recalcula desde cero y check_stats compara ambas
+# versiones (python -m app.stats --check / --rebuild).
+
+RANKING_ORDERS = {
+    "total": BookStats.total_reservations,
+    "active": BookStats.active_reservations,
+}
+
+
+def top_books(db: Session, limit: int, order: str = "total") -> list:
+    """
+    Libros más reservados (histórico) o con más reservas activas
+    """
+    key = RANKING_ORDERS[order]
+    rows = db.execute(
+        select(
+            BookStats.book_id, Book.title, Book.author, Book.available_copies, Book.total_copies,
+            BookStats.total_reservations, BookStats.active_reservations
+        )
+        .join(Book, Book.id == BookStats.book_id)
+        .where(key > 0)
+        .order_by(key.desc(), BookStats.book_id.desc())
+        .limit(limit)
+    ).mappings()
+    return [BookRanking(**row) for row in rows]
+
+
+def reservation_summary(db: Session) -> ReservationSummary:
+    """
+    Número de reservas por estado
+    """
+    counts = dict.fromkeys(VALID_STATUSES, 0)
+    counts.update(db.execute(select(ReservationStatusCount.status, ReservationStatusCount.count)).all())
+    return ReservationSummary(total=sum(counts.values()), by_status=counts)
+
+
+def unavailable_books_query(db: Session):
+    """
+    Libros sin copias disponibles (índice parcial ix_books_unavailable)
+    """
+    return db.query(Book).filter(Book.available_copies <= 0)
+
+
+def _expected_book_stats():
+    return (
+        select(
+            Reservation.book_id,
+            func.count().label("total_reservations"),
+            func.sum(case((Reservation.status == ACTIVE, 1), else_=0)).label("active_reservations"),
+        )
+        .join(Book, Book.id == Reservation.book_id)
+        .group_by(Reservation.book_id)
+    )
+
+
+def _expected_status_counts():
+    return select(Reservation.status, func.count().label("count")).group_by(Reservation.status)
+
+
+def rebuild_stats(db: Session) -> ReservationSummary:
+    """
+    Recalcular las tablas agregadas a partir de las reservas (no hace commit)
+    """
+    db.execute(delete(BookStats))
+    db.execute(delete(ReservationStatusCount))
+    db.execute(insert(BookStats).from_select(
+        ["book_id", "total_reservations", "active_reservations"], _expected_book_stats()
+    ))
+    db.execute(insert(ReservationStatusCount).from_select(["status", "count"], _expected_status_counts()))
+    return reservation_summary(db)
+
+
+def check_stats(db: Session) -> dict:
+    """
+    Diferencias entre los agregados y su valor recalculado:
+    {"books": [(book_id, esperado, actual)], "statuses": [(estado, esperado, actual)]}
+    """
+    expected = {row[0]: tuple(row[1:]) for row in db.execute(_expected_book_stats())}
+    actual = {
+        row[0]: tuple(row[1:]) for row in db.execute(
+            select(BookStats.book_id, BookStats.total_reservations, BookStats.active_reservations)
+            .where((BookStats.total_reservations != 0) | (BookStats.active_reservations != 0))
+        )
+    }
+    books = [
+        (book_id, expected.get(book_id, (0, 0)), actual.get(book_id, (0, 0)))
+        for book_id in sorted(expected.keys() | actual.keys())
+        if expected.get(book_id, (0, 0)) != actual.get(book_id, (0, 0))
+    ]
+    expected = dict(db.execute(_expected_status_counts()).all())
+    actual = dict(db.execute(select(ReservationStatusCount.status, ReservationStatusCount.count)).all())
+    statuses = [
+        (status, expected.get(status, 0), actual.get(status, 0))
+        for status in sorted(expected.keys() | actual.keys())
+        if expected.get(status, 0) != actual.get(status, 0)
+    ]
+    return {"books": books, "statuses": statuses}
+
+
+def ensure_stats(bind):
+    """
+    Calcular los agregados al arrancar si la tabla está vacía pero ya hay
+    reservas (base de datos anterior a estas tablas)
+    """
+    with bind.begin() as conn:
+        if conn.execute(select(ReservationStatusCount.status).limit(1)).first():
+            return
+        if not conn.execute(select(Reservation.id).limit(1)).first():
+            return
+    with Session(bind) as db:
+        rebuild_stats(db)
+        db.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Comprobar o recalcular las estadísticas del catálogo")
+    parser.add_argument("--check", action="store_true", help="comparar con el valor recalculado (código 1 si difieren)")
+    parser.add_argument("--rebuild", action="store_true", help="recalcular las tablas agregadas")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        if args.check or not args.rebuild:
+            differences = check_stats(db)
+            for book_id, expected, actual in differences["books"][:20]:
+                print(f"libro {book_id}: esperado (total, activas) {expected}, actual {actual}")
+            for status, expected, actual in differences["statuses"]:
+                print(f"estado {status}: esperado {expected}, actual {actual}")
+            consistent = not differences["books"] and not differences["statuses"]
+            print("✅ Estadísticas coherentes" if consistent else
+                  f"❌ {len(differences['books'])} libros y {len(differences['statuses'])} estados con diferencias")
+            if not args.rebuild:
+                sys.exit(0 if consistent else 1)
+        summary = rebuild_stats(db)
+        db.commit()
+        print(f"✅ Estadísticas recalculadas: {summary.total:,} reservas {summary.by_status}")
@@ -0,0 +1,487 @@
+# app/suggest.py
+import asyncio
+import heapq
+import logging
+import re
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.config import SUGGEST_MAX_ENTRIES, SUGGEST_MAX_RESULTS, SUGGEST_REBUILD_SECONDS, SUGGEST_OVERLAY_MAX
+from app.database import SessionLocal
+from app.models.models import Book, BookStats
+from app.search import fold
+
+# Autocompletado (GET /books/suggest?q=) servido desde memoria, sin tocar
+# la base de datos en cada pulsación.
+# - Entradas: los títulos y autores más populares (reservas históricas de
+#   book_stats; un autor suma las de sus libros), como mucho
+#   SUGGEST_MAX_ENTRIES: la memoria no crece con el catálogo.
+# - Todo el texto vive en dos cadenas (original y normalizada, de la misma
+#   longitud) y en arrays de enteros, no en millones de objetos Python.
+#   Las claves son los comienzos de palabra de cada entrada, ordenados por
+#   el texto que les sigue: un prefijo es un rango contiguo (bisect).
+# - Árbol de segmentos sobre ese orden: cada nodo guarda las
+#   SUGGEST_MAX_RESULTS entradas más populares de su tramo, así que las
+#   mejores de un rango salen de O(log n) nodos aunque el prefijo ("a")
+#   abarque cientos de miles de claves.
+# - Escrituras del catálogo: el libro dado de baja o editado se marca como
+#   borrado (se recalculan los nodos de sus claves) y su versión nueva va a
+#   una lista ordenada pequeña que se consulta junto al índice. Los
+#   cambios y las consultas se serializan con un lock (cada uno es cuestión
+#   de microsegundos). La reconstrucción periódica (SUGGEST_REBUILD_SECONDS)
+#   la vacía y refresca la popularidad; si la lista pasa de
+#   SUGGEST_OVERLAY_MAX se adelanta, siempre en la tarea de fondo y nunca
+#   en la petición que hizo el cambio. Con varios workers, on_change avisa
+#   a los demás.
+
+logger = logging.getLogger(__name__)
+
+# Claves por bloque en las hojas del árbol
+BLOCK = 32
+# Caracteres de cada clave usados para ordenar; los prefijos más largos
+# se comprueban entrada a entrada
+KEY_CHARS = 24
+
+_WORD_START = re.compile(r"\b\w")
+_SPACES = re.compile(r"\s+")
+
+
+class _SameLengthFold(dict):
+    """
+    Tabla para str.translate como fold(), pero carácter a carácter: el
+    texto normalizado conserva las posiciones del original
+    """
+
+    def __missing__(self, code: int) -> str:
+        char = chr(code)
+        folded = fold(char)
+        self[code] = folded if len(folded) == 1 else char
+        return self[code]
+
+
+_SAME_LENGTH = _SameLengthFold()
+
+
+def normalize(value: str) -> str:
+    return value.lower() if value.isascii() else value.translate(_SAME_LENGTH)
+
+
+def normalize_query(value: str) -> str:
+    return _SPACES.sub(" ", normalize(value)).lstrip()
+
+
+class _Snapshot:
+    """
+    Índice inmutable salvo por las bajas (peso -1) y la lista de cambios
+    """
+
+    def __init__(self, titles: list, authors: list, max_book_id: int, results: int):
+        self.results = results
+        self.max_book_id = max_book_id
+        # Títulos ordenados por id de libro (búsqueda por bisect), luego autores
+        titles = sorted(titles)
+        texts = [title or "" for _, title, _ in titles] + [author or "" for author, _ in authors]
+        self.titles = len(titles)
+        self.book_ids = array("i", [book_id for book_id, _, _ in titles])
+        self.weights = array("q", [weight for _, _, weight in titles] + [weight for _, weight in authors])
+        self.display = "".join(text.replace("\n", " ") + "\n" for text in texts)
+        self.folded = normalize(self.display)
+        self.starts = array("I", [0])
+        for text in texts:
+            self.starts.append(self.starts[-1] + len(text) + 1)
+        self.authors = {self.folded[self.starts[e]:self.starts[e + 1] - 1]: e
+                        for e in range(self.titles, len(texts))}
+
+        positions, entries = array("I"), array("I")
+        for entry in range(len(texts)):
+            for match in _WORD_START.finditer(self.folded, self.starts[entry], self.starts[entry + 1] - 1):
+                positions.append(match.start())
+                entries.append(entry)
+        folded = self.folded
+        order = sorted(range(len(positions)), key=lambda i: folded[positions[i]:positions[i] + KEY_CHARS])
+        self.positions = array("I", (positions[i] for i in order))
+        self.leaf_entry = array("I", (entries[i] for i in order))
+        del positions, entries, order
+
+        blocks = -(-len(self.positions) // BLOCK)
+        self.size = 1
+        while self.size < blocks:
+            self.size *= 2
+        self.tree = array("i", [-1]) * (2 * self.size * results)
+        for block in range(blocks):
+            self._set_node(self.size + block, self.leaf_entry[block * BLOCK:(block + 1) * BLOCK])
+        for node in range(self.size - 1, 0, -1):
+            self._set_node(node, self._node(2 * node) + self._node(2 * node + 1))
+
+        # Altas y ediciones posteriores: (clave, entrada) ordenadas
+        self.extra_keys: list = []
+        self.extra: Dict[int, tuple] = {}
+        self.extra_books: Dict[int, int] = {}
+        self.next_entry = len(texts)
+        self.base_bytes = self._base_bytes()
+
+    # Árbol de segmentos
+    def _best(self, entries: Iterable[int]) -> List[int]:
+        weights = self.weights
+        alive = [e for e in set(entries) if weights[e] >= 0]
+        return heapq.nlargest(self.results, alive, key=lambda e: (weights[e], -e))
+
+    def _node(self, node: int) -> List[int]:
+        start = node * self.results
+        return [e for e in self.tree[start:start + self.results] if e >= 0]
+
+    def _set_node(self, node: int, entries: Iterable[int]):
+        best = self._best(entries)
+        start = node * self.results
+        self.tree[start:start + self.results] = array("i", best + [-1] * (self.results - len(best)))
+
+    def _refresh_block(self, block: int):
+        node = self.size + block
+        self._set_node(node, self.leaf_entry[block * BLOCK:(block + 1) * BLOCK])
+        node //= 2
+        while node:
+            self._set_node(node, self._node(2 * node) + self._node(2 * node + 1))
+            node //= 2
+
+    # Entradas
+    def entry(self, e: int) -> tuple:
+        """
+        (texto, book_id o None, peso)
+        """
+        if e >= len(self.weights):
+            return self.extra[e]
+        text = self.display[self.starts[e]:self.starts[e + 1] - 1]
+        return text, (self.book_ids[e] if e < self.titles else None), self.weights[e]
+
+    def title_entry(self, book_id: int) -> Optional[int]:
+        e = bisect_left(self.book_ids, book_id)
+        if e < self.titles and self.book_ids[e] == book_id and self.weights[e] >= 0:
+            return e
+        return None
+
+    def _range(self, key: str):
+        folded, positions = self.folded, self.positions
+        width = len(key)
+        lo = bisect_left(positions, key, key=lambda p: folded[p:p + width])
+        hi = bisect_right(positions, key, key=lambda p: folded[p:p + width], lo=lo)
+        return lo, hi
+
+    def remove(self, e: int) -> int:
+        """
+        Dar de baja una entrada; devuelve su peso
+        """
+        if e >= len(self.weights):
+            text, book_id, weight = self.extra.pop(e)
+            self.extra_keys = [(key, entry) for key, entry in self.extra_keys if entry != e]
+            self.extra_books.pop(book_id, None)
+            return weight
+        weight, self.weights[e] = self.weights[e], -1
+        folded = self.folded
+        for match in _WORD_START.finditer(folded, self.starts[e], self.starts[e + 1] - 1):
+            lo, hi = self._range(folded[match.start():match.start() + KEY_CHARS])
+            for leaf in range(lo, hi):
+                if self.positions[leaf] == match.start():
+                    self._refresh_block(leaf // BLOCK)
+                    break
+        return weight
+
+    def add(self, text: str, book_id: Optional[int], weight: int) -> int:
+        e = self.next_entry
+        self.next_entry += 1
+        self.extra[e] = (text, book_id, weight)
+        if book_id is not None:
+            self.extra_books[book_id] = e
+        folded = normalize(text)
+        for match in _WORD_START.finditer(folded):
+            insort(self.extra_keys, (folded[match.start():], e))
+        return e
+
+    # Consulta
+    def candidates(self, prefix: str) -> List[int]:
+        key = prefix[:KEY_CHARS]
+        lo, hi = self._range(key)
+        leaf_entry = self.leaf_entry
+        if len(prefix) > KEY_CHARS:
+            found = [leaf_entry[i] for i in range(lo, hi) if self.folded.startswith(prefix, self.positions[i])]
+        elif hi - lo <= 2 * BLOCK:
+            found = list(leaf_entry[lo:hi])
+        else:
+            # Claves sueltas de los extremos + nodos que cubren los bloques completos
+            first, last = -(-lo // BLOCK), hi // BLOCK
+            found = list(leaf_entry[lo:first * BLOCK]) + list(leaf_entry[last * BLOCK:hi])
+            left, right = first + self.size, last + self.size
+            while left < right:
+                if left & 1:
+                    found.extend(self._node(left))
+                    left += 1
+                if right & 1:
+                    right -= 1
+                    found.extend(self._node(right))
+                left //= 2
+                right //= 2
+        start = bisect_left(self.extra_keys, (prefix,))
+        for key, e in self.extra_keys[start:]:
+            if not key.startswith(prefix):
+                break
+            found.append(e)
+        return found
+
+    def _base_bytes(self) -> int:
+        arrays = (self.book_ids, self.weights, self.starts, self.positions, self.leaf_entry, self.tree)
+        return (
+            sys.getsizeof(self.display) + sys.getsizeof(self.folded)
+            + sum(sys.getsizeof(values) for values in arrays)
+            + sys.getsizeof(self.authors) + sum(sys.getsizeof(name) for name in self.authors)
+        )
+
+    def memory_bytes(self) -> int:
+        return self.base_bytes + sys.getsizeof(self.extra_keys) + sum(
+            sys.getsizeof(key) + sys.getsizeof(self.extra[e][0]) for key, e in self.extra_keys
+        )
+
+
+class SuggestIndex:
+    """
+    Índice de autocompletado de un worker: construcción, cambios y consultas
+    """
+
+    def __init__(self, max_entries: int, results: int, interval: int, overlay_max: int,
+                 session_factory=SessionLocal):
+        self.max_entries = max_entries
+        self.results = results
+        self.interval = interval
+        self.overlay_max = overlay_max
+        self.session_factory = session_factory
+        self.on_change: Optional[Callable[[Optional[int]], None]] = None
+        self.builds = 0
+        self.changes = 0
+        self.last_build = None
+        self.last_build_ms = 0.0
+        self._snapshot = _Snapshot([], [], 0, results)
+        self._dirty = None
+        self._task = None
+        self._event_loop = None
+        self._wake = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def _load(self, db: Session) -> _Snapshot:
+        weight = func.coalesce(BookStats.total_reservations, 0)
+        max_book_id = db.execute(select(func.coalesce(func.max(Book.id), 0))).scalar()
+        titles = db.execute(
+            select(Book.id, Book.title, weight)
+            .outerjoin(BookStats, BookStats.book_id == Book.id)
+            .where(Book.id <= max_book_id)
+            .order_by(weight.desc(), Book.id)
+            .limit(self.max_entries)
+        ).all()
+        total = func.sum(weight)
+        authors = db.execute(
+            select(Book.author, total)
+            .outerjoin(BookStats, BookStats.book_id == Book.id)
+            .where(Book.id <= max_book_id, Book.author.is_not(None))
+            .group_by(Book.author)
+            .order_by(total.desc(), Book.author)
+            .limit(self.max_entries)
+        ).all()
+        # Los más populares de ambas listas; con empate, antes los autores
+        best = heapq.nlargest(
+            self.max_entries,
+            [(row[1], 1, row) for row in authors] + [(row[2], 0, row) for row in titles],
+            key=lambda item: item[:2]
+        )
+        return _Snapshot(
+            [tuple(row) for _, kind, row in best if kind == 0],
+            [tuple(row) for _, kind, row in best if kind == 1],
+            max_book_id, self.results
+        )
+
+    def rebuild(self):
+        """
+        Construir el índice desde la base de datos y sustituir el actual.
+        Los cambios que lleguen mientras tanto se vuelven a aplicar después.
+        """
+        with self._build_lock:
+            start = time.perf_counter()
+            with self._lock:
+                self._dirty = set()
+            db = self.session_factory()
+            try:
+                snapshot = self._load(db)
+            finally:
+                db.close()
+            with self._lock:
+                self._snapshot = snapshot
+                dirty, self._dirty = self._dirty, None
+            if dirty:
+                self.refresh(None, dirty, publish=False)
+            duration_ms = (time.perf_counter() - start) * 1000
+            self.builds += 1
+            self.last_build = datetime.utcnow()
+            self.last_build_ms = round(duration_ms, 2)
+        logger.info("Índice de sugerencias: %d entradas en %.1f ms", snapshot.next_entry, duration_ms)
+
+    def refresh(self, db: Optional[Session], book_ids: Iterable[int], publish: bool = True):
+        """
+        Aplicar altas, ediciones y bajas de estos libros (llamar tras el commit)
+        """
+        book_ids = set(book_ids)
+        if not book_ids:
+            return
+        own_session = db is None
+        db = db or self.session_factory()
+        try:
+            weight = func.coalesce(BookStats.total_reservations, 0)
+            rows = db.execute(
+                select(Book.id, Book.title, Book.author, weight)
+                .outerjoin(BookStats, BookStats.book_id == Book.id)
+                .where(Book.id.in_(book_ids))
+            ).all()
+        finally:
+            if own_session:
+                db.close()
+
+        found = {row[0]: row for row in rows}
+        with self._lock:
+            snapshot = self._snapshot
+            for book_id in book_ids:
+                e = snapshot.extra_books.get(book_id)
+                if e is None:
+                    e = snapshot.title_entry(book_id)
+                if e is not None:
+                    snapshot.remove(e)
+                row = found.get(book_id)
+                if row is None:
+                    continue
+                _, title, author, popularity = row
+                snapshot.add(title or "", book_id, popularity)
+                author_key = normalize(author or "")
+                if author_key and author_key not in snapshot.authors:
+                    snapshot.authors[author_key] = snapshot.add(author, None, popularity)
+            snapshot.max_book_id = max(snapshot.max_book_id, max(book_ids))
+            if self._dirty is not None:
+                self._dirty.update(book_ids)
+            self.changes += len(book_ids)
+            overflow = len(snapshot.extra) > self.overlay_max and self._dirty is None
+        if publish and self.on_change is not None:
+            for book_id in book_ids:
+                self.on_change(book_id)
+        if overflow:
+            self.request_rebuild()
+
+    def refresh_new(self, db: Optional[Session], publish: bool = True):
+        """
+        Añadir los libros creados desde la última vez (importación masiva)
+        """
+        own_session = db is None
+        db = db or self.session_factory()
+        try:
+            book_ids = db.execute(
+                select(Book.id).where(Book.id > self._snapshot.max_book_id).limit(self.overlay_max + 1)
+            ).scalars().all()
+        finally:
+            if own_session:
+                db.close()
+        if publish and self.on_change is not None:
+            self.on_change(None)
+        if len(book_ids) > self.overlay_max:
+            self.request_rebuild()
+        else:
+            self.refresh(None if own_session else db, book_ids, publish=False)
+
+    def suggest(self, query: str, limit: int) -> List[dict]:
+        """
+        Las `limit` entradas más populares con una palabra que empieza
+        por `query` (sin distinguir mayúsculas ni acentos)
+        """
+        prefix = normalize_query(query)
+        if not prefix:
+            return []
+        # refresh() modifica el índice en otros hilos
+        with self._lock:
+            snapshot = self._snapshot
+            entries = [snapshot.entry(e) for e in set(snapshot.candidates(prefix))]
+        suggestions = []
+        seen = set()
+        for text, book_id, weight in sorted(entries, key=lambda item: (-item[2], item[0])):
+            key = (book_id is None, normalize(text))
+            if weight < 0 or key in seen:
+                continue
+            seen.add(key)
+            suggestions.append({
+                "text": text,
+                "type": "author" if book_id is None else "title",
+                "book_id": book_id,
+                "popularity": weight,
+            })
+            if len(suggestions) == limit:
+                break
+        return suggestions
+
+    def request_rebuild(self):
+        """
+        Adelantar la siguiente reconstrucción de la tarea de fondo (desde
+        cualquier hilo). Sin tarea en marcha, la lista de cambios espera
+        a la siguiente construcción.
+        """
+        if self._task is not None:
+            self._event_loop.call_soon_threadsafe(self._wake.set)
+
+    async def _loop(self):
+        while True:
+            self._wake.clear()
+            try:
+                await run_in_threadpool(self.rebuild)
+            except Exception:
+                logger.exception("Error al construir el índice de sugerencias")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval if self.interval > 0 else None)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """
+        Primera construcción en segundo plano (no retrasa el arranque) y
+        reconstrucción periódica o cuando se pide (request_rebuild)
+        """
+        if self._task is None:
+            self._event_loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            snapshot = self._snapshot
+            keys = len(snapshot.positions) + len(snapshot.extra_keys)
+            pending = len(snapshot.extra)
+            memory = snapshot.memory_bytes()
+        return {
+            "entries": snapshot.next_entry,
+            "keys": keys,
+            "pending_changes": pending,
+            "memory_bytes": memory,
+            "max_entries": self.max_entries,
+            "builds": self.builds,
+            "changes": self.changes,
+            "last_build": self.last_build,
+            "last_build_ms": self.last_build_ms,
+        }
+
+
+suggest_index = SuggestIndex(SUGGEST_MAX_ENTRIES, SUGGEST_MAX_RESULTS, SUGGEST_REBUILD_SECONDS, SUGGEST_OVERLAY_MAX)
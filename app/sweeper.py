@@ -0,0 +1,100 @@
+# app/sweeper.py
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime
+from starlette.concurrency import run_in_threadpool
+from app.config import OVERDUE_SWEEP_INTERVAL_SECONDS
+from app.database import SessionLocal
+from app.inventory import mark_overdue
+from app.catalog_cache import catalog_cache
+
+logger = logging.getLogger(__name__)
+
+
+class OverdueSweeper:
+    """
+    Tarea de fondo que marca periódicamente las reservas vencidas.
+    Se arranca y se detiene desde el lifespan de la aplicación; con varios
+    workers cada uno ejecuta la suya, sin riesgo: el UPDATE solo toca
+    reservas que siguen activas.
+    """
+
+    def __init__(self, interval: int, session_factory=SessionLocal):
+        self.interval = interval
+        self.session_factory = session_factory
+        self.runs = 0
+        self.failures = 0
+        self.total_rows = 0
+        self.last_run = None
+        self.last_rows = 0
+        self.last_duration_ms = 0.0
+        self._task = None
+        self._lock = threading.Lock()
+
+    def sweep(self) -> int:
+        """
+        Un barrido completo en su propia transacción
+        """
+        start = time.perf_counter()
+        db = self.session_factory()
+        try:
+            rows = mark_overdue(db)
+            db.commit()
+            if rows:
+                catalog_cache.bump()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                self.failures += 1
+            raise
+        finally:
+            db.close()
+
+        duration_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.runs += 1
+            self.total_rows += rows
+            self.last_run = datetime.utcnow()
+            self.last_rows = rows
+            self.last_duration_ms = round(duration_ms, 2)
+        logger.info("Barrido de vencidas: %d reservas en %.1f ms", rows, duration_ms)
+        return rows
+
+    async def _loop(self):
+        while True:
+            try:
+                await run_in_threadpool(self.sweep)
+            except Exception:
+                logger.exception("Error en el barrido de reservas vencidas")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "interval_seconds": self.interval,
+                "running": self._task is not None,
+                "runs": self.runs,
+                "failures": self.failures,
+                "total_rows": self.total_rows,
+                "last_run": self.last_run,
+                "last_rows": self.last_rows,
+                "last_duration_ms": self.last_duration_ms,
+            }
+
+
+sweeper = OverdueSweeper(OVERDUE_SWEEP_INTERVAL_SECONDS)
@@ -0,0 +1,103 @@
+# benchmarks/bench_async.py
+"""
+Comparar el rendimiento de la capa síncrona (threadpool) y la asíncrona
+(AsyncSession + aiosqlite) con muchos clientes concurrentes.
+
+Cada modo se ejecuta en un proceso propio (la capa se elige al importar
+la aplicación) contra la misma base de datos temporal.
+
+Uso:
+    python -m benchmarks.bench_async --concurrency 200 --requests 4000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from benchmarks.common import temp_engine, seed_books, seed_users, seed_reservations, summarize
+
+BOOKS = 5000
+USERS = 200
+
+
+async def run_worker(concurrency: int, total: int):
+    import httpx
+    from app.main import app
+    from app.routers.auth import create_access_token
+
+    tokens = [create_access_token({"sub": f"u{i}"}) for i in range(USERS)]
+    rng = random.Random(7)
+    plan = []
+    for _ in range(total):
+        kind = rng.random()
+        headers = {"Authorization": f"Bearer {rng.choice(tokens)}"}
+        if kind < 0.5:
+            plan.append(("GET", f"/books/{rng.randint(1, BOOKS)}", None))
+        elif kind < 0.8:
+            plan.append(("GET", "/books/?limit=20", None))
+        else:
+            plan.append(("GET", "/books/my/reservations?limit=20", headers))
+
+    latencies = []
+    queue = asyncio.Queue()
+    for item in plan:
+        queue.put_nowait(item)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def client_loop():
+            while not queue.empty():
+                method, path, headers = queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.request(method, path, headers=headers)
+                latencies.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, response.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*[client_loop() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+
+    from app.database import async_engine
+    if async_engine is not None:
+        await async_engine.dispose()
+
+    result = summarize(latencies)
+    result["requests_per_second"] = round(total / elapsed, 1)
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        asyncio.run(run_worker(args.concurrency, args.requests))
+        return
+
+    engine, _ = temp_engine("async")
+    seed_books(engine, BOOKS)
+    seed_users(engine, USERS)
+    seed_reservations(engine, 20000, USERS, BOOKS)
+
+    results = {}
+    for mode, flag in [("sync (threadpool)", "0"), ("async (aiosqlite)", "1")]:
+        env = dict(os.environ, DATABASE_URL=str(engine.url), DATABASE_ASYNC=flag)
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_async", "--worker",
+             "--concurrency", str(args.concurrency), "--requests", str(args.requests)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+        r = results[mode]
+        print(f"{mode:20} {r['requests_per_second']:8.1f} req/s  p50={r['p50_ms']:.1f}ms  p99={r['p99_ms']:.1f}ms")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/bench_batch.py
+"""
+Reservar y devolver una lista de lecturas: N peticiones individuales
+(POST /books/{id}/reserve, PUT /books/{id}/return) frente a una sola
+petición por lotes (POST /books/reserve/batch, PUT /books/return/batch).
+
+Informa de latencia, sentencias SQL y commits por operación, y comprueba
+la semántica de all_or_nothing y partial.
+
+Uso:
+    python -m benchmarks.bench_batch --books-per-list 5 --repeat 100
+"""
+import argparse
+import json
+import sys
+import time
+from contextlib import contextmanager
+from sqlalchemy import event, text
+from fastapi.testclient import TestClient
+from app.main import app
+from app.routers.auth import create_access_token
+from benchmarks.common import temp_engine, seed_books, seed_users, override_database, count_statements, summarize
+
+
+@contextmanager
+def count_commits(engine):
+    counter = {"commits": 0}
+
+    def _commit(conn):
+        counter["commits"] += 1
+
+    event.listen(engine, "commit", _commit)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "commit", _commit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books-per-list", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    engine, Session = temp_engine("batch")
+    seed_books(engine, 5000)
+    seed_users(engine, args.repeat * 2)
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE books SET total_copies = 1000, available_copies = 1000"))
+    override_database(app, Session)
+    client = TestClient(app)
+    tokens = [{"Authorization": f"Bearer {create_access_token({'sub': f'u{i}'})}"}
+              for i in range(args.repeat * 2)]
+    # Calentar la caché de usuarios para medir solo la operación
+    for headers in tokens:
+        client.get("/books/my/reservations?limit=1", headers=headers)
+
+    n = args.books_per_list
+    results = {}
+    for label, users in [("individual", range(args.repeat)), ("lotes", range(args.repeat, args.repeat * 2))]:
+        latencies = {"reserve": [], "return": []}
+        totals = {"statements": 0, "commits": 0}
+        for i in users:
+            headers = tokens[i]
+            book_ids = [1 + (i * n + k) % 5000 for k in range(n)]
+            for operation in ["reserve", "return"]:
+                with count_statements(engine) as statements, count_commits(engine) as commits:
+                    start = time.perf_counter()
+                    if label == "individual":
+                        for book_id in book_ids:
+                            if operation == "reserve":
+                                response = client.post(f"/books/{book_id}/reserve", headers=headers)
+                            else:
+                                response = client.put(f"/books/{book_id}/return", headers=headers)
+                            assert response.status_code == 200, response.text
+                    else:
+                        body = {"book_ids": book_ids}
+                        if operation == "reserve":
+                            response = client.post("/books/reserve/batch", json=body, headers=headers)
+                        else:
+                            response = client.put("/books/return/batch", json=body, headers=headers)
+                        assert response.status_code == 200 and response.json()["succeeded"] == n, response.text
+                    latencies[operation].append((time.perf_counter() - start) * 1000)
+                totals["statements"] += statements["statements"]
+                totals["commits"] += commits["commits"]
+        results[label] = {
+            "reserve": summarize(latencies["reserve"]),
+            "return": summarize(latencies["return"]),
+            "statements_per_list": totals["statements"] / args.repeat,
+            "commits_per_list": totals["commits"] / args.repeat,
+        }
+        r = results[label]
+        print(f"{label:10} reservar {n} p50 {r['reserve']['p50_ms']:6.2f}ms | devolver p50 "
+              f"{r['return']['p50_ms']:6.2f}ms | sentencias {r['statements_per_list']:.1f} | "
+              f"commits {r['commits_per_list']:.1f} por lista (reserva + devolución)")
+
+    # Semántica de los modos: el libro 5000 queda sin copias
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE books SET available_copies = 0 WHERE id = 5000"))
+    headers = tokens[0]
+    strict = client.post("/books/reserve/batch", json={"book_ids": [10, 11, 5000, 999999]}, headers=headers)
+    with engine.connect() as conn:
+        untouched = conn.execute(text("SELECT available_copies FROM books WHERE id IN (10, 11)")).scalars().all()
+    partial = client.post("/books/reserve/batch", headers=headers,
+                          json={"book_ids": [10, 11, 5000, 999999], "mode": "partial"}).json()
+    details = {item["book_id"]: item["detail"] for item in partial["items"]}
+    ok = (
+        strict.status_code == 409 and untouched == [1000, 1000]
+        and partial["succeeded"] == 2 and partial["failed"] == 2
+        and details[5000] == "No hay copias disponibles" and details[999999] == "Libro no encontrado"
+    )
+    print(f"all_or_nothing sin cambios y partial con resultado por libro: {'OK' if ok else 'FALLO'}")
+    print(json.dumps(results, indent=2))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# benchmarks/bench_catalog_cache.py
+"""
+GET condicional y caché de respuestas del catálogo.
+
+Mide GET /books/?limit=50 y GET /books/{id} sin caché (versión cambiada
+antes de cada petición), con la respuesta en caché y con If-None-Match
+(304), cuenta las sentencias SQL de cada caso y comprueba que una reserva
+cambia el ETag y el contenido.
+
+Uso:
+    python -m benchmarks.bench_catalog_cache --repeat 300
+"""
+import argparse
+import json
+import sys
+from fastapi.testclient import TestClient
+from app.main import app
+from app.catalog_cache import catalog_cache
+from app.routers.auth import create_access_token
+from benchmarks.common import (
+    temp_engine, seed_books, seed_users, override_database, count_statements, measure, summarize
+)
+
+PATHS = ["/books/?limit=50", "/books/1"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=300)
+    args = parser.parse_args()
+
+    engine, Session = temp_engine("catalog")
+    seed_books(engine, 20000)
+    seed_users(engine, 1)
+    override_database(app, Session)
+    client = TestClient(app)
+
+    results = {}
+    ok = True
+    for path in PATHS:
+        def uncached():
+            catalog_cache.bump()
+            assert client.get(path).status_code == 200
+
+        etag = client.get(path).headers["etag"]
+
+        def cached():
+            assert client.get(path).status_code == 200
+
+        def not_modified():
+            assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+
+        with count_statements(engine) as counter:
+            cached()
+            not_modified()
+        ok = ok and counter["statements"] == 0
+        results[path] = {
+            "sin_cache": summarize(measure(uncached, args.repeat)),
+            "cache_200": summarize(measure(cached, args.repeat)),
+            "cache_304": summarize(measure(not_modified, args.repeat)),
+            "sentencias_con_cache": counter["statements"],
+        }
+        r = results[path]
+        print(f"{path:18} sin caché p50 {r['sin_cache']['p50_ms']:6.2f}ms | "
+              f"caché 200 p50 {r['cache_200']['p50_ms']:6.2f}ms | "
+              f"304 p50 {r['cache_304']['p50_ms']:6.2f}ms | sentencias con caché {counter['statements']}")
+
+    # Una reserva invalida: nuevo ETag y copias actualizadas
+    before = client.get("/books/1")
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'u0'})}"}
+    assert client.post("/books/1/reserve", headers=headers).status_code == 200
+    after = client.get("/books/1", headers={"If-None-Match": before.headers["etag"]})
+    invalidated = (
+        after.status_code == 200
+        and after.headers["etag"] != before.headers["etag"]
+        and after.json()["available_copies"] == before.json()["available_copies"] - 1
+    )
+    print(f"Reserva -> nuevo ETag y copias actualizadas: {'OK' if invalidated else 'FALLO'}")
+    print(json.dumps(results, indent=2))
+    sys.exit(0 if ok and invalidated else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/bench_concurrent_reservations.py
+"""
+Prueba de carga concurrente sobre un único libro: cientos de usuarios
+reservan a la vez y deben tener éxito exactamente `total_copies`.
+Después cada usuario intenta devolver dos veces en paralelo y el
+inventario debe volver exactamente a `total_copies`.
+
+Uso:
+    python -m benchmarks.bench_concurrent_reservations --users 300 --copies 5
+"""
+import argparse
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from app.main import app
+from app.models.models import Book, User, Reservation
+from app.routers.auth import create_access_token
+from benchmarks.common import temp_engine, override_database
+
+
+def fire(client, method, paths_and_tokens, threads):
+    """
+    Lanzar todas las peticiones a la vez (barrera) y devolver los códigos
+    """
+    barrier = threading.Barrier(min(threads, len(paths_and_tokens)))
+
+    def call(item):
+        path, token = item
+        try:
+            barrier.wait(timeout=10)
+        except threading.BrokenBarrierError:
+            pass
+        response = client.request(method, path, headers={"Authorization": f"Bearer {token}"})
+        return response.status_code
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(call, paths_and_tokens))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--copies", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=64)
+    args = parser.parse_args()
+
+    engine, Session = temp_engine("concurrency")
+    with engine.begin() as conn:
+        conn.execute(insert(Book), [{
+            "title": "Cien años de soledad", "author": "Gabriel García Márquez",
+            "isbn": "978-0307474728", "total_copies": args.copies,
+            "available_copies": args.copies,
+        }])
+        conn.execute(insert(User), [
+            {"email": f"u{i}@bench.local", "username": f"u{i}", "full_name": f"U {i}",
+             "hashed_password": "-", "role": "estudiante"}
+            for i in range(args.users)
+        ])
+
+    override_database(app, Session)
+    client = TestClient(app)
+    tokens = [create_access_token({"sub": f"u{i}"}) for i in range(args.users)]
+
+    # Fase 1: todos reservan el mismo libro; algunos usuarios lo piden dos veces
+    requests = [("/books/1/reserve", token) for token in tokens] + \
+               [("/books/1/reserve", token) for token in tokens[:args.users // 10]]
+    start = time.perf_counter()
+    codes = fire(client, "POST", requests, args.threads)
+    elapsed = time.perf_counter() - start
+    reserved = Counter(codes)
+
+    db = Session()
+    book = db.get(Book, 1)
+    active = db.query(Reservation).filter(Reservation.status == "activa").count()
+    print(f"Reservas: {len(requests)} peticiones en {elapsed:.2f}s -> códigos {dict(reserved)}")
+    print(f"  copias disponibles={book.available_copies} reservas activas={active}")
+    ok = reserved[200] == args.copies and book.available_copies == 0 and active == args.copies
+
+    # Fase 2: devoluciones duplicadas en paralelo
+    requests = [("/books/1/return", token) for token in tokens] * 2
+    codes = fire(client, "PUT", requests, args.threads)
+    returned = Counter(codes)
+    db.expire_all()
+    book = db.get(Book, 1)
+    print(f"Devoluciones: códigos {dict(returned)} -> copias disponibles={book.available_copies}")
+    ok = ok and returned[200] == args.copies and book.available_copies == args.copies
+    db.close()
+
+    print("OK: sin sobreventa" if ok else "ERROR: inventario inconsistente")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# benchmarks/bench_export.py
+"""
+Memoria de la exportación de reservas (/books/admin/reservations/export)
+según el tamaño de la tabla, frente a materializar todas las reservas
+como objetos ORM + ReservationResponse.
+
+Uso:
+    python -m benchmarks.bench_export --small 50000 --large 500000
+"""
+import os
+import tempfile
+
+# El endpoint abre su propia sesión (SessionLocal): la base de datos
+# temporal se fija antes de importar la aplicación
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="biblioteca-export-"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+import argparse
+import sys
+import time
+import tracemalloc
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import engine, SessionLocal
+from app.schema import create_schema
+from app.export import export_statement, iter_export
+from app.models.models import Reservation, ReservationResponse
+from app.routers.auth import create_access_token
+from benchmarks.common import seed_books, seed_users, seed_reservations
+
+USERS = 1000
+BOOKS = 5000
+SEED_BATCH = 100000
+
+
+def grow_reservations(current: int, target: int) -> int:
+    while current < target:
+        count = min(SEED_BATCH, target - current)
+        seed_reservations(engine, count, USERS, BOOKS, seed=current)
+        current += count
+    return current
+
+
+def traced(func):
+    """
+    (resultado, pico de memoria en MB, segundos)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak / 1e6, elapsed
+
+
+def export_bytes(file_format: str) -> int:
+    return sum(len(chunk) for chunk in iter_export(export_statement(), file_format))
+
+
+def materialize() -> int:
+    with SessionLocal() as db:
+        reservations = db.query(Reservation).options(joinedload(Reservation.book)).all()
+        return len([ReservationResponse.model_validate(r).model_dump_json() for r in reservations])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--small", type=int, default=50000)
+    parser.add_argument("--large", type=int, default=500000)
+    args = parser.parse_args()
+
+    create_schema(engine)
+    seed_users(engine, USERS)
+    seed_books(engine, BOOKS)
+    rows = grow_reservations(0, args.small)
+
+    peaks = {}
+    for label, target in [("small", args.small), ("large", args.large)]:
+        rows = grow_reservations(rows, target)
+        for file_format in ["ndjson", "csv"]:
+            size, peak, elapsed = traced(lambda: export_bytes(file_format))
+            peaks[(label, file_format)] = peak
+            print(f"Exportación {file_format:6} {rows:>8} reservas: {size / 1e6:7.1f} MB enviados, "
+                  f"pico {peak:6.1f} MB, {rows / elapsed:8.0f} filas/s")
+        if label == "small":
+            _, peak, _ = traced(materialize)
+            print(f"Materializar ORM   {rows:>8} reservas: pico {peak:6.1f} MB")
+
+    # Filtros y formato a través del endpoint
+    client = TestClient(app)
+    seed_users(engine, 1, role="bibliotecario", prefix="bib")
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bib0'})}"}
+    response = client.get("/books/admin/reservations/export",
+                          params={"status": "devuelto", "book_id": 1}, headers=headers)
+    assert response.status_code == 200, response.text
+    with SessionLocal() as db:
+        expected = db.query(func.count(Reservation.id)).filter(Reservation.book_id == 1).scalar()
+    exported = len(response.text.splitlines())
+    response = client.get("/books/admin/reservations/export",
+                          params={"format": "csv", "user_id": 1}, headers=headers)
+    header = response.text.splitlines()[0]
+    print(f"Filtro book_id=1: {exported} filas (esperadas {expected}); cabecera CSV: {header}")
+
+    flat = all(peaks[("large", f)] < 2 * peaks[("small", f)] for f in ["ndjson", "csv"])
+    ok = flat and exported == expected and header.startswith("id,user_id")
+    print("Memoria constante" if flat else "La memoria crece con la tabla")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
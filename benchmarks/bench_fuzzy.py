@@ -0,0 +1,161 @@
+# benchmarks/bench_fuzzy.py
+"""
+Búsqueda tolerante a errores (GET /books/?fuzzy=true, app/search.py) sobre
+un catálogo sintético grande (por defecto un millón de libros).
+
+- búsquedas con erratas habituales ("garcia marques", "cervantez"...):
+  la búsqueda exacta (FTS5) no encuentra nada y la aproximada devuelve
+  primero libros con la palabra correcta; latencia p50/p95 de cada una;
+- mantenimiento incremental (desde el ORM, como los endpoints): un libro
+  nuevo se encuentra con erratas al momento, y tras cambiar su autor o
+  borrarlo deja de encontrarse;
+- la tabla books se puede escribir desde una conexión sqlite3 cualquiera
+  (sin funciones registradas por la aplicación);
+- coste del diccionario de términos en la inserción y tiempo de
+  reconstrucción completa.
+
+Uso:
+    python -m benchmarks.bench_fuzzy --books 1000000 --repeat 30
+"""
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from sqlalchemy import insert
+from app.models.models import Book
+from app.search import (
+    apply_search, fuzzy_search, search_index_suspended, index_terms, rebuild_term_index, update_term_index
+)
+from benchmarks.common import temp_engine, seed_books, measure, summarize
+from init_data import synthetic_book
+
+# Búsqueda con erratas -> palabra que deben tener los primeros resultados
+QUERIES = {
+    "garcia marques": ["garcia", "marquez"],
+    "cervantez": ["cervantes"],
+    "cortazr rayuela": ["cortazar", "rayuela"],
+    "soledat": ["soledad"],
+    "orwll": ["orwell"],
+    "gabriel garsia": ["gabriel", "garcia"],
+    "progrmacion": ["programacion"],
+    "benedeti": ["benedetti"],
+}
+TOP = 10
+
+
+def exact_search(db, search, limit):
+    query, keys = apply_search(db.query(Book), search)
+    return query.order_by(*keys).limit(limit).all()
+
+
+def relevant(rows, words) -> bool:
+    return bool(rows) and all(set(words) <= set(index_terms(row.title, row.author)) for row in rows)
+
+
+def insert_rate(engine, count: int) -> float:
+    """
+    Libros por segundo insertados de uno en uno (índice FTS5 y
+    diccionario de términos al día)
+    """
+    import random
+    rng = random.Random(7)
+    rows = [synthetic_book(rng, 10**9 + i) for i in range(count)]
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        for row in rows:
+            conn.execute(insert(Book), row)
+            update_term_index(conn, added=[(row["title"], row["author"])])
+    return round(count / (time.perf_counter() - start))
+
+
+def external_write(path: str) -> bool:
+    """
+    Alta, cambio y baja de un libro con el módulo sqlite3, sin nada
+    registrado por la aplicación en la conexión
+    """
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+                "VALUES ('Libro externo', 'Autora Externa', 'bench-fuzzy-sqlite3', 1, 1)"
+            )
+            conn.execute("UPDATE books SET title = 'Libro externo (2ª ed.)' WHERE id = ?", (cursor.lastrowid,))
+            conn.execute("DELETE FROM books WHERE id = ?", (cursor.lastrowid,))
+        return True
+    except sqlite3.Error as exc:
+        print(f"Escritura con sqlite3: {exc}")
+        return False
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--p95-ms", type=float, default=50.0, help="Objetivo de latencia (p95)")
+    args = parser.parse_args()
+
+    engine, Session = temp_engine("fuzzy")
+    start = time.perf_counter()
+    with search_index_suspended(engine):
+        seed_books(engine, args.books)
+    print(f"Catálogo sintético: {args.books} libros e índices en {time.perf_counter() - start:.1f}s")
+    with engine.begin() as conn:
+        start = time.perf_counter()
+        rebuild_term_index(conn)
+        rebuild_seconds = round(time.perf_counter() - start, 1)
+        terms = conn.exec_driver_sql("SELECT count(*) FROM search_terms").scalar()
+
+    results = {"terminos": terms, "reconstruccion_s": rebuild_seconds}
+    checks = {}
+    db = Session()
+    try:
+        for search, words in QUERIES.items():
+            exact = exact_search(db, search, args.limit)
+            rows = fuzzy_search(db.query(Book), search, args.limit)
+            timing = summarize(measure(lambda: fuzzy_search(db.query(Book), search, args.limit), args.repeat))
+            results[search] = dict(timing, exactos=len(exact), aproximados=len(rows),
+                                   primero=f"{rows[0].title} / {rows[0].author}" if rows else None)
+            checks[f"{search}: sin resultados exactos"] = not exact
+            checks[f"{search}: encuentra {' '.join(words)}"] = relevant(rows[:TOP], words)
+            print(f"{search!r:20} exacta {len(exact):3} | aproximada {len(rows):3} "
+                  f"p50={timing['p50_ms']:7.2f}ms p95={timing['p95_ms']:7.2f}ms | {results[search]['primero']}")
+        worst = max(results[search]["p95_ms"] for search in QUERIES)
+        checks[f"p95 < {args.p95_ms:g} ms"] = worst < args.p95_ms
+
+        # Mantenimiento incremental (eventos del ORM): alta, cambio y baja
+        book = Book(title="El quetzal de obsidiana", author="Wenceslao Xochitlán",
+                    isbn="bench-fuzzy-1", total_copies=1, available_copies=1)
+        db.add(book)
+        db.commit()
+        book_id = book.id
+
+        def found(search):
+            return book_id in [row.id for row in fuzzy_search(db.query(Book), search, args.limit)]
+
+        checks["alta: 'wenceslau xochitlan'"] = found("wenceslau xochitlan")
+        checks["alta: 'quetsal obsidiana'"] = found("quetsal obsidiana")
+        book.author = "Remedios Varo"
+        db.commit()
+        checks["cambio: ya no 'xochitlan'"] = not found("xochitlan")
+        checks["cambio: 'remedio varo'"] = found("remedio varo")
+        db.delete(book)
+        db.commit()
+        checks["baja: ya no 'quetsal'"] = not found("quetsal obsidiana")
+    finally:
+        db.close()
+
+    results["inserciones_por_s"] = insert_rate(engine, 2000)
+    checks["escritura sin la aplicación (sqlite3)"] = external_write(engine.url.database)
+    for name, ok in checks.items():
+        print(f"  {name:40} {'OK' if ok else 'FALLO'}")
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# benchmarks/bench_holds.py
+"""
+Cola de espera de libros sin copias (POST /books/{id}/hold) frente a
+reintentar la reserva.
+
+Un libro de una copia, `--waiting` estudiantes que lo quieren y un lector
+que lo devuelve una vez por ronda:
+- sin cola: en cada ronda todos los que esperan reintentan la reserva
+  (uno lo consigue, el resto recibe 400);
+- con cola: cada estudiante se apunta una vez y la devolución le entrega
+  la copia al primero de la cola en la misma transacción.
+
+Se comprueba el orden FIFO, la entrega al vencer una reserva (barrido),
+al ampliar copias (PUT /books/admin/{id}) y la coherencia del inventario
+y de las estadísticas.
+
+Uso:
+    python -m benchmarks.bench_holds --waiting 50
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, text, update
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models.models import Book, Reservation, Hold
+from app.routers.auth import create_access_token
+from app.inventory import mark_overdue
+from app.stats import check_stats
+from benchmarks.common import temp_engine, seed_books, seed_users, override_database, summarize
+
+
+def token(username: str) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+
+
+def set_copies(engine, book_id: int, copies: int):
+    with engine.begin() as conn:
+        conn.execute(update(Book).where(Book.id == book_id).values(total_copies=copies, available_copies=copies))
+
+
+def without_queue(client, book_id: int, waiting: list, rng: random.Random):
+    requests, order = 0, []
+    holder = "u0"
+    assert client.post(f"/books/{book_id}/reserve", headers=token(holder)).status_code == 200
+    remaining = list(waiting)
+    return_ms = []
+    while remaining:
+        start = time.perf_counter()
+        assert client.put(f"/books/{book_id}/return", headers=token(holder)).status_code == 200
+        return_ms.append((time.perf_counter() - start) * 1000)
+        rng.shuffle(remaining)
+        winner = None
+        for username in remaining:
+            requests += 1
+            response = client.post(f"/books/{book_id}/reserve", headers=token(username))
+            if response.status_code == 200 and winner is None:
+                winner = username
+        remaining.remove(winner)
+        order.append(winner)
+        holder = winner
+    client.put(f"/books/{book_id}/return", headers=token(holder))
+    return requests, order, return_ms
+
+
+def with_queue(client, book_id: int, waiting: list):
+    requests = 0
+    holder = "u0"
+    assert client.post(f"/books/{book_id}/reserve", headers=token(holder)).status_code == 200
+    positions = []
+    for username in waiting:
+        requests += 1
+        response = client.post(f"/books/{book_id}/hold", headers=token(username))
+        assert response.status_code == 200, response.text
+        positions.append(response.json()["position"])
+    mine = client.get("/books/my/holds", headers=token(waiting[-1])).json()
+
+    order, return_ms = [], []
+    for _ in waiting:
+        start = time.perf_counter()
+        assert client.put(f"/books/{book_id}/return", headers=token(holder)).status_code == 200
+        return_ms.append((time.perf_counter() - start) * 1000)
+        # La copia ya es de alguien: buscar quién (sin peticiones del estudiante)
+        holder = next(u for u in waiting if u not in order and client.get(
+            "/books/my/reservations", params={"limit": 1}, headers=token(u)
+        ).json()["items"][0]["status"] == "activa")
+        order.append(holder)
+    client.put(f"/books/{book_id}/return", headers=token(holder))
+    ok = positions == list(range(1, len(waiting) + 1)) and mine[0]["position"] == len(waiting)
+    return requests, order, return_ms, ok
+
+
+def inventory_consistent(engine) -> bool:
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT count(*) FROM books b WHERE b.available_copies != b.total_copies - "
+            "(SELECT count(*) FROM reservations r WHERE r.book_id = b.id AND r.status = 'activa') "
+            "OR (b.available_copies > 0 AND EXISTS (SELECT 1 FROM holds h WHERE h.book_id = b.id))"
+        )).scalar() == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--waiting", type=int, default=50)
+    args = parser.parse_args()
+
+    engine, Session = temp_engine("holds")
+    seed_books(engine, 1000)
+    seed_users(engine, args.waiting + 1)
+    seed_users(engine, 1, role="admin", prefix="a")
+    override_database(app, Session)
+    client = TestClient(app)
+    waiting = [f"u{i}" for i in range(1, args.waiting + 1)]
+
+    set_copies(engine, 1, 1)
+    polling_requests, _, plain_return_ms = without_queue(client, 1, waiting, random.Random(3))
+    set_copies(engine, 2, 1)
+    queue_requests, order, handoff_return_ms, positions_ok = with_queue(client, 2, waiting)
+    fifo = order == waiting
+    print(f"Peticiones de los estudiantes: reintentando {polling_requests}, con cola {queue_requests}")
+    print(f"Orden de entrega FIFO: {'OK' if fifo else 'FALLO'} | posiciones: {'OK' if positions_ok else 'FALLO'}")
+
+    # Entrega al vencer una reserva: libro 3 con un lector y dos en cola
+    set_copies(engine, 3, 1)
+    client.post("/books/3/reserve", headers=token("u0"))
+    client.post("/books/3/hold", headers=token("u1"))
+    client.post("/books/3/hold", headers=token("u2"))
+    with engine.begin() as conn:
+        conn.execute(update(Reservation).where(Reservation.book_id == 3, Reservation.status == "activa")
+                     .values(due_date=datetime.utcnow() - timedelta(days=1)))
+    with Session() as db:
+        swept = mark_overdue(db)
+        db.commit()
+        overdue_handoff = db.execute(
+            select(Reservation.user_id).where(Reservation.book_id == 3, Reservation.status == "activa")
+        ).scalars().all() == [2] and db.execute(select(Hold.user_id).where(Hold.book_id == 3)).scalars().all() == [3]
+
+    # Ampliar copias atiende primero la cola (queda u2 en la del libro 3)
+    book = client.get("/books/3").json()
+    response = client.put("/books/admin/3", headers=token("a0"), json={
+        "title": book["title"], "author": book["author"], "isbn": book["isbn"],
+        "description": book["description"], "total_copies": 3
+    })
+    after = client.get("/books/3").json()
+    with Session() as db:
+        extra_copies_handoff = (
+            response.status_code == 200 and after["available_copies"] == 1
+            and not db.execute(select(Hold.id).where(Hold.book_id == 3)).first()
+        )
+        rebuild_needed = check_stats(db)
+    consistent = inventory_consistent(engine) and not rebuild_needed["books"] and not rebuild_needed["statuses"]
+    print(f"Entrega al vencer ({swept} vencida): {'OK' if overdue_handoff else 'FALLO'} | "
+          f"al ampliar copias: {'OK' if extra_copies_handoff else 'FALLO'} | "
+          f"inventario y estadísticas coherentes: {'OK' if consistent else 'FALLO'}")
+
+    results = {
+        "student_requests": {"retrying": polling_requests, "queue": queue_requests},
+        "return_plain": summarize(plain_return_ms),
+        "return_with_handoff": summarize(handoff_return_ms),
+    }
+    print(f"Devolución: p50 {results['return_plain']['p50_ms']:.2f} ms sin cola, "
+          f"{results['return_with_handoff']['p50_ms']:.2f} ms con entrega a la cola")
+    print(json.dumps(results, indent=2))
+    ok = fifo and positions_ok and overdue_handoff and extra_copies_handoff and consistent
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# benchmarks/bench_import.py
+"""
+Importación masiva del catálogo (POST /books/admin/import) frente a la
+creación libro a libro de POST /books/admin/create (consulta de ISBN,
+insert, commit y refresh por libro).
+
+El fichero generado incluye filas inválidas, ISBN repetidos, un ISBN
+que ya existe en la base de datos y una fila en Latin-1 (exportada de
+Excel); se comprueba que se informan y que el resto de la carga se
+completa.
+
+Uso:
+    python -m benchmarks.bench_import --books 200000 --baseline 2000
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models.models import Book, BookCreate
+from app.routers.auth import create_access_token
+from app.routers.books import _create_new_book
+from benchmarks.common import temp_engine, seed_books, seed_users, override_database
+from init_data import synthetic_book
+
+FIELDS = ["title", "author", "isbn", "description", "total_copies"]
+
+
+def write_catalog(path: str, count: int):
+    """
+    CSV con `count` libros válidos más 5 filas erróneas conocidas
+    """
+    rng = random.Random(7)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for i in range(count):
+            writer.writerow(synthetic_book(rng, 1_000_000 + i))
+        writer.writerow({"title": "Sin ISBN", "author": "Nadie"})
+        writer.writerow({"title": "Copias", "author": "Nadie", "isbn": "x-1", "total_copies": "muchas"})
+        writer.writerow(synthetic_book(rng, 1_000_000))  # repetido en el fichero
+        writer.writerow(synthetic_book(rng, 0))          # ya existe en la BD
+    with open(path, "ab") as f:
+        f.write("Cien años de soledad,Gabriel García Márquez,x-latin1,,1\r\n".encode("latin-1"))
+
+
+def baseline(count: int) -> float:
+    """
+    Libros por segundo con la ruta de creación individual
+    """
+    _, Session = temp_engine("import-baseline")
+    rng = random.Random(7)
+    books = [BookCreate(**synthetic_book(rng, i)) for i in range(count)]
+    db = Session()
+    start = time.perf_counter()
+    for book in books:
+        _create_new_book(db, book)
+    elapsed = time.perf_counter() - start
+    db.close()
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=200000)
+    parser.add_argument("--baseline", type=int, default=2000)
+    args = parser.parse_args()
+
+    engine, Session = temp_engine("import")
+    seed_books(engine, 10)
+    seed_users(engine, 1, role="admin", prefix="admin")
+    path = os.path.join(tempfile.mkdtemp(prefix="biblioteca-import-"), "catalogo.csv")
+    write_catalog(path, args.books)
+    size_mb = os.path.getsize(path) / 1e6
+
+    override_database(app, Session)
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin0'})}"}
+    with open(path, "rb") as f:
+        response = client.post(
+            "/books/admin/import", headers=headers,
+            files={"file": ("catalogo.csv", f, "text/csv")}
+        )
+    assert response.status_code == 200, response.text
+    report = response.json()
+
+    with Session() as db:
+        total = db.query(Book).count()
+
+    one_by_one = baseline(args.baseline)
+    print(f"Fichero: {args.books + 5} filas, {size_mb:.1f} MB")
+    print(f"Importación masiva: {report['inserted']} insertados en {report['seconds']}s "
+          f"({report['rows_per_second']:.0f} filas/s)")
+    print(f"Creación individual: {one_by_one:.0f} libros/s")
+    print(f"Errores: {report['error_count']} (duplicados: {report['duplicates']})")
+    print(json.dumps({k: v for k, v in report.items() if k != "errors"} | {"errors": report["errors"][:10]},
+                     indent=2, ensure_ascii=False))
+
+    expected_ok = (
+        report["inserted"] == args.books
+        and report["error_count"] == 5
+        and report["duplicates"] == 2
+        and total == args.books + 10
+    )
+    sys.exit(0 if expected_ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# benchmarks/bench_login_storm.py
+"""
+Latencia del catálogo durante una avalancha de logins (bcrypt).
+
+Mide GET /books/ con clientes concurrentes primero en reposo y después
+mientras cientos de logins compiten por el pool de bcrypt, e informa de
+los 503 emitidos y de las estadísticas del pool.
+
+Uso:
+    python -m benchmarks.bench_login_storm --logins 400 --login-concurrency 100
+"""
+import argparse
+import asyncio
+import json
+import time
+from sqlalchemy import insert
+from benchmarks.common import temp_engine, seed_books, summarize, override_database
+
+READERS = 20
+
+
+async def catalog_readers(client, stop: asyncio.Event, latencies: list):
+    async def reader():
+        while not stop.is_set():
+            start = time.perf_counter()
+            response = await client.get("/books/?limit=20")
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200
+
+    await asyncio.gather(*[reader() for _ in range(READERS)])
+
+
+async def run(args, users: int, Session):
+    import httpx
+    from app.main import app
+    from app.hashing import hasher
+    from app.ratelimit import rate_limits
+
+    override_database(app, Session)
+    # Mide el pool de bcrypt: todos los logins salen de la misma IP
+    rate_limits.enabled = False
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Calentar el pool de procesos
+        await client.post("/auth/login", data={"username": "u0", "password": "est123"})
+
+        idle = []
+        stop = asyncio.Event()
+        readers = asyncio.create_task(catalog_readers(client, stop, idle))
+        await asyncio.sleep(args.seconds)
+        stop.set()
+        await readers
+
+        storm = []
+        stop = asyncio.Event()
+        readers = asyncio.create_task(catalog_readers(client, stop, storm))
+        codes = {}
+        semaphore = asyncio.Semaphore(args.login_concurrency)
+
+        async def login(i):
+            async with semaphore:
+                response = await client.post(
+                    "/auth/login", data={"username": f"u{i % users}", "password": "est123"}
+                )
+                codes[response.status_code] = codes.get(response.status_code, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*[login(i) for i in range(args.logins)])
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await readers
+
+    result = {
+        "catalog_idle": summarize(idle),
+        "catalog_during_storm": summarize(storm),
+        "logins": codes,
+        "logins_per_second": round(args.logins / elapsed, 1),
+        "hasher": hasher.stats(),
+    }
+    hasher.shutdown()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--login-concurrency", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    engine, Session = temp_engine("login")
+    seed_books(engine, 2000)
+    from app.hashing import hash_password_sync
+    from app.models.models import User
+    hashed = hash_password_sync("est123")
+    users = 50
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"email": f"u{i}@bench.local", "username": f"u{i}", "full_name": f"U {i}",
+             "hashed_password": hashed, "role": "estudiante"}
+            for i in range(users)
+        ])
+
+    result = asyncio.run(run(args, users, Session))
+    idle, storm = result["catalog_idle"], result["catalog_during_storm"]
+    print(f"Catálogo en reposo:   p50={idle['p50_ms']:.1f}ms p99={idle['p99_ms']:.1f}ms")
+    print(f"Catálogo con logins:  p50={storm['p50_ms']:.1f}ms p99={storm['p99_ms']:.1f}ms")
+    print(f"Logins: {result['logins']} ({result['logins_per_second']} logins/s)")
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
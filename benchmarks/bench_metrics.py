@@ -0,0 +1,115 @@
+# benchmarks/bench_metrics.py
+"""
+Coste de la instrumentación de app/metrics.py.
+
+- Middleware: llamada ASGI a una aplicación vacía con y sin MetricsMiddleware.
+- Eventos del motor: SELECT 1 con y sin instrument_engine.
+- Extremo a extremo: GET /books/{id} (sin caché) con la aplicación completa,
+  con y sin el middleware en la pila.
+
+Uso:
+    python -m benchmarks.bench_metrics --repeat 20000
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import httpx
+from sqlalchemy import create_engine, event, text
+from app.main import app
+from app.catalog_cache import catalog_cache
+from app.metrics import MetricsMiddleware, MetricsRegistry, instrument_engine, _before_cursor_execute, _after_cursor_execute
+from benchmarks.common import temp_engine, seed_books, override_database, summarize
+
+
+async def empty_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def asgi_calls(asgi, repeat: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/", "app": app}
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await asgi(scope, receive, send)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def statements(engine, repeat: int) -> float:
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(text("SELECT 1"))
+        return (time.perf_counter() - start) / repeat * 1e6
+
+
+async def end_to_end(repeat: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    samples = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(repeat):
+            catalog_cache.bump()
+            start = time.perf_counter()
+            response = await client.get(f"/books/{1 + i % 1000}")
+            samples.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200
+    return summarize(samples)
+
+
+ALL_MIDDLEWARE = list(app.user_middleware)
+
+
+def set_metrics_middleware(enabled: bool):
+    app.user_middleware = [m for m in ALL_MIDDLEWARE if enabled or m.cls is not MetricsMiddleware]
+    app.middleware_stack = app.build_middleware_stack()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    bare = asyncio.run(asgi_calls(empty_app, args.repeat))
+    wrapped = asyncio.run(asgi_calls(MetricsMiddleware(empty_app, MetricsRegistry()), args.repeat))
+    print(f"Middleware:   {bare:6.1f} µs -> {wrapped:6.1f} µs por petición (+{wrapped - bare:.1f} µs)")
+
+    plain = create_engine("sqlite://")
+    instrumented = create_engine("sqlite://")
+    instrument_engine(instrumented)
+    statements(plain, 1000), statements(instrumented, 1000)
+    before, after = statements(plain, args.repeat), statements(instrumented, args.repeat)
+    print(f"Sentencia SQL: {before:6.1f} µs -> {after:6.1f} µs (+{after - before:.1f} µs)")
+
+    engine, Session = temp_engine("metrics")
+    seed_books(engine, 1000)
+    instrument_engine(engine)
+    override_database(app, Session)
+    results = {}
+    for enabled in [False, True, False, True]:
+        set_metrics_middleware(enabled)
+        if not enabled:
+            event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+            event.remove(engine, "after_cursor_execute", _after_cursor_execute)
+        results["con_metricas" if enabled else "sin_metricas"] = asyncio.run(end_to_end(args.requests))
+        if not enabled:
+            instrument_engine(engine)
+    off, on = results["sin_metricas"], results["con_metricas"]
+    print(f"GET /books/{{id}}: p50 {off['p50_ms']:.3f} ms -> {on['p50_ms']:.3f} ms, "
+          f"media {off['mean_ms']:.3f} -> {on['mean_ms']:.3f} ms")
+    print(json.dumps({"middleware_us": [bare, wrapped], "statement_us": [before, after], **results}, indent=2))
+    overhead = (on["mean_ms"] - off["mean_ms"]) / off["mean_ms"]
+    print(f"Sobrecoste extremo a extremo: {overhead:.1%}")
+    sys.exit(0 if overhead < 0.05 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# benchmarks/bench_multiworker.py
+"""
+Invalidación de cachés entre workers (app/invalidation.py).
+
+Lanza varios procesos de uvicorn sobre la misma base de datos (uno por
+puerto, como los workers de `uvicorn --workers`, pero direccionables uno a
+uno) y, con las cachés ya calientes en todos:
+
+- edita un libro a través del primer worker y mide cuánto tardan los
+  demás en servir el dato nuevo en GET /books/{id} (caché del catálogo)
+  y en sugerirlo en GET /books/suggest (índice de autocompletado);
+- quita el rol de bibliotecario a un usuario directamente con el ORM
+  (otro proceso) y mide cuánto tardan todos en negarle una ruta de
+  bibliotecario (caché de tokens).
+
+Termina con código 1 si algún worker sigue sirviendo datos viejos pasado
+el límite.
+
+Uso:
+    python -m benchmarks.bench_multiworker --workers 3 --interval 0.2 --bound 2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import httpx
+from app.models.models import User
+from app.routers.auth import create_access_token
+from app.schema import create_schema
+from benchmarks.bench_startup import ROOT, free_port
+from benchmarks.common import temp_engine, seed_books, seed_users
+
+
+def start_workers(count: int, env: dict) -> list:
+    workers = []
+    for _ in range(count):
+        port = free_port()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        workers.append((process, httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5)))
+    for _, client in workers:
+        deadline = time.perf_counter() + 60
+        while True:
+            try:
+                if client.get("/health").status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if time.perf_counter() > deadline:
+                raise RuntimeError("uvicorn no respondió")
+            time.sleep(0.05)
+    return workers
+
+
+def wait_until(clients: list, check, bound: float) -> list:
+    """
+    Segundos hasta que check(client) es cierto en cada cliente (None si no
+    llega dentro del límite)
+    """
+    start = time.perf_counter()
+    pending = dict(enumerate(clients))
+    delays = [None] * len(clients)
+    while pending and time.perf_counter() - start < bound:
+        for index, client in list(pending.items()):
+            if check(client):
+                delays[index] = round(time.perf_counter() - start, 3)
+                del pending[index]
+        time.sleep(0.01)
+    return delays
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--interval", type=float, default=0.2)
+    parser.add_argument("--bound", type=float, default=2.0)
+    args = parser.parse_args()
+
+    engine, Session = temp_engine("multiworker")
+    create_schema(engine)
+    seed_books(engine, 1000)
+    seed_users(engine, 1, role="admin", prefix="admin")
+    seed_users(engine, 1, role="bibliotecario")
+    env = dict(os.environ, DATABASE_URL=str(engine.url), SCHEMA_ON_STARTUP="0",
+               OVERDUE_SWEEP_INTERVAL_SECONDS="0", CACHE_SYNC_INTERVAL_SECONDS=str(args.interval))
+    admin = {"Authorization": f"Bearer {create_access_token({'sub': 'admin0'})}"}
+    librarian = {"Authorization": f"Bearer {create_access_token({'sub': 'u0'})}"}
+
+    workers = start_workers(args.workers, env)
+    clients = [client for _, client in workers]
+    try:
+        # Cachés calientes en todos los workers
+        for client in clients:
+            for _ in range(2):
+                book = client.get("/books/1").json()
+                response = client.get("/books/admin/sweeper", headers=librarian)
+                assert response.status_code == 200, response.text
+
+        # 1. Libro editado a través del primer worker
+        title = book["title"] + " (2.ª edición)"
+        update = {key: book[key] for key in ["title", "author", "isbn", "description", "total_copies"]}
+        response = clients[0].put("/books/admin/1", json=dict(update, title=title), headers=admin)
+        assert response.status_code == 200, response.text
+        book_delays = wait_until(clients, lambda c: c.get("/books/1").json()["title"] == title, args.bound)
+        suggest_delays = wait_until(
+            clients, lambda c: title in [s["text"] for s in c.get("/books/suggest", params={"q": title}).json()],
+            args.bound,
+        )
+
+        # 2. Rol retirado desde otro proceso (evento del ORM)
+        with Session() as db:
+            db.query(User).filter(User.username == "u0").one().role = "estudiante"
+            db.commit()
+        role_delays = wait_until(
+            clients, lambda c: c.get("/books/admin/sweeper", headers=librarian).status_code == 403, args.bound
+        )
+        applied = [
+            next(float(line.split()[-1]) for line in client.get("/metrics").text.splitlines()
+                 if line.startswith("cache_sync_applied"))
+            for client in clients
+        ]
+    finally:
+        for process, client in workers:
+            client.close()
+            process.terminate()
+            process.wait()
+
+    result = {"workers": args.workers, "interval_seconds": args.interval,
+              "catalog_delays_s": book_delays, "suggest_delays_s": suggest_delays, "user_delays_s": role_delays, "applied": applied}
+    ok = None not in book_delays + suggest_delays + role_delays
+    print(f"{args.workers} workers, sondeo cada {args.interval}s")
+    for label, delays in [("Libro editado", book_delays), ("Sugerencia editada", suggest_delays),
+                            ("Rol retirado", role_delays)]:
+        print(f"{label} visible en todos: {'FALLO' if None in delays else f'{max(delays)} s'}")
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# benchmarks/bench_oidc.py
+"""
+Validación local de access tokens de Keycloak (app/oidc.py) contra un
+emisor de prueba: un servidor HTTP local que publica el JWKS de claves RSA
+generadas aquí y cuenta cuántas veces se le pide.
+
+- validaciones por segundo: tokens distintos (verificación de firma RSA) y
+  los mismos otra vez (caché de tokens validados), sin llamadas al emisor
+  más allá de la primera descarga del JWKS;
+- rechazos: caducado, otro emisor, otra audiencia, firma alterada, `kid`
+  desconocido (sin repetir descargas) y HS256 firmado con la clave pública;
+- rotación de claves: un `kid` nuevo provoca una única descarga; con el
+  emisor caído se siguen usando las claves ya conocidas;
+- de extremo a extremo (GET /books/admin/sweeper con el token como Bearer):
+  el primer acceso crea el usuario con el rol del token y los siguientes,
+  con tokens nuevos, no escriben en la base de datos; dos primeros accesos
+  simultáneos crean un solo usuario; un token sin sub, sin
+  preferred_username o con el nombre de una cuenta local existente recibe
+  401 (y la cuenta local no cambia).
+
+Uso:
+    python -m benchmarks.bench_oidc --tokens 2000
+"""
+import os
+import tempfile
+from benchmarks.bench_startup import free_port
+
+# La aplicación lee la configuración OIDC al importarse: el emisor de
+# prueba y la base de datos temporal se fijan antes
+PORT = free_port()
+ISSUER = f"http://127.0.0.1:{PORT}/realms/biblioteca"
+os.environ.update({
+    "OIDC_ENABLED": "1",
+    "OIDC_ISSUER": ISSUER,
+    "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='biblioteca-oidc-'), 'bench.db')}",
+    "OVERDUE_SWEEP_INTERVAL_SECONDS": "0",
+    "CACHE_SYNC_INTERVAL_SECONDS": "0",
+})
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+import httpx
+from fastapi.testclient import TestClient
+from jose import jwk, jwt
+from sqlalchemy import event, insert, select
+from app import oidc
+from app.config import OIDC_AUDIENCE, OIDC_JWKS_URL
+from app.database import engine
+from app.main import app
+from app.models.models import User
+
+
+class StubIssuer:
+    """
+    Emisor de prueba: claves RSA, tokens firmados y un JWKS servido por HTTP
+    """
+
+    def __init__(self, port: int):
+        self.keys = {}
+        self.published = []
+        self.requests = 0
+        self.available = True
+        issuer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                issuer.requests += 1
+                if not issuer.available:
+                    self.send_error(503)
+                    return
+                body = json.dumps({"keys": [issuer.keys[kid]["public"] for kid in issuer.published]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def new_key(self, publish: bool = True) -> str:
+        kid = uuid.uuid4().hex[:8]
+        private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        pem = private.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption())
+        public_pem = private.public_key().public_bytes(serialization.Encoding.PEM,
+                                                       serialization.PublicFormat.SubjectPublicKeyInfo)
+        public = dict(jwk.construct(public_pem, "RS256").to_dict(), kid=kid, use="sig")
+        self.keys[kid] = {"private": jwk.construct(pem, "RS256"), "public_pem": public_pem, "public": public}
+        if publish:
+            self.published.append(kid)
+        return kid
+
+    def token(self, kid: str, username: str, roles=("estudiante",), expires_in: int = 300, **overrides) -> str:
+        now = int(time.time())
+        claims = {
+            "iss": ISSUER, "aud": "account", "azp": OIDC_AUDIENCE, "sub": f"kc-{username}",
+            "preferred_username": username, "email": f"{username}@sso.biblioteca.com",
+            "realm_access": {"roles": list(roles)}, "iat": now, "exp": now + expires_in,
+            "jti": uuid.uuid4().hex,
+        }
+        claims.update(overrides)
+        return jwt.encode(claims, self.keys[kid]["private"], algorithm="RS256", headers={"kid": kid})
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def hs256_token(claims: dict, secret: bytes, kid: str) -> str:
+    """
+    Token HS256 firmado con `secret` (python-jose se niega si es una clave
+    pública: se firma a mano)
+    """
+    def b64(data: bytes) -> str:
+        return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+    signing_input = b64(json.dumps({"alg": "HS256", "typ": "JWT", "kid": kid}).encode()) + "." + \
+        b64(json.dumps(claims).encode())
+    return signing_input + "." + b64(hmac.new(secret, signing_input.encode(), hashlib.sha256).digest())
+
+
+def new_verifier(ttl: float = 3600, min_refresh: float = 30) -> oidc.OIDCVerifier:
+    return oidc.OIDCVerifier(ISSUER, OIDC_AUDIENCE, oidc.JWKSCache(OIDC_JWKS_URL, ttl, min_refresh))
+
+
+def per_second(verifier, tokens: list) -> float:
+    start = time.perf_counter()
+    for token in tokens:
+        verifier.verify(token)
+    return round(len(tokens) / (time.perf_counter() - start))
+
+
+def rejected(verifier, token: str) -> bool:
+    try:
+        verifier.verify(token)
+    except oidc.InvalidToken:
+        return True
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=2000)
+    args = parser.parse_args()
+
+    stub = StubIssuer(PORT)
+    kid = stub.new_key()
+    checks = {}
+    results = {}
+
+    # 1. Validaciones por segundo, sin llamadas al emisor por token
+    tokens = [stub.token(kid, f"u{i}") for i in range(args.tokens)]
+    verifier = new_verifier()
+    before = stub.requests
+    results["validaciones_por_s_firma"] = per_second(verifier, tokens)
+    results["validaciones_por_s_cache"] = per_second(verifier, tokens)
+    results["llamadas_al_emisor"] = stub.requests - before
+    checks["una_descarga_del_jwks"] = results["llamadas_al_emisor"] == 1
+
+    # 2. Rechazos
+    other = stub.new_key(publish=False)
+    forged = tokens[0].rsplit(".", 1)[0] + "." + stub.token(kid, "u0").rsplit(".", 1)[1]
+    before = stub.requests
+    checks["caducado"] = rejected(verifier, stub.token(kid, "x", expires_in=-120))
+    checks["otro_emisor"] = rejected(verifier, stub.token(kid, "x", iss="http://evil.example/realms/biblioteca"))
+    checks["otra_audiencia"] = rejected(verifier, stub.token(kid, "x", aud="otro", azp="otro"))
+    checks["firma_alterada"] = rejected(verifier, forged)
+    checks["kid_desconocido"] = all(rejected(verifier, stub.token(other, f"x{i}")) for i in range(50))
+    checks["kid_desconocido_sin_tormenta"] = stub.requests - before <= 1
+    confusion = hs256_token({"iss": ISSUER, "azp": OIDC_AUDIENCE, "sub": "x", "exp": int(time.time()) + 60},
+                            stub.keys[kid]["public_pem"], kid)
+    checks["hs256_con_clave_publica"] = not verifier.accepts(confusion) and rejected(verifier, confusion)
+
+    # 3. Rotación: un `kid` nuevo, una descarga; emisor caído, claves conocidas
+    rotating = new_verifier(ttl=0.2, min_refresh=0.1)
+    rotating.verify(stub.token(kid, "r"))
+    time.sleep(0.15)
+    new_kid = stub.new_key()
+    stub.published.remove(kid)
+    before = stub.requests
+    checks["rotacion"] = not rejected(rotating, stub.token(new_kid, "r"))
+    checks["rotacion_una_descarga"] = stub.requests - before == 1
+    stub.available = False
+    time.sleep(0.25)
+    checks["emisor_caido"] = not rejected(rotating, stub.token(new_kid, "r2"))
+    stub.available = True
+
+    # 4. De extremo a extremo: sin escrituras tras el primer acceso
+    writes = {"statements": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count_writes(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE")):
+            writes["statements"] += 1
+
+    with TestClient(app) as client:
+        def sweeper(roles):
+            token = stub.token(new_kid, "ana", roles=roles)
+            return client.get("/books/admin/sweeper", headers={"Authorization": f"Bearer {token}"}).status_code
+
+        checks["primer_acceso"] = sweeper(["bibliotecario", "offline_access"]) == 200
+        first_writes = writes["statements"]
+        checks["accesos_sin_escrituras"] = all(sweeper(["bibliotecario"]) == 200 for _ in range(20)) \
+            and writes["statements"] == first_writes
+        results["escrituras_primer_acceso"] = first_writes
+        # Rol retirado en Keycloak: se refleja con el siguiente token
+        checks["rol_retirado"] = sweeper(["estudiante"]) == 403
+
+        def status_code(token):
+            return client.get("/books/admin/sweeper", headers={"Authorization": f"Bearer {token}"}).status_code
+
+        # Token válido sin preferred_username (client-credentials)
+        checks["sin_preferred_username"] = status_code(stub.token(new_kid, "svc", preferred_username=None)) == 401
+        checks["sin_sub"] = status_code(stub.token(new_kid, "svc", sub=None)) == 401
+        # Cuenta local con el mismo nombre: no se asocia ni cambia su rol
+        with engine.begin() as conn:
+            conn.execute(insert(User).values(email="luis@biblioteca.com", username="luis", full_name="Luis",
+                                             hashed_password="-", role="estudiante"))
+        checks["cuenta_local_no_asociada"] = status_code(stub.token(new_kid, "luis", roles=["admin"])) == 401
+        with engine.connect() as conn:
+            local = conn.execute(select(User.role, User.keycloak_id).where(User.username == "luis")).one()
+        checks["cuenta_local_intacta"] = tuple(local) == ("estudiante", None)
+
+        # Dos primeros accesos simultáneos con el mismo token nuevo
+        async def first_access_race(token):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+                responses = await asyncio.gather(*[
+                    http.get("/books/admin/sweeper", headers={"Authorization": f"Bearer {token}"})
+                    for _ in range(4)
+                ])
+            return [response.status_code for response in responses]
+
+        codes = asyncio.run(first_access_race(stub.token(new_kid, "bea", roles=["bibliotecario"])))
+        with engine.connect() as conn:
+            created = conn.execute(select(User.id).where(User.username == "bea")).all()
+        checks["primer_acceso_simultaneo"] = codes == [200] * 4 and len(created) == 1
+        results["verificador_app"] = oidc.verifier.stats()
+    stub.shutdown()
+
+    print(f"Validaciones/s: {results['validaciones_por_s_firma']:,} con firma RSA, "
+          f"{results['validaciones_por_s_cache']:,} ya validados; "
+          f"{results['llamadas_al_emisor']} llamada(s) al emisor para {args.tokens} tokens")
+    for name, ok in checks.items():
+        print(f"  {name:30} {'OK' if ok else 'FALLO'}")
+    print(json.dumps(results, indent=2, default=str))
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
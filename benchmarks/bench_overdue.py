@@ -0,0 +1,124 @@
+# benchmarks/bench_overdue.py
+"""
+Marcar reservas vencidas: el barrido con un UPDATE set-based (app/sweeper.py)
+frente a cambiar el estado reserva a reserva como hacía el bibliotecario
+(PUT /books/admin/reservations/{id}/status: lectura, UPDATE y commit por reserva).
+
+Se comprueba que tras el barrido available_copies = total_copies - reservas
+activas para todos los libros, y que el UPDATE usa el índice (status, due_date).
+
+Uso:
+    python -m benchmarks.bench_overdue --history 500000 --active 50000 --overdue 10000
+"""
+import argparse
+import random
+import shutil
+import sys
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+from app.models.models import Reservation
+from app.routers.books import _update_reservation_status
+from app.sweeper import OverdueSweeper
+from benchmarks.common import temp_engine, seed_books, seed_users, seed_reservations
+
+USERS = 20000
+BOOKS = 5000
+COPIES = 1000
+
+
+def seed(engine, args):
+    seed_books(engine, BOOKS)
+    seed_users(engine, USERS)
+    for start in range(0, args.history, 100000):
+        seed_reservations(engine, min(100000, args.history - start), USERS, BOOKS, seed=start)
+
+    # Reservas activas: las primeras `overdue` con due_date pasada.
+    # (usuario, libro) únicos por el índice de reservas activas
+    rng = random.Random(1)
+    now = datetime.utcnow()
+    pairs = set()
+    while len(pairs) < args.active:
+        pairs.add((rng.randint(1, USERS), rng.randint(1, BOOKS)))
+    rows = [
+        {"user_id": user_id, "book_id": book_id, "status": "activa",
+         "reservation_date": now - timedelta(days=20),
+         "due_date": now - timedelta(days=6) if i < args.overdue else now + timedelta(days=8)}
+        for i, (user_id, book_id) in enumerate(sorted(pairs, key=lambda _: rng.random()))
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(Reservation), rows)
+        conn.execute(text(
+            "UPDATE books SET total_copies = :copies, available_copies = :copies - "
+            "(SELECT count(*) FROM reservations r WHERE r.book_id = books.id AND r.status = 'activa')"
+        ), {"copies": COPIES})
+
+
+def inconsistent_books(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT count(*) FROM books WHERE available_copies != total_copies - "
+            "(SELECT count(*) FROM reservations r WHERE r.book_id = books.id AND r.status = 'activa')"
+        )).scalar()
+
+
+def overdue_count(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT count(*) FROM reservations WHERE status = 'vencido'")).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--history", type=int, default=500000)
+    parser.add_argument("--active", type=int, default=50000)
+    parser.add_argument("--overdue", type=int, default=10000)
+    args = parser.parse_args()
+
+    engine, _ = temp_engine("overdue")
+    seed(engine, args)
+    engine.dispose()
+    source = engine.url.database
+    copy = f"{source}.uno-a-uno"
+    shutil.copyfile(source, copy)
+
+    sweep_engine = create_engine(f"sqlite:///{source}")
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=sweep_engine)
+    with sweep_engine.connect() as conn:
+        plan = conn.execute(text(
+            "EXPLAIN QUERY PLAN UPDATE reservations SET status = 'vencido' "
+            "WHERE status = 'activa' AND due_date < :now"
+        ), {"now": datetime.utcnow()}).all()
+    print("Plan:", " | ".join(row[-1] for row in plan))
+
+    sweeper = OverdueSweeper(0, Session)
+    rows = sweeper.sweep()
+    stats = sweeper.stats()
+    print(f"Barrido set-based:   {rows} reservas en {stats['last_duration_ms']:.0f} ms")
+    second = sweeper.sweep()
+
+    one_engine = create_engine(f"sqlite:///{copy}")
+    OneSession = sessionmaker(autocommit=False, autoflush=False, bind=one_engine)
+    now = datetime.utcnow()
+    with OneSession() as db:
+        ids = [r.id for r in db.query(Reservation.id).filter(
+            Reservation.status == "activa", Reservation.due_date < now)]
+    start = time.perf_counter()
+    for reservation_id in ids:
+        with OneSession() as db:
+            _update_reservation_status(db, reservation_id, "vencido")
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"Reserva a reserva:   {len(ids)} reservas en {elapsed:.0f} ms")
+
+    bad_sweep, bad_one = inconsistent_books(sweep_engine), inconsistent_books(one_engine)
+    print(f"Libros con inventario incoherente: barrido {bad_sweep}, uno a uno {bad_one}")
+    ok = (
+        rows == args.overdue and second == 0 and bad_sweep == 0
+        and overdue_count(sweep_engine) == overdue_count(one_engine) == args.overdue
+        and "ix_reservations_status_due" in " ".join(row[-1] for row in plan)
+    )
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
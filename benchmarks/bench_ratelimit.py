@@ -0,0 +1,216 @@
+# benchmarks/bench_ratelimit.py
+"""
+Límites por cliente y rechazo de carga (app/ratelimit.py).
+
+- coste de una comprobación (token bucket) con pocas y con muchas claves:
+  debe ser O(1), igual con 1.000 que con 100.000 IPs;
+- un script abusivo lanza búsquedas sin pausa desde una IP mientras
+  clientes normales (otras IPs) buscan y leen el catálogo: el script
+  recibe 429 y los demás siguen con 200 y latencia parecida a la de reposo;
+- una avalancha de logins desde una IP se corta con 429 antes de bcrypt;
+- una misma cuenta buscando desde muchas IPs (cada una por debajo de su
+  límite) se corta con el límite por usuario;
+- límite global: con MAX_CONCURRENT_REQUESTS pequeño, el exceso recibe 503
+  con Retry-After de inmediato y /health sigue respondiendo.
+
+Uso:
+    python -m benchmarks.bench_ratelimit --books 20000 --seconds 3
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import httpx
+from sqlalchemy import insert
+from app.hashing import hash_password_sync
+from app.models.models import User
+from app.ratelimit import RateLimiter, rate_limits, concurrency_limit
+from app.routers.auth import create_access_token
+from benchmarks.common import temp_engine, seed_books, summarize, override_database
+from init_data import TITLE_WORDS
+
+NORMAL_CLIENTS = 10
+
+
+def acquire_ns(keys: int, calls: int = 200000) -> float:
+    limiter = RateLimiter("bench", 1000, 1, maxsize=keys)
+    for i in range(keys):
+        limiter.acquire(f"10.{i >> 16}.{(i >> 8) & 255}.{i & 255}")
+    names = [f"10.{i >> 16}.{(i >> 8) & 255}.{i & 255}" for i in range(0, keys, max(1, keys // 1000))]
+    start = time.perf_counter()
+    for i in range(calls):
+        limiter.acquire(names[i % len(names)])
+    return round((time.perf_counter() - start) / calls * 1e9)
+
+
+def client(app, ip: str) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=(ip, 40000)),
+                             base_url="http://bench", timeout=60)
+
+
+async def normal_traffic(app, stop: asyncio.Event) -> list:
+    latencies = []
+    codes = {}
+
+    async def user(i):
+        async with client(app, f"192.168.1.{i}") as http:
+            n = 0
+            while not stop.is_set():
+                params = {"limit": 20, "search": TITLE_WORDS[(i + n) % len(TITLE_WORDS)]} if n % 2 else {"limit": 20}
+                start = time.perf_counter()
+                response = await http.get("/books/", params=params)
+                latencies.append((time.perf_counter() - start) * 1000)
+                codes[response.status_code] = codes.get(response.status_code, 0) + 1
+                n += 1
+                # Un usuario real no busca más de una vez por segundo
+                await asyncio.sleep(1.0)
+
+    await asyncio.gather(*[user(i) for i in range(NORMAL_CLIENTS)])
+    return latencies, codes
+
+
+async def abusive_script(app, stop: asyncio.Event, concurrency: int = 20) -> dict:
+    codes = {}
+
+    async def worker(i):
+        async with client(app, "203.0.113.66") as http:
+            n = 0
+            while not stop.is_set():
+                response = await http.get("/books/", params={"limit": 20, "search": f"{TITLE_WORDS[n % 30]} {i}"})
+                codes[response.status_code] = codes.get(response.status_code, 0) + 1
+                n += 1
+
+    await asyncio.gather(*[worker(i) for i in range(concurrency)])
+    return codes
+
+
+async def run(app, seconds: float) -> dict:
+    result = {}
+
+    # Reposo: solo clientes normales (tras una vuelta de calentamiento, así
+    # ambas fases encuentran las mismas consultas en la caché del catálogo)
+    for _ in range(2):
+        stop = asyncio.Event()
+        normal = asyncio.create_task(normal_traffic(app, stop))
+        await asyncio.sleep(seconds)
+        stop.set()
+        idle_latencies, idle_codes = await normal
+    result["normales_en_reposo"] = dict(summarize(idle_latencies), codes=idle_codes)
+
+    # Con el script abusivo
+    stop = asyncio.Event()
+    normal = asyncio.create_task(normal_traffic(app, stop))
+    abusive = asyncio.create_task(abusive_script(app, stop))
+    await asyncio.sleep(seconds)
+    stop.set()
+    latencies, codes = await normal
+    result["normales_con_abuso"] = dict(summarize(latencies), codes=codes)
+    result["script_abusivo"] = await abusive
+
+    # Avalancha de logins desde una IP
+    from app.hashing import hasher
+    before = hasher.stats()["completed"]
+    async with client(app, "198.51.100.7") as http:
+        responses = await asyncio.gather(*[
+            http.post("/auth/login", data={"username": f"u{i % 5}", "password": "est123"}) for i in range(200)
+        ])
+    logins = {}
+    for response in responses:
+        logins[response.status_code] = logins.get(response.status_code, 0) + 1
+    result["avalancha_logins"] = {"codes": logins, "bcrypt": hasher.stats()["completed"] - before}
+
+    # Una cuenta desde muchas IPs, pocas búsquedas por IP
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'u1'})}"}
+    per_user = {}
+    for i in range(40):
+        async with client(app, f"10.9.{i}.1") as http:
+            for n in range(8):
+                response = await http.get("/books/", params={"limit": 20, "search": f"{TITLE_WORDS[n]} {i}"},
+                                          headers=headers)
+                per_user[response.status_code] = per_user.get(response.status_code, 0) + 1
+    result["una_cuenta_muchas_ips"] = per_user
+
+    # Límite global de concurrencia (sin límites por cliente)
+    rate_limits.enabled = False
+    limit, concurrency_limit.limit = concurrency_limit.limit, 4
+    async with client(app, "192.168.2.1") as http:
+        async def search(i):
+            start = time.perf_counter()
+            response = await http.get("/books/", params={"limit": 100, "search": f"{TITLE_WORDS[i % 30]} x{i}"})
+            return response.status_code, response.headers.get("retry-after"), (time.perf_counter() - start) * 1000
+
+        searches = asyncio.gather(*[search(i) for i in range(60)])
+        health = (await http.get("/health")).status_code
+        outcomes = await searches
+    concurrency_limit.limit = limit
+    rate_limits.enabled = True
+    shed = [ms for code, retry, ms in outcomes if code == 503 and retry]
+    result["limite_global"] = {
+        "ok": sum(1 for code, _, _ in outcomes if code == 200),
+        "rechazadas_503": len(shed),
+        "p50_ms_rechazo": summarize(shed)["p50_ms"] if shed else None,
+        "health": health,
+    }
+
+    # Totales exportados como counter (rate()/increase() en Prometheus)
+    async with client(app, "192.168.2.2") as http:
+        exported = (await http.get("/metrics")).text
+    result["tipos_metricas"] = {
+        line.split()[2]: line.split()[3] for line in exported.splitlines()
+        if line.startswith("# TYPE") and (line.split()[2].startswith("rate_limited_")
+                                          or line.split()[2] == "requests_shed_total")
+    }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    cost = {"ns_1k_claves": acquire_ns(1000), "ns_100k_claves": acquire_ns(100000)}
+
+    engine, Session = temp_engine("ratelimit")
+    seed_books(engine, args.books)
+    hashed = hash_password_sync("est123")
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"email": f"u{i}@bench.local", "username": f"u{i}", "full_name": f"U {i}",
+             "hashed_password": hashed, "role": "estudiante"}
+            for i in range(5)
+        ])
+
+    from app.main import app
+    override_database(app, Session)
+    result = dict(asyncio.run(run(app, args.seconds)), coste=cost, limites=rate_limits.stats())
+
+    idle, busy = result["normales_en_reposo"], result["normales_con_abuso"]
+    abusive, logins, overload = result["script_abusivo"], result["avalancha_logins"], result["limite_global"]
+    checks = {
+        "coste_o1": cost["ns_100k_claves"] < 3 * cost["ns_1k_claves"],
+        "normales_sin_429": set(busy["codes"]) == {200},
+        "abuso_cortado": abusive.get(429, 0) > 10 * abusive.get(200, 0),
+        "logins_cortados_antes_de_bcrypt": logins["codes"].get(429, 0) > 0 and logins["bcrypt"] <= 20,
+        "exceso_503": overload["rechazadas_503"] > 0 and overload["ok"] > 0,
+        "health_con_sobrecarga": overload["health"] == 200,
+        "limite_por_usuario": result["una_cuenta_muchas_ips"].get(429, 0) > 0,
+        "totales_como_counter": bool(result["tipos_metricas"])
+        and set(result["tipos_metricas"].values()) == {"counter"},
+    }
+    print(f"Comprobación: {cost['ns_1k_claves']} ns con 1k claves, {cost['ns_100k_claves']} ns con 100k")
+    print(f"Clientes normales: p50 {idle['p50_ms']:.1f} -> {busy['p50_ms']:.1f} ms, "
+          f"p95 {idle['p95_ms']:.1f} -> {busy['p95_ms']:.1f} ms con el script abusivo ({busy['codes']})")
+    print(f"Script abusivo: {abusive} | logins desde una IP: {logins['codes']}, {logins['bcrypt']} bcrypt")
+    print(f"Una cuenta desde 40 IPs: {result['una_cuenta_muchas_ips']}")
+    print(f"Límite global: {overload['ok']} atendidas, {overload['rechazadas_503']} con 503 "
+          f"(p50 {overload['p50_ms_rechazo']} ms), /health {overload['health']}")
+    for name, ok in checks.items():
+        print(f"  {name:32} {'OK' if ok else 'FALLO'}")
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# benchmarks/bench_reservation_queries.py
+"""
+Verificar que los listados de reservas ejecutan un número constante de
+sentencias SQL por petición, sin importar cuántas reservas devuelven
+(sin cargas perezosas N+1 del libro de cada reserva).
+
+Uso:
+    python -m benchmarks.bench_reservation_queries
+"""
+import sys
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from app.main import app
+from app.models.models import User, Reservation
+from app.routers.auth import create_access_token
+from benchmarks.common import temp_engine, seed_books, override_database, count_statements
+
+SIZES = [1, 10, 50, 100]
+
+
+def main():
+    engine, Session = temp_engine("queries")
+    seed_books(engine, 200)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"email": "bib@bench.local", "username": "bib", "full_name": "Bench",
+             "hashed_password": "-", "role": "bibliotecario"},
+        ])
+        now = datetime.utcnow()
+        conn.execute(insert(Reservation), [
+            {"user_id": 1, "book_id": 1 + i % 200, "status": "devuelto",
+             "reservation_date": now - timedelta(minutes=i), "due_date": now}
+            for i in range(500)
+        ])
+
+    override_database(app, Session)
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bib'})}"}
+
+    # Primera petición: resuelve el usuario y lo deja en la caché de tokens
+    client.get("/books/my/reservations", headers=headers)
+
+    failed = False
+    for path in ["/books/my/reservations", "/books/admin/reservations"]:
+        counts = {}
+        for size in SIZES:
+            with count_statements(engine) as counter:
+                response = client.get(path, params={"limit": size}, headers=headers)
+            assert response.status_code == 200, response.text
+            assert len(response.json()["items"]) == size
+            counts[size] = counter["statements"]
+        constant = len(set(counts.values())) == 1
+        failed = failed or not constant
+        print(f"{path:28} sentencias por petición {counts} -> {'OK' if constant else 'N+1'}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/bench_search.py
+"""
+Comparar la búsqueda antigua (LIKE '%texto%') con el índice FTS5.
+
+Uso:
+    python -m benchmarks.bench_search --books 300000 --repeat 50
+"""
+import argparse
+import json
+import time
+from app.models.models import Book
+from app.search import apply_search
+from benchmarks.common import temp_engine, seed_books, measure, summarize
+
+QUERIES = ["garcia marquez", "soledad", "cortazar rayuela", "programacion", "muerte anunciada"]
+
+
+def like_search(db, search, limit):
+    return db.query(Book).filter(
+        (Book.title.contains(search)) |
+        (Book.author.contains(search))
+    ).limit(limit).all()
+
+
+def fts_search(db, search, limit):
+    query, keys = apply_search(db.query(Book), search)
+    return query.order_by(*keys).limit(limit).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=300000)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    engine, Session = temp_engine("search")
+    start = time.perf_counter()
+    seed_books(engine, args.books)
+    print(f"Catálogo sintético: {args.books} libros en {time.perf_counter() - start:.1f}s")
+
+    results = {}
+    db = Session()
+    try:
+        for search in QUERIES:
+            like = summarize(measure(lambda: like_search(db, search, args.limit), args.repeat))
+            fts = summarize(measure(lambda: fts_search(db, search, args.limit), args.repeat))
+            results[search] = {
+                "like": like,
+                "fts5": fts,
+                "like_matches": len(like_search(db, search, args.limit)),
+                "fts5_matches": len(fts_search(db, search, args.limit)),
+            }
+            print(
+                f"{search!r:22} LIKE p50={like['p50_ms']:8.2f}ms p95={like['p95_ms']:8.2f}ms | "
+                f"FTS5 p50={fts['p50_ms']:8.2f}ms p95={fts['p95_ms']:8.2f}ms"
+            )
+    finally:
+        db.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# benchmarks/bench_serialization.py
+"""
+Serialización de los listados (GET /books/, /books/my/reservations,
+/books/admin/reservations): la ruta anterior (objetos ORM -> esquema
+Pydantic con from_attributes -> validación del response_model de FastAPI
+-> jsonable_encoder -> json) frente a la ruta rápida de
+app/serialization.py (filas -> dicts -> orjson).
+
+Mide filas serializadas por segundo (solo la serialización, con los datos
+ya leídos) y la función completa por página (consulta + serialización),
+y comprueba que ambas rutas producen exactamente el mismo JSON.
+
+Uso:
+    python -m benchmarks.bench_serialization --page-size 100 --repeat 200
+"""
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime, timedelta
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload
+from app.models.models import Book, Reservation, BookPage, ReservationPage
+from app.pagination import paginate
+from app.routers.books import _list_books, _list_reservations
+from app.serialization import book_rows, reservation_rows, book_dict, reservation_dict, dump_page
+from benchmarks.common import temp_engine, seed_books, seed_users, measure, summarize
+
+BOOK_PAGE_FIELD = create_response_field(name="BookPage", type_=BookPage)
+RESERVATION_PAGE_FIELD = create_response_field(name="ReservationPage", type_=ReservationPage)
+
+
+def fastapi_body(field, page) -> bytes:
+    """
+    Lo que hacía FastAPI con el valor devuelto por el endpoint
+    """
+    content = asyncio.run(serialize_response(field=field, response_content=page))
+    return JSONResponse(content).body
+
+
+# Ruta anterior, tal como estaba en app/routers/books.py
+def old_list_books(db, limit: int) -> bytes:
+    books, next_cursor = paginate(db.query(Book), [Book.title, Book.id], None, limit)
+    return fastapi_body(BOOK_PAGE_FIELD, BookPage(items=books, next_cursor=next_cursor))
+
+
+def old_list_reservations(db, user_id: int, limit: int) -> bytes:
+    query = db.query(Reservation).options(joinedload(Reservation.book)).filter(Reservation.user_id == user_id)
+    reservations, next_cursor = paginate(
+        query, [Reservation.reservation_date, Reservation.id], None, limit, descending=True
+    )
+    return fastapi_body(RESERVATION_PAGE_FIELD, ReservationPage(items=reservations, next_cursor=next_cursor))
+
+
+def rows_per_second(samples_ms: list, rows: int) -> float:
+    return round(rows / (summarize(samples_ms)["p50_ms"] / 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    n = args.page_size
+
+    engine, Session = temp_engine("serialization")
+    seed_books(engine, 5000)
+    seed_users(engine, 1)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(Reservation), [
+            {"user_id": 1, "book_id": 1 + i * 7 % 5000, "status": "devuelto" if i % 3 else "activa",
+             "reservation_date": now - timedelta(minutes=i, microseconds=i * 137),
+             "due_date": now + timedelta(days=14) if i % 5 else None}
+            for i in range(1000)
+        ])
+
+    results = {}
+    with Session() as db:
+        # Solo serialización: datos ya leídos
+        books, cursor = paginate(db.query(Book), [Book.title, Book.id], None, n)
+        book_tuples, _ = paginate(book_rows(db), [Book.title, Book.id], None, n)
+        reservations, _ = paginate(
+            db.query(Reservation).options(joinedload(Reservation.book)).filter(Reservation.user_id == 1),
+            [Reservation.reservation_date, Reservation.id], None, n, descending=True
+        )
+        reservation_tuples, _ = paginate(
+            reservation_rows(db).filter(Reservation.user_id == 1),
+            [Reservation.reservation_date, Reservation.id], None, n, descending=True
+        )
+        serializers = {
+            "libros_pydantic": lambda: fastapi_body(BOOK_PAGE_FIELD, BookPage(items=books, next_cursor=cursor)),
+            "libros_orjson": lambda: dump_page([book_dict(row) for row in book_tuples], cursor),
+            "reservas_pydantic": lambda: fastapi_body(RESERVATION_PAGE_FIELD, ReservationPage(items=reservations)),
+            "reservas_orjson": lambda: dump_page([reservation_dict(row) for row in reservation_tuples], None),
+        }
+        for name, fn in serializers.items():
+            fn()
+            results[name] = rows_per_second(measure(fn, args.repeat), n)
+
+        # Función completa por página (consulta + serialización)
+        pages = {
+            "pagina_libros_antes": lambda: old_list_books(db, n),
+            "pagina_libros_ahora": lambda: _list_books(db, None, n, None),
+            "pagina_reservas_antes": lambda: old_list_reservations(db, 1, n),
+            "pagina_reservas_ahora": lambda: _list_reservations(db, 1, None, n),
+        }
+        for name, fn in pages.items():
+            fn()
+            results[name] = summarize(measure(fn, args.repeat))
+
+        # Mismo JSON, byte a byte, en todas las páginas
+        identical = True
+        for old_fn, new_fn in [
+            (lambda: old_list_books(db, n), lambda: _list_books(db, None, n, None)),
+            (lambda: old_list_reservations(db, 1, n), lambda: _list_reservations(db, 1, None, n)),
+        ]:
+            identical = identical and old_fn() == new_fn()
+        # Página siguiente con el cursor de la ruta nueva: sin solapes
+        first = json.loads(_list_reservations(db, 1, None, n))
+        second = json.loads(_list_reservations(db, 1, first["next_cursor"], n))
+        ids = [item["id"] for item in first["items"] + second["items"]]
+        identical = identical and len(set(ids)) == 2 * n
+
+    for kind in ["libros", "reservas"]:
+        old, new = results[f"{kind}_pydantic"], results[f"{kind}_orjson"]
+        before, after = results[f"pagina_{kind}_antes"], results[f"pagina_{kind}_ahora"]
+        print(f"{kind:9} serialización {old:>9,} -> {new:>9,} filas/s (x{new / old:.1f}) | "
+              f"página de {n}: p50 {before['p50_ms']:.2f} -> {after['p50_ms']:.2f} ms")
+    print(f"JSON idéntico a la ruta Pydantic: {'OK' if identical else 'FALLO'}")
+    print(json.dumps(results, indent=2))
+    faster = all(results[f"{k}_orjson"] > 2 * results[f"{k}_pydantic"] for k in ["libros", "reservas"])
+    sys.exit(0 if identical and faster else 1)
+
+
+if __name__ == "__main__":
+    main()
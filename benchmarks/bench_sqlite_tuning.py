@@ -0,0 +1,134 @@
+# benchmarks/bench_sqlite_tuning.py
+"""
+Rendimiento mixto lectura/escritura de SQLite con el perfil por defecto
+(rollback journal, synchronous=FULL) frente al perfil "production"
+(WAL, synchronous=NORMAL, mmap, caché, busy_timeout, temp_store).
+
+Cada perfil se ejecuta en un proceso propio sobre una copia idéntica de
+la misma base de datos sembrada.
+
+Uso:
+    python -m benchmarks.bench_sqlite_tuning --readers 8 --writers 4 --seconds 10
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from benchmarks.common import temp_engine, seed_books, seed_users, summarize
+
+BOOKS = 20000
+USERS = 2000
+
+
+def run_worker(readers: int, writers: int, seconds: float):
+    from datetime import datetime, timedelta
+    from sqlalchemy.exc import IntegrityError, OperationalError
+    from app.database import SessionLocal
+    from app.inventory import take_copy, release_copy, close_active_reservation
+    from app.models.models import Book, Reservation
+    from app.pagination import paginate
+
+    deadline = time.perf_counter() + seconds
+    read_latencies, write_latencies = [], []
+    errors = {"locked": 0, "conflicts": 0}
+    lock = threading.Lock()
+
+    def reader(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            db = SessionLocal()
+            try:
+                db.query(Book).filter(Book.id == rng.randint(1, BOOKS)).first()
+                paginate(db.query(Book), [Book.title, Book.id], None, 20)
+            finally:
+                db.close()
+            with lock:
+                read_latencies.append((time.perf_counter() - start) * 1000)
+
+    def writer(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            user_id, book_id = rng.randint(1, USERS), rng.randint(1, BOOKS)
+            start = time.perf_counter()
+            db = SessionLocal()
+            try:
+                if take_copy(db, book_id):
+                    db.add(Reservation(user_id=user_id, book_id=book_id,
+                                       due_date=datetime.utcnow() + timedelta(days=14)))
+                    db.commit()
+                    if close_active_reservation(db, user_id, book_id):
+                        release_copy(db, book_id)
+                    db.commit()
+            except IntegrityError:
+                db.rollback()
+                errors["conflicts"] += 1
+            except OperationalError:
+                db.rollback()
+                errors["locked"] += 1
+            finally:
+                db.close()
+            with lock:
+                write_latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(1000 + i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(json.dumps({
+        "reads_per_second": round(len(read_latencies) / seconds, 1),
+        "writes_per_second": round(len(write_latencies) / seconds, 1),
+        "reads": summarize(read_latencies),
+        "writes": summarize(write_latencies),
+        "errors": errors,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.readers, args.writers, args.seconds)
+        return
+
+    engine, _ = temp_engine("tuning")
+    seed_books(engine, BOOKS)
+    seed_users(engine, USERS)
+    engine.dispose()
+    source = engine.url.database
+
+    results = {}
+    for profile in ["default", "production"]:
+        copy = f"{source}.{profile}"
+        shutil.copyfile(source, copy)
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{copy}", SQLITE_PROFILE=profile)
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_sqlite_tuning", "--worker",
+             "--readers", str(args.readers), "--writers", str(args.writers),
+             "--seconds", str(args.seconds)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        results[profile] = r = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{profile:11} lecturas {r['reads_per_second']:8.1f}/s (p99 {r['reads']['p99_ms']:.1f}ms)  "
+            f"escrituras {r['writes_per_second']:7.1f}/s (p99 {r['writes']['p99_ms']:.1f}ms)  "
+            f"errores {r['errors']}"
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
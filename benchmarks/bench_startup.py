@@ -0,0 +1,120 @@
+# benchmarks/bench_startup.py
+"""
+Coste de arranque de un worker:
+
+- importación: `import app.main` en un proceso nuevo (y, como referencia,
+  `import fastapi`, que la aplicación no puede evitar);
+- tiempo hasta la primera petición: desde lanzar uvicorn hasta la primera
+  respuesta de GET /health y de GET /books/ (primera consulta a la BD),
+  con el esquema creado en el lifespan;
+- importar app.main no debe tocar la base de datos.
+
+La suite (benchmarks/suite.py) guarda estas medidas junto a sus resultados.
+
+Uso:
+    python -m benchmarks.bench_startup --repeat 5
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def import_seconds(module: str, env: dict) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def first_request_seconds(env: dict, timeout: float = 60.0) -> dict:
+    """
+    Lanzar uvicorn y medir hasta la primera respuesta de /health y de /books/
+    """
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            while True:
+                try:
+                    if client.get("/health").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.perf_counter() - start > timeout:
+                    raise RuntimeError("uvicorn no respondió")
+                time.sleep(0.01)
+            health = time.perf_counter() - start
+            assert client.get("/books/", params={"limit": 1}).status_code == 200
+            books = time.perf_counter() - start
+        return {"health": health, "books": books}
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def measure_startup(repeat: int = 3) -> dict:
+    """
+    Medianas (segundos) de importación y de tiempo hasta la primera petición
+    """
+    directory = tempfile.mkdtemp(prefix="biblioteca-startup-")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(directory, 'startup.db')}",
+               OVERDUE_SWEEP_INTERVAL_SECONDS="0")
+    # Base de datos nueva: el primer arranque crea el esquema
+    first_request_seconds(env)
+
+    samples = {"import_fastapi": [], "import_app": [], "first_health": [], "first_books": []}
+    for _ in range(repeat):
+        samples["import_fastapi"].append(import_seconds("fastapi", env))
+        samples["import_app"].append(import_seconds("app.main", env))
+        first = first_request_seconds(env)
+        samples["first_health"].append(first["health"])
+        samples["first_books"].append(first["books"])
+    return {name: round(statistics.median(values), 3) for name, values in samples.items()}
+
+
+def import_touches_database() -> bool:
+    directory = tempfile.mkdtemp(prefix="biblioteca-startup-")
+    path = os.path.join(directory, "untouched.db")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}")
+    import_seconds("app.main", env)
+    return os.path.exists(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    touches = import_touches_database()
+    result = measure_startup(args.repeat)
+    print(f"import fastapi {result['import_fastapi']:.3f}s | import app.main {result['import_app']:.3f}s "
+          f"(aplicación: {result['import_app'] - result['import_fastapi']:.3f}s)")
+    print(f"Primera respuesta: /health {result['first_health']:.3f}s, /books/ {result['first_books']:.3f}s")
+    print(f"Importar app.main sin tocar la base de datos: {'FALLO' if touches else 'OK'}")
+    print(json.dumps(result, indent=2))
+    sys.exit(1 if touches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# benchmarks/bench_stats.py
+"""
+Estadísticas del catálogo (app/stats.py): top-N y recuento por estado
+leídos de las tablas agregadas frente al GROUP BY sobre reservations.
+
+Tras una carga mixta por la API (reservas y devoluciones individuales y
+por lotes, cambios de estado del bibliotecario y barrido de vencidas) se
+comprueba que los agregados coinciden con su valor recalculado, y que el
+listado de agotados usa el índice parcial ix_books_unavailable.
+
+Uso:
+    python -m benchmarks.bench_stats --books 50000 --history 500000 --operations 2000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, text, update
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models.models import Reservation
+from app.routers.auth import create_access_token
+from app.inventory import mark_overdue
+from app.stats import rebuild_stats, check_stats, top_books, reservation_summary
+from benchmarks.common import temp_engine, seed_books, seed_users, seed_reservations, override_database, measure, summarize
+
+USERS = 2000
+
+
+def workload(client, engine, Session, books: int, operations: int):
+    rng = random.Random(7)
+    tokens = [{"Authorization": f"Bearer {create_access_token({'sub': f'u{i}'})}"} for i in range(USERS)]
+    librarian = {"Authorization": f"Bearer {create_access_token({'sub': 'b0'})}"}
+    held = []
+    counts = {}
+    hot = list(range(1, 51))  # pocos libros muy demandados: se agotan
+    for _ in range(operations):
+        roll = rng.random()
+        user = rng.randrange(USERS)
+        if roll < 0.45:
+            book_id = rng.choice(hot) if rng.random() < 0.5 else rng.randint(1, books)
+            response = client.post(f"/books/{book_id}/reserve", headers=tokens[user])
+            if response.status_code == 200:
+                held.append((user, book_id, response.json()["reservation_id"]))
+            operation = "reserve"
+        elif roll < 0.55:
+            book_ids = [rng.choice(hot) for _ in range(3)] + [rng.randint(1, books) for _ in range(2)]
+            response = client.post("/books/reserve/batch", headers=tokens[user],
+                                   json={"book_ids": book_ids, "mode": "partial"})
+            for item in response.json().get("items", []):
+                if item["ok"]:
+                    held.append((user, item["book_id"], item["reservation_id"]))
+            operation = "reserve_batch"
+        elif roll < 0.75 and held:
+            user, book_id, _ = held.pop(rng.randrange(len(held)))
+            response = client.put(f"/books/{book_id}/return", headers=tokens[user])
+            operation = "return"
+        elif roll < 0.85 and held:
+            user = held[rng.randrange(len(held))][0]
+            mine = [h for h in held if h[0] == user][:3]
+            for h in mine:
+                held.remove(h)
+            response = client.put("/books/return/batch", headers=tokens[user],
+                                  json={"book_ids": [h[1] for h in mine], "mode": "partial"})
+            operation = "return_batch"
+        elif held:
+            # Cambio manual: vencida, devuelta o de vuelta a activa
+            _, _, reservation_id = held.pop(rng.randrange(len(held)))
+            new_status = rng.choice(["vencido", "devuelto"])
+            response = client.put(f"/books/admin/reservations/{reservation_id}/status",
+                                  data={"new_status": new_status}, headers=librarian)
+            if new_status == "vencido" and rng.random() < 0.3:
+                client.put(f"/books/admin/reservations/{reservation_id}/status",
+                           data={"new_status": "activa"}, headers=librarian)
+            operation = "status"
+        else:
+            continue
+        counts[operation] = counts.get(operation, 0) + 1
+        assert response.status_code < 500, response.text
+
+    # Barrido de vencidas sobre parte de las reservas activas
+    with engine.begin() as conn:
+        conn.execute(
+            update(Reservation)
+            .where(Reservation.status == "activa", Reservation.id % 3 == 0)
+            .values(due_date=datetime.utcnow() - timedelta(days=1))
+        )
+    with Session() as db:
+        counts["overdue_swept"] = mark_overdue(db)
+        db.commit()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=50000)
+    parser.add_argument("--history", type=int, default=500000)
+    parser.add_argument("--operations", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine, Session = temp_engine("stats")
+    seed_books(engine, args.books)
+    seed_users(engine, USERS)
+    seed_users(engine, 1, role="bibliotecario", prefix="b")
+    for start in range(0, args.history, 100000):
+        seed_reservations(engine, min(100000, args.history - start), USERS, args.books, seed=start)
+
+    with Session() as db:
+        start = time.perf_counter()
+        rebuild_stats(db)
+        db.commit()
+        rebuild_seconds = time.perf_counter() - start
+    print(f"Reconstrucción de {args.history:,} reservas: {rebuild_seconds:.2f}s")
+
+    override_database(app, Session)
+    client = TestClient(app)
+    counts = workload(client, engine, Session, args.books, args.operations)
+    print(f"Carga mixta: {counts}")
+
+    with Session() as db:
+        differences = check_stats(db)
+    consistent = not differences["books"] and not differences["statuses"]
+    print(f"Agregados coherentes tras la carga: {'OK' if consistent else differences}")
+
+    # Lecturas: agregados frente a GROUP BY
+    group_top = (
+        select(Reservation.book_id, func.count().label("n"))
+        .group_by(Reservation.book_id).order_by(text("n DESC")).limit(10)
+    )
+    group_status = select(Reservation.status, func.count()).group_by(Reservation.status)
+    with Session() as db:
+        aggregated = [(r.book_id, r.total_reservations) for r in top_books(db, 10)]
+        grouped = db.execute(group_top).all()
+        same_top = sorted(n for _, n in aggregated) == sorted(n for _, n in grouped)
+        results = {
+            "top10_agregado": summarize(measure(lambda: top_books(db, 10), args.repeat)),
+            "top10_group_by": summarize(measure(lambda: db.execute(group_top).all(), args.repeat)),
+            "resumen_agregado": summarize(measure(lambda: reservation_summary(db), args.repeat)),
+            "resumen_group_by": summarize(measure(lambda: db.execute(group_status).all(), args.repeat)),
+        }
+        plan = " ".join(str(row[-1]) for row in db.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM books WHERE available_copies <= 0 ORDER BY title, id LIMIT 50"
+        )))
+    for name, r in results.items():
+        print(f"{name:18} p50 {r['p50_ms']:9.3f} ms")
+
+    librarian = {"Authorization": f"Bearer {create_access_token({'sub': 'b0'})}"}
+    top = client.get("/books/admin/stats/top", params={"limit": 5}, headers=librarian)
+    summary = client.get("/books/admin/stats/summary", headers=librarian)
+    unavailable = client.get("/books/admin/stats/unavailable", params={"limit": 10}, headers=librarian)
+    endpoints_ok = (
+        top.status_code == summary.status_code == unavailable.status_code == 200
+        and len(top.json()) == 5
+        and all(book["available_copies"] <= 0 for book in unavailable.json()["items"])
+    )
+    print(f"Top-N igual al GROUP BY: {'OK' if same_top else 'FALLO'} | endpoints: {'OK' if endpoints_ok else 'FALLO'}")
+    print(f"Plan de agotados: {plan}")
+    print(json.dumps({"summary": summary.json(), **results}, indent=2))
+
+    ok = consistent and same_top and endpoints_ok and "ix_books_unavailable" in plan
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
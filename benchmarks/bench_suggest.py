@@ -0,0 +1,190 @@
+# benchmarks/bench_suggest.py
+"""
+Autocompletado en memoria (GET /books/suggest, app/suggest.py) sobre un
+catálogo sintético grande con popularidad tipo Zipf.
+
+- construcción: tiempo y memoria (la que declara el índice y la medida
+  con tracemalloc), con el tope SUGGEST_MAX_ENTRIES;
+- pulsaciones: se teclean títulos y autores carácter a carácter y se mide
+  cada consulta (p50/p95/p99), frente a la búsqueda por subcadena que
+  haría GET /books/?search= por cada carácter;
+- exactitud: para prefijos al azar, las sugerencias coinciden con las más
+  populares calculadas por fuerza bruta sobre las mismas entradas;
+- escrituras: alta, edición y baja por la API se reflejan al momento.
+
+Uso:
+    python -m benchmarks.bench_suggest --books 1000000 --words 300
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import tracemalloc
+import httpx
+from sqlalchemy import insert
+from app.models.models import Book, BookStats
+from app.routers.auth import create_access_token
+from app.search import search_index_suspended
+from app.suggest import suggest_index, normalize, normalize_query, _WORD_START
+from benchmarks.common import temp_engine, seed_books, seed_users, measure, summarize
+
+
+def seed_popularity(engine, books: int, seed: int = 42):
+    """
+    Reservas históricas con distribución de Zipf: pocos libros muy populares
+    """
+    rng = random.Random(seed)
+    ids = rng.sample(range(1, books + 1), min(books, 200000))
+    with engine.begin() as conn:
+        conn.execute(insert(BookStats), [
+            {"book_id": book_id, "total_reservations": int(10000 / rank ** 0.9), "active_reservations": 0}
+            for rank, book_id in enumerate(ids, start=1)
+        ])
+
+
+def keystrokes(snapshot, count: int, rng: random.Random) -> list:
+    """
+    Prefijos de lo que teclea un usuario: títulos y autores del índice,
+    carácter a carácter (hasta 20 caracteres)
+    """
+    prefixes = []
+    for _ in range(count):
+        text = snapshot.entry(rng.randrange(snapshot.next_entry))[0]
+        prefixes.extend(text[:n] for n in range(1, min(len(text), 20) + 1))
+    return prefixes
+
+
+def brute_force(snapshot, prefix: str, limit: int) -> list:
+    """
+    Pesos de las `limit` entradas más populares con una palabra que
+    empieza por `prefix`, recorriendo todas
+    """
+    best = {}
+    for e in range(snapshot.next_entry):
+        text, book_id, weight = snapshot.entry(e)
+        folded = normalize(text)
+        if weight >= 0 and any(folded.startswith(prefix, m.start()) for m in _WORD_START.finditer(folded)):
+            key = (book_id is None, folded)
+            best[key] = max(best.get(key, -1), weight)
+    return sorted(best.values(), reverse=True)[:limit]
+
+
+async def api_checks(app, admin_token: str) -> dict:
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    checks = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+        async def suggested(q):
+            response = await http.get("/books/suggest", params={"q": q, "limit": 10})
+            return [item["text"] for item in response.json()]
+
+        book = {"title": "Quimeras de Xóchitl", "author": "Xiadani Ñúñez", "isbn": "bench-suggest-1",
+                "description": "", "total_copies": 1}
+        created = (await http.post("/books/admin/create", json=book, headers=headers)).json()
+        checks["alta: titulo"] = "Quimeras de Xóchitl" in await suggested("quimeras d")
+        checks["alta: palabra interior"] = "Quimeras de Xóchitl" in await suggested("xochi")
+        checks["alta: autor"] = "Xiadani Ñúñez" in await suggested("nunez")
+        book["title"] = "Espejismos de Xóchitl"
+        await http.put(f"/books/admin/{created['id']}", json=book, headers=headers)
+        checks["edicion: titulo nuevo"] = "Espejismos de Xóchitl" in await suggested("espejismos")
+        checks["edicion: sin el anterior"] = "Quimeras de Xóchitl" not in await suggested("quimeras")
+        await http.delete(f"/books/admin/{created['id']}", headers=headers)
+        checks["baja"] = "Espejismos de Xóchitl" not in await suggested("espejismos")
+
+        latencies = []
+        for q in ["g", "ga", "gar", "garc", "garci", "garcia", "garcia m", "sol", "cien", "rayu"]:
+            start = time.perf_counter()
+            await http.get("/books/suggest", params={"q": q})
+            latencies.append((time.perf_counter() - start) * 1000)
+    return checks, summarize(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=1000000)
+    parser.add_argument("--words", type=int, default=300, help="Títulos/autores tecleados")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--p99-ms", type=float, default=1.0, help="Objetivo de latencia del índice (p99)")
+    args = parser.parse_args()
+
+    engine, Session = temp_engine("suggest")
+    start = time.perf_counter()
+    with search_index_suspended(engine):
+        seed_books(engine, args.books)
+    seed_popularity(engine, args.books)
+    seed_users(engine, 1, role="admin", prefix="admin")
+    print(f"Catálogo sintético: {args.books} libros en {time.perf_counter() - start:.1f}s")
+
+    suggest_index.session_factory = Session
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    suggest_index.rebuild()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Sin tracemalloc, la construcción a su velocidad normal
+    suggest_index.rebuild()
+    stats = suggest_index.stats()
+    snapshot = suggest_index._snapshot
+    results = {
+        "indice": stats,
+        "memoria_medida_mb": round((current - before) / 2**20, 1),
+        "pico_construccion_mb": round((peak - before) / 2**20, 1),
+    }
+    print(f"Índice: {stats['entries']:,} entradas, {stats['keys']:,} claves, "
+          f"{stats['memory_bytes'] / 2**20:.1f} MB declarados / {results['memoria_medida_mb']} MB medidos "
+          f"(pico {results['pico_construccion_mb']} MB), construido en {stats['last_build_ms'] / 1000:.1f}s")
+
+    rng = random.Random(7)
+    prefixes = keystrokes(snapshot, args.words, rng)
+    samples = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        suggest_index.suggest(prefix, args.limit)
+        samples.append((time.perf_counter() - start) * 1000)
+    results["pulsaciones"] = summarize(samples)
+    short = [ms for prefix, ms in zip(prefixes, samples) if len(prefix) <= 2]
+    results["pulsaciones_1_2_caracteres"] = summarize(short)
+
+    # Lo que costaba cada pulsación con GET /books/?search= (subcadena)
+    db = Session()
+    try:
+        like = [prefix for prefix in prefixes if 2 <= len(prefix) <= 6][:10]
+        results["busqueda_subcadena"] = summarize([
+            measure(lambda: db.query(Book.id).filter(
+                Book.title.contains(prefix) | Book.author.contains(prefix)
+            ).order_by(Book.title).limit(args.limit).all(), 1)[0]
+            for prefix in like
+        ])
+    finally:
+        db.close()
+
+    # Exactitud frente a fuerza bruta
+    checks = {}
+    sample = rng.sample(prefixes, 30)
+    mismatches = [
+        prefix for prefix in sample
+        if [item["popularity"] for item in suggest_index.suggest(prefix, args.limit)]
+        != brute_force(snapshot, normalize_query(prefix), args.limit)
+    ]
+    checks["coincide_con_fuerza_bruta"] = not mismatches
+    checks["memoria_acotada"] = stats["entries"] <= suggest_index.max_entries + suggest_index.overlay_max
+    checks[f"p99 < {args.p99_ms:g} ms"] = results["pulsaciones"]["p99_ms"] < args.p99_ms
+
+    from app.main import app
+    from benchmarks.common import override_database
+    override_database(app, Session)
+    api, results["http"] = asyncio.run(api_checks(app, create_access_token({"sub": "admin0"})))
+    checks.update(api)
+
+    print(f"Pulsaciones ({len(samples)}): p50 {results['pulsaciones']['p50_ms']:.3f} ms, "
+          f"p95 {results['pulsaciones']['p95_ms']:.3f} ms, p99 {results['pulsaciones']['p99_ms']:.3f} ms "
+          f"| con subcadena: p50 {results['busqueda_subcadena']['p50_ms']:.1f} ms")
+    for name, ok in checks.items():
+        print(f"  {name:32} {'OK' if ok else 'FALLO'}")
+    print(json.dumps(results, indent=2, default=str))
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
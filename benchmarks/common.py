@@ -0,0 +1,122 @@
+# benchmarks/common.py
+import os
+import random
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+from app.models.models import Base, Book, User, Reservation
+from app.search import create_search_index
+from init_data import synthetic_book
+
+
+def temp_engine(prefix="bench"):
+    """
+    Crear un motor SQLite sobre un fichero temporal con el esquema completo
+    """
+    directory = tempfile.mkdtemp(prefix=f"biblioteca-{prefix}-")
+    path = os.path.join(directory, "bench.db")
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    create_search_index(engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def seed_books(engine, count: int, seed: int = 42, batch_size: int = 5000):
+    """
+    Insertar `count` libros sintéticos en lotes (executemany)
+    """
+    rng = random.Random(seed)
+    with engine.begin() as conn:
+        for start in range(0, count, batch_size):
+            rows = [synthetic_book(rng, i) for i in range(start, min(start + batch_size, count))]
+            conn.execute(insert(Book), rows)
+
+
+def seed_users(engine, count: int, role: str = "estudiante", prefix: str = "u"):
+    """
+    Insertar usuarios sintéticos (sin hash real: se autentican con tokens)
+    """
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"email": f"{prefix}{i}@bench.local", "username": f"{prefix}{i}",
+             "full_name": f"Usuario {i}", "hashed_password": "-", "role": role}
+            for i in range(count)
+        ])
+
+
+def seed_reservations(engine, count: int, users: int, books: int, seed: int = 42):
+    """
+    Insertar reservas ya devueltas repartidas entre usuarios y libros
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(Reservation), [
+            {"user_id": rng.randint(1, users), "book_id": rng.randint(1, books),
+             "status": "devuelto", "reservation_date": now - timedelta(minutes=i),
+             "due_date": now, "return_date": now}
+            for i in range(count)
+        ])
+
+
+def measure(func, repeat: int):
+    """
+    Ejecutar `func` varias veces y devolver las duraciones en milisegundos
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 3),
+    }
+
+
+def override_database(app, Session):
+    """
+    Apuntar las dependencias de la aplicación a la base de datos temporal
+    """
+    from app.database import get_database, ThreadedSession
+
+    async def _get_database():
+        db = ThreadedSession(Session())
+        try:
+            yield db
+        finally:
+            await db.close()
+
+    app.dependency_overrides[get_database] = _get_database
+
+
+@contextmanager
+def count_statements(engine):
+    """
+    Contar las sentencias SQL ejecutadas dentro del bloque
+    """
+    counter = {"statements": 0}
+
+    def _before_cursor_execute(*args):
+        counter["statements"] += 1
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", _before_cursor_execute)
@@ -0,0 +1,295 @@
+# benchmarks/suite.py
+"""
+Suite de rendimiento de la API: rendimiento (peticiones/s), percentiles de
+latencia y sentencias SQL por petición de cada endpoint principal.
+
+Por defecto siembra un conjunto sintético en una base de datos temporal y
+ejecuta la aplicación en el propio proceso (httpx + ASGI). Con --url mide
+un servidor uvicorn ya en marcha, que debe tener los mismos usuarios
+sintéticos (u0..uN con contraseña est123, p. ej. `python init_data.py
+--synthetic`), la misma SECRET_KEY y RATE_LIMIT_ENABLED=0 (todas las
+peticiones salen de una IP). Las sentencias por petición se leen de
+GET /metrics en ambos modos.
+
+Los resultados se guardan en JSON (benchmarks/results/) con el commit, para
+comparar ejecuciones con --compare. Incluyen el coste de arranque de un
+worker (importación y tiempo hasta la primera petición, ver
+benchmarks/bench_startup.py).
+
+Uso:
+    python -m benchmarks.suite --books 100000 --users 10000 --concurrency 20 --requests 2000
+    python -m benchmarks.suite --url http://localhost:8000 --scenarios list_books,get_book
+    python -m benchmarks.suite --compare benchmarks/results/anterior.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import time
+from datetime import datetime
+from benchmarks.common import temp_engine, seed_books, seed_users, seed_reservations, summarize
+from init_data import TITLE_WORDS, LAST_NAMES
+
+PASSWORD = "est123"
+LOGIN_USERS = 20
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+# Escenarios: (método, ruta en /metrics, función que hace una petición)
+async def list_books(client, rng, ctx):
+    return await client.get("/books/", params={"limit": 50})
+
+
+async def search_books(client, rng, ctx):
+    search = f"{rng.choice(TITLE_WORDS)} {rng.choice(LAST_NAMES)}"
+    return await client.get("/books/", params={"limit": 20, "search": search})
+
+
+async def get_book(client, rng, ctx):
+    return await client.get(f"/books/{rng.randint(1, ctx['books'])}")
+
+
+async def my_reservations(client, rng, ctx):
+    return await client.get("/books/my/reservations", params={"limit": 20}, headers=rng.choice(ctx["tokens"]))
+
+
+async def reserve_book(client, rng, ctx):
+    # Cada reserva se devuelve en el escenario return_book
+    headers = ctx["tokens"][ctx["next_user"] % len(ctx["tokens"])]
+    ctx["next_user"] += 1
+    book_id = rng.randint(1, ctx["books"])
+    response = await client.post(f"/books/{book_id}/reserve", headers=headers)
+    if response.status_code == 200:
+        ctx["reserved"].append((headers, book_id))
+    return response
+
+
+async def return_book(client, rng, ctx):
+    if not ctx["reserved"]:
+        return None
+    headers, book_id = ctx["reserved"].pop()
+    return await client.put(f"/books/{book_id}/return", headers=headers)
+
+
+async def login_user(client, rng, ctx):
+    username = f"u{rng.randrange(LOGIN_USERS)}"
+    return await client.post("/auth/login", data={"username": username, "password": PASSWORD})
+
+
+SCENARIOS = {
+    "list_books": ("GET", "/books/", list_books),
+    "search_books": ("GET", "/books/", search_books),
+    "get_book": ("GET", "/books/{book_id}", get_book),
+    "my_reservations": ("GET", "/books/my/reservations", my_reservations),
+    "reserve_book": ("POST", "/books/{book_id}/reserve", reserve_book),
+    "return_book": ("PUT", "/books/{book_id}/return", return_book),
+    "login_user": ("POST", "/auth/login", login_user),
+}
+# bcrypt: menos peticiones para no dominar la duración de la suite
+REQUEST_FACTOR = {"login_user": 0.1}
+
+_METRIC_LINE = re.compile(r'^(\w+)\{method="(\w+)",route="([^"]*)"(?:,status="\d+")?\} (\S+)$')
+
+
+def parse_metrics(text: str) -> dict:
+    """
+    {(métrica, método, ruta): valor} de las métricas por ruta
+    """
+    values = {}
+    for line in text.splitlines():
+        match = _METRIC_LINE.match(line)
+        if match and match.group(1) in ("http_requests_total", "http_request_db_statements_total"):
+            key = match.group(1, 2, 3)
+            values[key] = values.get(key, 0) + float(match.group(4))
+    return values
+
+
+def queries_per_request(before: dict, after: dict, method: str, route: str):
+    requests = (after.get(("http_requests_total", method, route), 0)
+                - before.get(("http_requests_total", method, route), 0))
+    statements = (after.get(("http_request_db_statements_total", method, route), 0)
+                  - before.get(("http_request_db_statements_total", method, route), 0))
+    return round(statements / requests, 2) if requests else None
+
+
+async def run_scenario(client, name: str, total: int, concurrency: int, ctx: dict) -> dict:
+    method, route, fn = SCENARIOS[name]
+    rng = random.Random(name)
+    latencies, errors = [], {}
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await fn(client, rng, ctx)
+            if response is None:
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors[response.status_code] = errors.get(response.status_code, 0) + 1
+
+    before = parse_metrics((await client.get("/metrics")).text)
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    after = parse_metrics((await client.get("/metrics")).text)
+
+    result = {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "queries_per_request": queries_per_request(before, after, method, route),
+    }
+    if latencies:
+        result.update(summarize(latencies))
+    return result
+
+
+def seed(args):
+    """
+    Base de datos temporal con el conjunto sintético; devuelve el sessionmaker
+    """
+    from sqlalchemy import update
+    from app.hashing import hash_password_sync
+    from app.models.models import User
+
+    engine, Session = temp_engine("suite")
+    start = time.perf_counter()
+    seed_books(engine, args.books)
+    seed_users(engine, args.users)
+    seed_reservations(engine, args.reservations, args.users, args.books)
+    # Contraseña real solo para los usuarios del escenario de login (un hash)
+    hashed = hash_password_sync(PASSWORD)
+    with engine.begin() as conn:
+        conn.execute(update(User).where(User.id <= LOGIN_USERS).values(hashed_password=hashed))
+    print(f"Datos sintéticos: {args.books} libros, {args.users} usuarios, "
+          f"{args.reservations} reservas en {time.perf_counter() - start:.1f}s")
+    return engine, Session
+
+
+async def run(args) -> dict:
+    import httpx
+    from app.routers.auth import create_access_token
+
+    tokens = [{"Authorization": f"Bearer {create_access_token({'sub': f'u{i}'})}"}
+              for i in range(min(args.users, 1000))]
+    ctx = {"books": args.books, "tokens": tokens, "next_user": 0, "reserved": []}
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+    else:
+        from app.main import app
+        from app.metrics import instrument_engine
+        from app.ratelimit import rate_limits
+        from benchmarks.common import override_database
+        engine, Session = seed(args)
+        instrument_engine(engine)
+        override_database(app, Session)
+        # Todas las peticiones salen de un mismo cliente
+        rate_limits.enabled = False
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://suite", timeout=60)
+
+    results = {}
+    async with client:
+        for name in args.scenarios:
+            total = max(1, int(args.requests * REQUEST_FACTOR.get(name, 1)))
+            results[name] = r = await run_scenario(client, name, total, args.concurrency, ctx)
+            print(f"{name:16} {r['requests_per_second']:8.1f} req/s  p50 {r.get('p50_ms', 0):7.2f}ms  "
+                  f"p95 {r.get('p95_ms', 0):7.2f}ms  p99 {r.get('p99_ms', 0):7.2f}ms  "
+                  f"SQL/pet {r['queries_per_request']}  errores {r['errors'] or '-'}")
+
+    if not args.url:
+        from app.hashing import hasher
+        hasher.shutdown()
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido"
+
+
+def compare(current: dict, previous_path: str):
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nComparación con {previous['meta']['commit']} ({previous_path}):")
+    for name, now in current.get("startup", {}).items():
+        before = previous.get("startup", {}).get(name)
+        if before:
+            print(f"arranque {name:14} {before:.3f}s -> {now:.3f}s ({(now - before) / before:+.1%})")
+    for name, now in current["scenarios"].items():
+        before = previous["scenarios"].get(name)
+        if not before or "p50_ms" not in before or "p50_ms" not in now:
+            continue
+        rps = (now["requests_per_second"] - before["requests_per_second"]) / before["requests_per_second"]
+        p99 = (now["p99_ms"] - before["p99_ms"]) / before["p99_ms"]
+        print(f"{name:16} req/s {rps:+7.1%}   p99 {p99:+7.1%}   "
+              f"SQL/pet {before['queries_per_request']} -> {now['queries_per_request']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--reservations", type=int, default=200000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000, help="peticiones por escenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        type=lambda value: [s for s in value.split(",") if s])
+    parser.add_argument("--url", help="servidor en marcha (por defecto, la aplicación en el proceso)")
+    parser.add_argument("--output", help="fichero JSON de resultados")
+    parser.add_argument("--compare", help="resultados anteriores (JSON) con los que comparar")
+    parser.add_argument("--startup-repeat", type=int, default=3,
+                        help="arranques medidos (0 = no medir el arranque)")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"escenarios desconocidos: {', '.join(sorted(unknown))}")
+
+    scenarios = asyncio.run(run(args))
+    startup = {}
+    if args.startup_repeat:
+        from benchmarks.bench_startup import measure_startup
+        startup = measure_startup(args.startup_repeat)
+        print(f"Arranque: import app.main {startup['import_app']:.3f}s, "
+              f"primera petición {startup['first_books']:.3f}s")
+    commit = git_commit()
+    result = {
+        "meta": {
+            "commit": commit,
+            "date": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "target": args.url or "in-process",
+            "books": args.books,
+            "users": args.users,
+            "reservations": args.reservations,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+        },
+        "scenarios": scenarios,
+        "startup": startup,
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.utcnow():%Y%m%d-%H%M%S}-{commit}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"Resultados: {output}")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
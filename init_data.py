@@ -1,8 +1,18 @@
 # init_data.py
+import argparse
+import bisect
+import itertools
+import random
+import time
+from collections import Counter
+from sqlalchemy import insert, update, bindparam, func
 from sqlalchemy.orm import Session
-from app.database import SessionLocal, engine
-from app.models.models import User, Book, Reservation, Base
+from app.database import SessionLocal, engine, create_missing_indexes
+from app.models.models import User, Book, Reservation
 from app.routers.auth import get_password_hash
+from app.search import search_index_suspended
+from app.schema import create_schema
+from app.stats import rebuild_stats
 from datetime import datetime, timedelta
 
 def init_database():
@@ -10,7 +20,7 @@ def init_database():
     Inicializar base de datos con datos de ejemplo
     """
     # Crear todas las tablas
-    Base.metadata.create_all(bind=engine)
+    create_schema(engine)
     
     db = SessionLocal()
     
@@ -147,6 +157,8 @@ def init_database():
             db.add(reservation2)
             print("Reserva de ejemplo creada: Estudiante2 -> 1984")
         
+        db.flush()
+        rebuild_stats(db)
         db.commit()
         
         print("\n✅ Base de datos inicializada correctamente!")
@@ -164,5 +176,237 @@ def init_database():
     finally:
         db.close()
 
+# Datos sintéticos para pruebas de carga.
+# Inserciones masivas por lotes (executemany) con los índices secundarios no
+# únicos y los triggers de búsqueda desactivados; índices e FTS se
+# reconstruyen al final, también si la generación falla. Todos los usuarios
+# comparten un único hash (contraseña est123) y la misma semilla genera
+# siempre los mismos datos.
+SYNTHETIC_PASSWORD = "est123"
+ACTIVE_SHARE = 0.10      # reservas activas (vencen en el futuro)
+OVERDUE_SHARE = 0.05     # reservas vencidas; el resto, devueltas
+HISTORY_DAYS = 730       # las reservas se reparten en los últimos 2 años
+
+# Vocabulario para generar un catálogo sintético realista (con acentos)
+FIRST_NAMES = [
+    "Gabriel", "Isabel", "Mario", "Julio", "Jorge", "Laura", "Rosa", "Pablo",
+    "Octavio", "Elena", "Ángeles", "José", "Mónica", "Andrés", "Lucía", "Ramón",
+]
+LAST_NAMES = [
+    "García", "Márquez", "Allende", "Vargas", "Llosa", "Cortázar", "Borges",
+    "Neruda", "Paz", "Poniatowska", "Mastretta", "Sábato", "Fuentes", "Benedetti",
+    "Pérez", "Galdós", "Martín", "Gaite", "Muñoz", "Molina", "Cervantes", "Orwell",
+]
+TITLE_WORDS = [
+    "soledad", "amor", "tiempo", "cólera", "ciudad", "perros", "laberinto",
+    "ficciones", "casa", "espíritus", "túnel", "sombra", "viento", "ciencia",
+    "programación", "patrones", "diseño", "historia", "guerra", "paz", "mar",
+    "noche", "silencio", "memoria", "código", "limpio", "año", "otoño", "patriarca",
+    "crónica", "muerte", "anunciada", "rayuela", "aleph", "jardín", "senderos",
+]
+# Sílabas para inventar palabras y obtener un vocabulario amplio
+SYLLABLES = [
+    "ca", "ma", "ri", "to", "lu", "ne", "so", "pe", "dra", "quí", "ber", "tal",
+    "fo", "ven", "gri", "mo", "sa", "ti", "rel", "bón", "cu", "la", "zo", "nie",
+]
+
+
+def pseudo_word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def synthetic_book(rng: random.Random, index: int) -> dict:
+    author = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}"
+    words = [rng.choice(TITLE_WORDS)] + [pseudo_word(rng) for _ in range(rng.randint(1, 4))]
+    rng.shuffle(words)
+    title = " ".join(words).capitalize()
+    copies = rng.randint(1, 5)
+    return {
+        "title": title,
+        "author": author,
+        "isbn": f"978-{index:010d}",
+        "description": " ".join(pseudo_word(rng) for _ in range(12)),
+        "total_copies": copies,
+        "available_copies": copies,
+    }
+
+
+class Progress:
+    """
+    Progreso de una fase en una sola línea: filas, total y filas/s
+    """
+
+    def __init__(self, label: str, total: int):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.started = time.perf_counter()
+
+    def advance(self, rows: int):
+        self.done += rows
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed if elapsed else 0
+        print(f"\r  {self.label}: {self.done:,}/{self.total:,} ({rate:,.0f}/s)", end="", flush=True)
+
+    def finish(self):
+        print(f"  {time.perf_counter() - self.started:.1f}s")
+
+
+def zipf_sampler(rng: random.Random, n: int, exponent: float):
+    """
+    Muestreo de 1..n con popularidad tipo Zipf. El rango de popularidad se
+    asigna a ids barajados: los libros populares no son los primeros ids.
+    """
+    cumulative = list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, n + 1)))
+    ids = list(range(1, n + 1))
+    rng.shuffle(ids)
+    total = cumulative[-1]
+
+    def sample() -> int:
+        return ids[bisect.bisect_left(cumulative, rng.random() * total)]
+    return sample
+
+
+def _batches(total: int, batch_size: int):
+    for start in range(0, total, batch_size):
+        yield start, min(start + batch_size, total)
+
+
+def _drop_secondary_indexes(tables):
+    """
+    Quitar los índices no únicos declarados en los modelos (se recrean con
+    create_missing_indexes). Los únicos se mantienen: garantizan la
+    integridad de los datos (usernames, una reserva activa por libro y
+    usuario) también durante la carga.
+    """
+    for table in tables:
+        for index in table.indexes:
+            if not index.unique:
+                index.drop(bind=engine, checkfirst=True)
+
+
+def generate_synthetic(books: int, users: int, reservations: int, seed: int = 42, batch_size: int = 20000):
+    """
+    Generar un catálogo, usuarios e historial de reservas sintéticos
+    """
+    init_database()
+    rng = random.Random(seed)
+    started = time.perf_counter()
+
+    with SessionLocal() as db:
+        if db.query(User).filter(User.username == "u0").first():
+            print("La base de datos ya tiene datos sintéticos")
+            return
+        first_book = (db.query(func.max(Book.id)).scalar() or 0) + 1
+        first_user = (db.query(func.max(User.id)).scalar() or 0) + 1
+
+    tables = [Book.__table__, User.__table__, Reservation.__table__]
+    _drop_secondary_indexes(tables)
+    try:
+        with search_index_suspended(engine):
+            # Libros
+            progress = Progress("libros", books)
+            copies = []
+            for start, end in _batches(books, batch_size):
+                rows = [synthetic_book(rng, i) for i in range(start, end)]
+                copies.extend(row["total_copies"] for row in rows)
+                with engine.begin() as conn:
+                    conn.execute(insert(Book), rows)
+                progress.advance(len(rows))
+            progress.finish()
+
+            # Usuarios: un solo hash bcrypt para todos
+            hashed = get_password_hash(SYNTHETIC_PASSWORD)
+            now = datetime.utcnow()
+            progress = Progress("usuarios", users)
+            for start, end in _batches(users, batch_size):
+                rows = [
+                    {"email": f"u{i}@sintetico.local", "username": f"u{i}", "full_name": f"Usuario {i}",
+                     "hashed_password": hashed, "created_at": now,
+                     "role": "bibliotecario" if i % 500 == 499 else "estudiante"}
+                    for i in range(start, end)
+                ]
+                with engine.begin() as conn:
+                    conn.execute(insert(User), rows)
+                progress.advance(len(rows))
+            progress.finish()
+
+            # Reservas: libros con popularidad Zipf, usuarios con actividad sesgada
+            pick_book = zipf_sampler(rng, books, 1.1)
+            pick_user = zipf_sampler(rng, users, 0.8)
+            active_pairs = set()
+            active_per_book = Counter()
+            statuses = Counter()
+            progress = Progress("reservas", reservations)
+            for start, end in _batches(reservations, batch_size):
+                rows = []
+                for _ in range(start, end):
+                    book = pick_book()
+                    user = pick_user()
+                    roll = rng.random()
+                    # Activa solo si quedan copias y el usuario no tiene ya ese libro;
+                    # si no, devuelta (no vencida: en los libros más populares
+                    # inflaría la proporción de vencidas)
+                    if (roll < ACTIVE_SHARE and active_per_book[book] < copies[book - 1]
+                            and (user, book) not in active_pairs):
+                        active_pairs.add((user, book))
+                        active_per_book[book] += 1
+                        reserved = now - timedelta(days=rng.uniform(0, 13))
+                        status, returned = "activa", None
+                    elif ACTIVE_SHARE <= roll < ACTIVE_SHARE + OVERDUE_SHARE:
+                        reserved = now - timedelta(days=rng.uniform(15, HISTORY_DAYS))
+                        status, returned = "vencido", None
+                    else:
+                        reserved = now - timedelta(days=rng.uniform(15, HISTORY_DAYS))
+                        status, returned = "devuelto", reserved + timedelta(days=rng.uniform(1, 20))
+                    statuses[status] += 1
+                    rows.append({
+                        "user_id": first_user + user - 1, "book_id": first_book + book - 1,
+                        "status": status, "reservation_date": reserved,
+                        "due_date": reserved + timedelta(days=14), "return_date": returned,
+                    })
+                with engine.begin() as conn:
+                    conn.execute(insert(Reservation), rows)
+                progress.advance(len(rows))
+            progress.finish()
+
+            # Inventario coherente con las reservas activas
+            if active_per_book:
+                books_table = Book.__table__
+                with engine.begin() as conn:
+                    conn.execute(
+                        update(books_table)
+                        .where(books_table.c.id == bindparam("book_id"))
+                        .values(available_copies=books_table.c.available_copies - bindparam("active")),
+                        [{"book_id": first_book + book - 1, "active": count}
+                         for book, count in active_per_book.items()]
+                    )
+            print("  reconstruyendo índice de búsqueda...", flush=True)
+    finally:
+        # También si la generación falla: la base de datos no se queda sin índices
+        print("  recreando índices...", flush=True)
+        create_missing_indexes(engine)
+    print("  recalculando estadísticas...", flush=True)
+    with SessionLocal() as db:
+        rebuild_stats(db)
+        db.commit()
+    print(f"\n✅ Datos sintéticos generados en {time.perf_counter() - started:.1f}s "
+          f"(semilla {seed})")
+    print(f"- {books:,} libros, {users:,} usuarios (u0..u{users - 1} / {SYNTHETIC_PASSWORD})")
+    print(f"- {reservations:,} reservas: " + ", ".join(f"{k} {v:,}" for k, v in statuses.items()))
+
+
 if __name__ == "__main__":
-    init_database()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Inicializar la base de datos")
+    parser.add_argument("--synthetic", action="store_true", help="generar datos sintéticos para pruebas de carga")
+    parser.add_argument("--books", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--reservations", type=int, default=3000000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=20000)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        generate_synthetic(args.books, args.users, args.reservations, args.seed, args.batch_size)
+    else:
+        init_database()
\ No newline at end of file
@@ -0,0 +1,62 @@
+# tests/test_auth.py
+"""
+Caché de tokens (app/routers/auth.py): un cambio de rol o de estado se
+aplica al confirmarse, no en el flush, y un usuario desactivado deja de
+poder autenticarse aunque su token siga vigente.
+"""
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models.models import User
+from app.routers.auth import create_access_token, user_cache
+from benchmarks.common import temp_engine, seed_users, override_database
+
+LIBRARIAN_ROUTE = "/books/admin/sweeper"
+
+
+@pytest.fixture
+def setup():
+    engine, Session = temp_engine("test-auth")
+    seed_users(engine, 1, role="bibliotecario")
+    override_database(app, Session)
+    user_cache.clear()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'u0'})}"}
+    yield TestClient(app, headers=headers), Session
+    app.dependency_overrides.clear()
+    user_cache.clear()
+
+
+def test_role_change_invalidates_on_commit(setup):
+    http, Session = setup
+    assert http.get(LIBRARIAN_ROUTE).status_code == 200
+    with Session() as db:
+        db.query(User).filter(User.username == "u0").one().role = "estudiante"
+        db.flush()
+        # Entre el flush y el commit otra petición ve el rol confirmado (el
+        # viejo): no debe quedar en la caché tras el commit
+        user_cache.clear()
+        assert http.get(LIBRARIAN_ROUTE).status_code == 200
+        db.commit()
+    assert http.get(LIBRARIAN_ROUTE).status_code == 403
+
+
+def test_rollback_keeps_cache(setup):
+    http, Session = setup
+    assert http.get(LIBRARIAN_ROUTE).status_code == 200
+    with Session() as db:
+        db.query(User).filter(User.username == "u0").one().role = "estudiante"
+        db.flush()
+        db.rollback()
+    assert user_cache.stats()["size"] == 1
+    assert http.get(LIBRARIAN_ROUTE).status_code == 200
+
+
+def test_inactive_user_is_rejected(setup):
+    http, Session = setup
+    assert http.get(LIBRARIAN_ROUTE).status_code == 200
+    with Session() as db:
+        db.query(User).filter(User.username == "u0").one().is_active = False
+        db.commit()
+    response = http.get(LIBRARIAN_ROUTE)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Usuario inactivo"
@@ -0,0 +1,53 @@
+# tests/test_import.py
+"""
+Importación masiva (app/importer.py): una línea que no es UTF-8 se
+informa como error de esa fila y el resto de la carga se completa.
+"""
+import io
+import asyncio
+import pytest
+from app.database import ThreadedSession
+from app.importer import import_books, INVALID_ENCODING
+from app.models.models import Book
+from benchmarks.common import temp_engine
+
+
+@pytest.fixture
+def Session():
+    return temp_engine("test-import")[1]
+
+
+def run_import(Session, content: bytes, file_format: str) -> dict:
+    db = ThreadedSession(Session())
+    try:
+        return asyncio.run(import_books(db, io.BytesIO(content), file_format, batch_size=2))
+    finally:
+        asyncio.run(db.close())
+
+
+def test_csv_with_latin1_row(Session):
+    content = b"".join([
+        "\ufefftitle,author,isbn,total_copies\r\n".encode("utf-8"),
+        "Rayuela,Julio Cortázar,isbn-1,2\r\n".encode("utf-8"),
+        # Exportada de Excel en Latin-1
+        "Cien años de soledad,Gabriel García Márquez,isbn-2,1\r\n".encode("latin-1"),
+        "Ficciones,Jorge Luis Borges,isbn-3,1\r\n".encode("utf-8"),
+        "El túnel,Ernesto Sábato,isbn-4,1\r\n".encode("utf-8"),
+    ])
+    report = run_import(Session, content, "csv")
+    assert report["inserted"] == 3
+    assert report["errors"] == [{"row": 3, "error": INVALID_ENCODING}]
+    with Session() as db:
+        assert {book.isbn for book in db.query(Book)} == {"isbn-1", "isbn-3", "isbn-4"}
+        assert db.query(Book).filter(Book.isbn == "isbn-4").one().title == "El túnel"
+
+
+def test_ndjson_with_latin1_row(Session):
+    content = b"\n".join([
+        '{"title": "Rayuela", "author": "Julio Cortázar", "isbn": "isbn-1", "total_copies": 1}'.encode("utf-8"),
+        '{"title": "Canción", "author": "Nadie", "isbn": "isbn-2", "total_copies": 1}'.encode("latin-1"),
+        b'{"title": "Aleph", "author": "Borges", "isbn": "isbn-3", "total_copies": 1}',
+    ])
+    report = run_import(Session, content, "ndjson")
+    assert report["inserted"] == 2
+    assert report["errors"] == [{"row": 2, "error": INVALID_ENCODING}]
@@ -0,0 +1,45 @@
+# tests/test_invalidation.py
+"""
+Invalidación entre workers (app/invalidation.py): dos CacheSync sobre la
+misma base de datos hacen de dos workers. Lo que publica uno lo aplica el
+otro en su siguiente vuelta, y nadie se aplica sus propios cambios.
+"""
+import asyncio
+from app.invalidation import CacheSync, CATALOG, USER
+from app.models.models import User
+from app.routers import auth  # noqa: F401 (eventos del ORM que publican los cambios de usuario)
+from benchmarks.common import temp_engine, seed_users
+
+
+def test_changes_reach_other_worker():
+    engine, Session = temp_engine("test-invalidation")
+    seed_users(engine, 1, role="bibliotecario")
+    # `here` es este proceso: record_change publica con su origen
+    here = CacheSync(3600, bind=engine)
+    other = CacheSync(3600, bind=engine, origin="otro-worker")
+    received = {here: [], other: []}
+    for worker, changes in received.items():
+        for kind in (CATALOG, USER):
+            worker.subscribe(kind, lambda key, kind=kind, changes=changes: changes.append((kind, key)))
+
+    async def publish_catalog_bump():
+        here.start()
+        other.start()
+        await other.stop()
+        here.publish(CATALOG)
+        # Al parar se escribe lo pendiente
+        await here.stop()
+
+    asyncio.run(publish_catalog_bump())
+    assert other.sync() == 1
+    assert received[other] == [(CATALOG, None)]
+
+    with Session() as db:
+        db.query(User).filter(User.username == "u0").one().role = "estudiante"
+        db.commit()
+    assert other.sync() == 1
+    assert received[other] == [(CATALOG, None), (USER, "u0")]
+
+    assert here.sync() == 0
+    assert received[here] == []
+    assert other.sync() == 0
@@ -0,0 +1,52 @@
+# tests/test_oidc.py
+"""
+Validación local de access tokens de Keycloak (app/oidc.py): un token bien
+firmado al que le falta un claim obligatorio se rechaza con InvalidToken
+(401), no con un error interno.
+"""
+import time
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+from app import oidc
+
+ISSUER = "http://keycloak.test/realms/biblioteca"
+AUDIENCE = "biblioteca-api"
+KID = "test-key"
+
+
+@pytest.fixture(scope="module")
+def signer():
+    private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                serialization.NoEncryption())
+    public_pem = private.public_key().public_bytes(serialization.Encoding.PEM,
+                                                   serialization.PublicFormat.SubjectPublicKeyInfo)
+    public = dict(jwk.construct(public_pem, "RS256").to_dict(), kid=KID, use="sig")
+    return jwk.construct(pem, "RS256"), {"keys": [public]}
+
+
+@pytest.fixture
+def verifier(signer):
+    jwks = signer[1]
+    return oidc.OIDCVerifier(ISSUER, AUDIENCE, oidc.JWKSCache("jwks", 3600, 30, fetch=lambda url: jwks))
+
+
+def token(signer, **overrides) -> str:
+    claims = {"iss": ISSUER, "azp": AUDIENCE, "sub": "kc-ana", "preferred_username": "ana",
+              "exp": int(time.time()) + 300}
+    claims.update(overrides)
+    claims = {name: value for name, value in claims.items() if value is not None}
+    return jwt.encode(claims, signer[0], algorithm="RS256", headers={"kid": KID})
+
+
+def test_valid_token(signer, verifier):
+    assert verifier.verify(token(signer))["sub"] == "kc-ana"
+
+
+@pytest.mark.parametrize("claim", ["sub", "exp"])
+def test_missing_claim_is_rejected(signer, verifier, claim):
+    with pytest.raises(oidc.InvalidToken):
+        verifier.verify(token(signer, **{claim: None}))
+    assert verifier.rejected == 1
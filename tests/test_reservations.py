@@ -0,0 +1,164 @@
+# tests/test_reservations.py
+"""
+- Los listados de reservas ejecutan un número constante de sentencias SQL
+  por petición, sin importar cuántas reservas devuelven (sin cargas
+  perezosas N+1 del libro de cada reserva).
+- Reservas, devoluciones y cambios de estado simultáneos sobre un libro
+  nunca dejan más préstamos activos que copias (versión corta de
+  benchmarks/bench_concurrent_reservations.py).
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select
+from app.main import app
+from app.models.models import Book, BookStats, User, Reservation
+from app.routers.auth import create_access_token
+from benchmarks.common import temp_engine, seed_books, override_database, count_statements
+
+
+@pytest.fixture(scope="module")
+def client():
+    engine, Session = temp_engine("test-reservations")
+    seed_books(engine, 200)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"email": "bib@test.local", "username": "bib", "full_name": "Test",
+             "hashed_password": "-", "role": "bibliotecario"},
+        ])
+        now = datetime.utcnow()
+        conn.execute(insert(Reservation), [
+            {"user_id": 1, "book_id": 1 + i % 200, "status": "devuelto",
+             "reservation_date": now - timedelta(minutes=i), "due_date": now}
+            for i in range(200)
+        ])
+    override_database(app, Session)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bib'})}"}
+    # Sin `with`: no arranca el lifespan (ni tareas de fondo ni la BD real)
+    yield TestClient(app, headers=headers), engine
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.parametrize("path", ["/books/my/reservations", "/books/admin/reservations"])
+def test_statement_count_does_not_grow_with_page_size(client, path):
+    http, engine = client
+    # Primera petición: resuelve el usuario y lo deja en la caché de tokens
+    http.get(path, params={"limit": 1})
+
+    counts = {}
+    for size in [1, 100]:
+        with count_statements(engine) as counter:
+            response = http.get(path, params={"limit": size})
+        assert response.status_code == 200, response.text
+        assert len(response.json()["items"]) == size
+        counts[size] = counter["statements"]
+    assert counts[1] == counts[100], counts
+
+
+COPIES = 3
+USERS = 8
+
+
+@pytest.fixture
+def library():
+    engine, Session = temp_engine("test-concurrency")
+    with engine.begin() as conn:
+        conn.execute(insert(Book), [{"title": "Pedro Páramo", "author": "Juan Rulfo", "isbn": "isbn-1",
+                                     "total_copies": COPIES, "available_copies": COPIES}])
+        conn.execute(insert(User), [
+            {"email": "conc-bib@test.local", "username": "conc-bib", "full_name": "Test",
+             "hashed_password": "-", "role": "bibliotecario"},
+        ] + [
+            {"email": f"conc{i}@test.local", "username": f"conc{i}", "full_name": "Test",
+             "hashed_password": "-", "role": "estudiante"}
+            for i in range(USERS)
+        ])
+    previous = dict(app.dependency_overrides)
+    override_database(app, Session)
+    yield TestClient(app), Session
+    app.dependency_overrides.clear()
+    app.dependency_overrides.update(previous)
+
+
+def auth(username: str) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+
+
+def fire(calls) -> list:
+    """
+    Lanzar todas las peticiones a la vez y devolver sus códigos
+    """
+    barrier = threading.Barrier(len(calls))
+
+    def call(request):
+        barrier.wait(timeout=10)
+        return request().status_code
+
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        return list(pool.map(call, calls))
+
+
+def set_status(http, reservation_id: int, status: str):
+    return lambda: http.put(f"/books/admin/reservations/{reservation_id}/status",
+                            data={"new_status": status}, headers=auth("conc-bib"))
+
+
+def reservations(Session, status: str) -> list:
+    with Session() as db:
+        return db.execute(
+            select(Reservation.id).where(Reservation.status == status).order_by(Reservation.id)
+        ).scalars().all()
+
+
+def assert_inventory(Session):
+    with Session() as db:
+        book = db.get(Book, 1)
+        active = len(reservations(Session, "activa"))
+        stats = db.get(BookStats, 1)
+        assert active <= COPIES
+        assert book.available_copies + active == COPIES
+        assert (stats.active_reservations if stats else 0) == active
+
+
+def test_concurrent_reservations_never_oversell(library):
+    http, Session = library
+    users = [f"conc{i}" for i in range(USERS)]
+
+    codes = fire([lambda user=user: http.post("/books/1/reserve", headers=auth(user)) for user in users])
+    assert codes.count(200) == COPIES
+    assert_inventory(Session)
+
+    # Todas devueltas a la vez por el bibliotecario: las copias vuelven
+    codes = fire([set_status(http, rid, "devuelto") for rid in reservations(Session, "activa")])
+    assert codes == [200] * COPIES
+    assert_inventory(Session)
+
+    # Otros dos usuarios ocupan dos copias; de las tres reactivaciones
+    # simultáneas solo una encuentra copia
+    returned = reservations(Session, "devuelto")
+    with Session() as db:
+        holders = set(db.execute(select(Reservation.user_id).where(Reservation.id.in_(returned))).scalars())
+    others = [f"conc{i}" for i in range(USERS) if i + 2 not in holders][:2]
+    assert [http.post("/books/1/reserve", headers=auth(user)).status_code for user in others] == [200, 200]
+    codes = fire([set_status(http, rid, "activa") for rid in returned])
+    assert sorted(codes) == [200, 409, 409]
+    assert_inventory(Session)
+
+    # Sin copias libres la reactivación se rechaza
+    pending = reservations(Session, "devuelto")
+    assert set_status(http, pending[0], "activa")().status_code == 409
+    assert_inventory(Session)
+
+    # Con copia libre, pero el usuario ya tiene otra reserva activa del libro
+    with Session() as db:
+        user_id = db.get(Reservation, pending[0]).user_id
+        username = db.get(User, user_id).username
+    assert set_status(http, reservations(Session, "activa")[0], "devuelto")().status_code == 200
+    assert http.post("/books/1/reserve", headers=auth(username)).status_code == 200
+    assert set_status(http, reservations(Session, "activa")[0], "devuelto")().status_code == 200
+    response = set_status(http, pending[0], "activa")()
+    assert response.status_code == 409
+    assert "otra reserva activa" in response.json()["detail"]
+    assert_inventory(Session)
@@ -0,0 +1,88 @@
+# tests/test_search.py
+"""
+Diccionario de términos de la búsqueda aproximada (app/search.py): lo
+mantiene la aplicación (ORM e importación) y la tabla books se puede
+escribir desde cualquier conexión SQLite.
+"""
+import io
+import asyncio
+import sqlite3
+import pytest
+from sqlalchemy import text
+from app.database import ThreadedSession
+from app.importer import import_books
+from app.models.models import Book
+from app.search import create_search_index, rebuild_term_index, term_index_status
+from benchmarks.common import temp_engine
+
+
+@pytest.fixture
+def database():
+    return temp_engine("test-search")
+
+
+def term_docs(engine) -> dict:
+    with engine.connect() as conn:
+        return dict(conn.execute(text("SELECT term, docs FROM search_terms WHERE docs > 0")).all())
+
+
+def test_orm_writes_update_terms(database):
+    engine, Session = database
+    with Session() as db:
+        book = Book(title="Rayuela", author="Julio Cortázar", isbn="isbn-1", total_copies=1, available_copies=1)
+        db.add(book)
+        db.commit()
+        assert term_docs(engine) == {"rayuela": 1, "julio": 1, "cortazar": 1}
+
+        book.author = "Julio Verne"
+        db.commit()
+        assert term_docs(engine) == {"rayuela": 1, "julio": 1, "verne": 1}
+
+        db.delete(book)
+        db.commit()
+        assert term_docs(engine) == {}
+
+    # Los términos sin libros se quedan hasta reconstruir
+    with engine.begin() as conn:
+        assert term_index_status(conn) == {"terms": 4, "stale": 4}
+        rebuild_term_index(conn)
+        assert term_index_status(conn) == {"terms": 0, "stale": 0}
+
+
+def test_import_updates_terms(database):
+    engine, Session = database
+    content = b"title,author,isbn,total_copies\nFicciones,Borges,isbn-1,1\nAleph,Borges,isbn-2,1\n"
+    db = ThreadedSession(Session())
+    try:
+        asyncio.run(import_books(db, io.BytesIO(content), "csv"))
+    finally:
+        asyncio.run(db.close())
+    assert term_docs(engine) == {"ficciones": 1, "aleph": 1, "borges": 2}
+
+
+def test_books_writable_without_application(database):
+    engine = database[0]
+    conn = sqlite3.connect(engine.url.database)
+    with conn:
+        conn.execute(
+            "INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+            "VALUES ('Pedro Páramo', 'Juan Rulfo', 'isbn-1', 1, 1)"
+        )
+        conn.execute("UPDATE books SET author = 'Rulfo' WHERE isbn = 'isbn-1'")
+    conn.close()
+    # Lo escrito por fuera se recoge al reconstruir
+    with engine.begin() as conn:
+        rebuild_term_index(conn)
+    assert term_docs(engine) == {"pedro": 1, "paramo": 1, "rulfo": 1}
+
+
+def test_legacy_triggers_removed(database):
+    engine = database[0]
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TRIGGER search_terms_ai AFTER INSERT ON books BEGIN "
+            "SELECT search_terms_json(new.title, new.author); END"
+        ))
+    create_search_index(engine)
+    with engine.connect() as conn:
+        assert not conn.execute(text("SELECT name FROM sqlite_master WHERE name = 'search_terms_ai'")).all()
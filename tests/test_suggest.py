@@ -0,0 +1,86 @@
+# tests/test_suggest.py
+"""
+Autocompletado en memoria (app/suggest.py): las consultas no fallan
+mientras otro hilo aplica cambios, y llenar la lista de cambios adelanta
+la reconstrucción en la tarea de fondo, no en quien hizo el cambio.
+"""
+import asyncio
+import threading
+import pytest
+from sqlalchemy import insert, update
+from app.models.models import Book
+from app.suggest import SuggestIndex
+from benchmarks.common import temp_engine, seed_books
+
+
+@pytest.fixture
+def database():
+    engine, Session = temp_engine("test-suggest")
+    seed_books(engine, 200)
+    return engine, Session
+
+
+def test_suggest_during_refresh(database):
+    engine, Session = database
+    index = SuggestIndex(1000, 10, 0, 10**6, session_factory=Session)
+    index.rebuild()
+    with engine.begin() as conn:
+        conn.execute(insert(Book), [
+            {"title": f"Zafiro {n}", "author": "Zoe Zamora", "isbn": f"zafiro-{n}",
+             "total_copies": 1, "available_copies": 1}
+            for n in range(20)
+        ])
+    new_ids = list(range(201, 221))
+    errors = []
+    done = threading.Event()
+
+    def refresh():
+        try:
+            for n in range(50):
+                with engine.begin() as conn:
+                    conn.execute(update(Book).where(Book.id.in_(new_ids)).values(title=f"Zafiro edición {n}"))
+                index.refresh(None, new_ids, publish=False)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            done.set()
+
+    def suggest():
+        try:
+            while not done.is_set():
+                index.suggest("zaf", 10)
+                index.stats()
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=refresh)] + [threading.Thread(target=suggest) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert {item["text"] for item in index.suggest("zafiro", 10) if item["type"] == "title"} == {"Zafiro edición 49"}
+
+
+def test_overflow_rebuilds_in_background(database):
+    engine, Session = database
+    index = SuggestIndex(1000, 10, 0, 5, session_factory=Session)
+    index.rebuild()
+    assert index.builds == 1
+
+    # Sin tarea de fondo no se reconstruye en la llamada
+    index.refresh(None, range(1, 11), publish=False)
+    assert index.builds == 1
+
+    async def run():
+        index.start()
+        while index.builds < 2:
+            await asyncio.sleep(0.01)
+        index.refresh(None, range(1, 11), publish=False)
+        assert index.builds == 2
+        while index.builds < 3:
+            await asyncio.sleep(0.01)
+        await index.stop()
+
+    asyncio.run(asyncio.wait_for(run(), 10))
+    assert index.stats()["pending_changes"] == 0